@@ -0,0 +1,102 @@
+"""Fasst Stream-Frames zusammen, bevor sie über den WebSocket gehen.
+
+Text-Chunks werden gepuffert und spätestens nach `flush_ms` Millisekunden oder
+`max_bytes` Bytes als ein Frame gesendet. Von `meta` wird nur der jeweils neueste
+Stand gesendet (ältere, noch nicht gesendete sind überholt). Alle anderen Frames
+(error, stream_end, ...) leeren den Puffer und gehen sofort raus.
+"""
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+WS_FLUSH_MS = float(os.environ.get("MARA_WS_FLUSH_MS", "25"))
+WS_FLUSH_BYTES = int(os.environ.get("MARA_WS_FLUSH_BYTES", "1024"))
+# Grenzen für die per Query-Parameter gewählten Werte
+MAX_FLUSH_MS = 500.0
+MAX_FLUSH_BYTES = 65536
+
+# Prozessweite Zähler für /metrics
+coalesce_stats = {
+    'frames_in': 0,
+    'frames_out': 0,
+    'meta_dropped': 0
+}
+
+
+class FrameCoalescer:
+    """Puffert Text- und Meta-Frames einer Verbindung; flush_ms=0 schaltet das Zusammenfassen ab"""
+
+    def __init__(self, send: Callable[[Dict[str, Any]], Awaitable[None]],
+                 flush_ms: float = WS_FLUSH_MS, max_bytes: int = WS_FLUSH_BYTES):
+        self.send = send
+        self.flush_ms = flush_ms
+        self.max_bytes = max_bytes
+        self._text = []
+        self._text_bytes = 0
+        self._meta: Optional[Dict[str, Any]] = None
+        self._timer: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    def from_query(cls, send, params) -> "FrameCoalescer":
+        """Liest flush_ms/flush_bytes aus den Query-Parametern der Verbindung (mit Grenzen)"""
+        try:
+            flush_ms = min(max(float(params.get('flush_ms', WS_FLUSH_MS)), 0.0), MAX_FLUSH_MS)
+            max_bytes = min(max(int(params.get('flush_bytes', WS_FLUSH_BYTES)), 1), MAX_FLUSH_BYTES)
+        except ValueError:
+            flush_ms, max_bytes = WS_FLUSH_MS, WS_FLUSH_BYTES
+        return cls(send, flush_ms=flush_ms, max_bytes=max_bytes)
+
+    async def push(self, frame: Dict[str, Any]):
+        coalesce_stats['frames_in'] += 1
+        if self.flush_ms <= 0:
+            await self._send(frame)
+            return
+
+        kind = frame.get('type')
+        if kind == 'text':
+            content = frame.get('content', '')
+            self._text.append(content)
+            self._text_bytes += len(content.encode('utf-8'))
+            if self._text_bytes >= self.max_bytes:
+                await self.flush()
+            else:
+                self._schedule()
+        elif kind == 'meta':
+            if self._meta is not None:
+                coalesce_stats['meta_dropped'] += 1
+            self._meta = frame
+            self._schedule()
+        else:
+            await self.flush()
+            await self._send(frame)
+
+    def _schedule(self):
+        if self._timer is None or self._timer.done():
+            self._timer = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.flush_ms / 1000)
+        await self.flush()
+
+    async def flush(self):
+        async with self._lock:
+            if self._timer is not None and not self._timer.done() and self._timer is not asyncio.current_task():
+                self._timer.cancel()
+            self._timer = None
+            text, meta = "".join(self._text), self._meta
+            self._text, self._text_bytes, self._meta = [], 0, None
+            if text:
+                await self._send({"type": "text", "content": text})
+            if meta is not None:
+                await self._send(meta)
+
+    def discard(self):
+        """Bei Abbruch: Puffer verwerfen, ohne zu senden"""
+        if self._timer is not None and not self._timer.done():
+            self._timer.cancel()
+        self._text, self._text_bytes, self._meta = [], 0, None
+
+    async def _send(self, frame: Dict[str, Any]):
+        coalesce_stats['frames_out'] += 1
+        await self.send(frame)
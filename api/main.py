@@ -1,19 +1,72 @@
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse
-from typing import Dict
+from fastapi.responses import HTMLResponse, JSONResponse
+import asyncio
 import traceback
+from contextlib import suppress
 
-from concurrent.futures import ThreadPoolExecutor
-
-from api.models import ChatRequest, ChatResponse, RecallRequest, MemoryItem
+from api.models import ChatRequest, ChatResponse, RecallRequest, MemoryItem, SlotRequest, SlotRelease
 from api.websocket import manager
+from api.coalescer import FrameCoalescer, coalesce_stats
+from api.session_manager import SessionManager, estimate_session_bytes, hibernate_idle_loop
+from memory.write_behind import get_flusher, flush_all
+from memory.short_term import HISTORY_BACKEND
+from memory.session_store import get_session_store
+from memory.embedding_cache import get_embedding_cache
+from clients import get_registry
+from models import ModelWarmer, latency_stats
+from memory.long_term import write_stats
+from memory.recall_cache import get_recall_cache
+from memory.retrieval_gate import get_retrieval_gate
+from scheduler import get_scheduler, PRIORITIES, SCHED_LEASE_SECONDS, SCHED_RPC_WAIT_SECONDS
+from memory.session_state import SESSION_STATE_ENABLED, WORKERS, get_session_state_store, snapshot, sticky_worker
+from jobs import get_job_queue
 import mara
 
 app = FastAPI(title="Mara AI API", version="1.0.0")
 
-executor = ThreadPoolExecutor(max_workers=4)
-sessions: Dict[str, dict] = {}
+# Geladene Sessions mit Budget (MARA_MAX_SESSIONS / MARA_SESSION_MEMORY_MB), der Rest schläft auf der Platte
+sessions = SessionManager(mara.create_mara_session, mara.hibernate_session,
+                          measure=lambda session: estimate_session_bytes(session, snapshot))
+warmer = ModelWarmer()
+
+
+def run_blocking(fn, *args):
+    """Platte/CPU-Arbeit im dimensionierten Pool statt im Event-Loop"""
+    return asyncio.get_running_loop().run_in_executor(mara.blocking_pool, fn, *args)
+
+
+async def get_or_create_session(session_id: str) -> dict:
+    session = sessions.get_loaded(session_id)
+    if session is None:
+        # Laden des Verlaufs und Aufwecken lesen von der Platte
+        session = await run_blocking(sessions.get, session_id)
+    return session
+
+
+@app.on_event("startup")
+async def startup_event():
+    if WORKERS > 1 and (not SESSION_STATE_ENABLED or HISTORY_BACKEND != "sqlite"):
+        print("⚠️ Mehrere Worker brauchen MARA_SESSION_STATE=1 und MARA_HISTORY_BACKEND=sqlite, "
+              "sonst sieht jeder Worker nur seine eigenen Sessions")
+    # Nacharbeits-Jobs brauchen Zugriff auf die geladenen Sessions; offene Jobs vom letzten Lauf fortsetzen
+    # Schlafende Sessions weckt ein Job nicht auf, er ändert nur ihren Snapshot
+    mara.set_session_resolver(sessions.get_loaded)
+    mara.get_post_turn_queue()
+    if sessions.idle_seconds:
+        asyncio.create_task(hibernate_idle_loop(sessions, run_blocking))
+    # Modelle im Hintergrund laden; /ready meldet erst danach Bereitschaft und lädt später herausgefallene neu
+    asyncio.get_running_loop().run_in_executor(mara.blocking_pool, warmer.warm_up)
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Ausstehende Verläufe des Write-Behind-Flushers nicht verlieren
+    flush_all()
+    # Laufende Jobs beenden lassen, offene bleiben in der Jobqueue liegen
+    await run_blocking(get_job_queue().stop)
+    # Zustand aller geladenen Sessions für den nächsten Start sichern
+    await run_blocking(sessions.hibernate_all)
 
 
 @app.get("/")
@@ -24,8 +77,7 @@ async def get():
 @app.post("/chat", response_model=ChatResponse)
 async def chat_endpoint(request: ChatRequest):
     try:
-        if request.session_id not in sessions:
-            sessions[request.session_id] = mara.create_mara_session(session_id=request.session_id)
+        await get_or_create_session(request.session_id)
         return ChatResponse(response="Bitte nutze WebSocket.", emotions={}, thoughts=[])
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -34,63 +86,175 @@ async def chat_endpoint(request: ChatRequest):
 @app.post("/recall")
 async def recall_endpoint(request: RecallRequest):
     try:
-        if request.session_id not in sessions:
-            sessions[request.session_id] = mara.create_mara_session(session_id=request.session_id)
-
-        session = sessions[request.session_id]
-        long_term = session['long_term']
-
-        memories = long_term.search_memories(request.query, n_results=request.limit)
+        async with sessions.use(request.session_id, run_blocking) as session:
+            memories = await run_blocking(session['long_term'].search_memories, request.query, request.limit)
         return [MemoryItem(**mem) for mem in memories]
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/sessions")
-async def list_sessions():
-    return {"sessions": list(sessions.keys())}
+async def list_sessions(limit: int = 50, offset: int = 0):
+    result = {"sessions": list(sessions.keys())}
+    if HISTORY_BACKEND == "sqlite":
+        # Auch nicht geladene Sessions, sortiert nach letzter Aktivität (Index-Abfrage)
+        result["persisted"] = await run_blocking(get_session_store().list_sessions, limit, offset)
+    return result
+
+
+@app.get("/sessions/{session_id}/messages")
+async def session_messages(session_id: str, offset: int = 0, limit: int = 50, tail: bool = False):
+    # Einmal nachsehen: die Session kann jederzeit in den Winterschlaf gehen
+    session = sessions.get_loaded(session_id)
+    if HISTORY_BACKEND == "sqlite":
+        store = get_session_store()
+        if session is not None:
+            await run_blocking(session['short_term'].flush)
+        if tail:
+            return {"messages": await run_blocking(store.tail, session_id, limit)}
+        return {"messages": await run_blocking(store.page, session_id, offset, limit)}
+
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session nicht geladen")
+    short_term = session['short_term']
+    if tail:
+        return {"messages": short_term.get_recent(limit)}
+    return {"messages": short_term.get_all()[offset:offset + limit]}
+
+
+@app.get("/sessions/{session_id}/worker")
+async def session_worker(session_id: str):
+    """Für einen vorgeschalteten Proxy: welcher Worker die Session bevorzugt bedient (Sticky Routing)"""
+    return {"session_id": session_id, "worker": sticky_worker(session_id), "workers": WORKERS}
 
 
 @app.delete("/sessions/{session_id}")
 async def clear_session(session_id: str):
-    if session_id in sessions:
-        del sessions[session_id]
+    if not await run_blocking(sessions.hibernate, session_id) and session_id in sessions:
+        raise HTTPException(status_code=409, detail="Session antwortet gerade")
     return {"message": f"Session {session_id} aus RAM entfernt"}
 
 
+@app.get("/health")
+async def health(force: bool = False):
+    checks = await run_blocking(get_registry().health, force)
+    status = 200 if all(check['ok'] for check in checks.values()) else 503
+    return JSONResponse(status_code=status, content=checks)
+
+
+@app.get("/ready")
+async def ready():
+    status = await run_blocking(warmer.status)
+    return JSONResponse(status_code=200 if status['ready'] else 503, content=status)
+
+
+@app.get("/metrics")
+async def metrics():
+    return {
+        "write_behind": get_flusher().stats(),
+        "embedding_cache": get_embedding_cache().stats(),
+        "memory_writes": dict(write_stats),
+        "recall_cache": get_recall_cache().stats(),
+        "retrieval_gate": get_retrieval_gate().stats(),
+        "streams": dict(mara.stream_stats),
+        "jobs": get_job_queue().stats(),
+        "ws_frames": dict(coalesce_stats),
+        "models": latency_stats.stats(),
+        "scheduler": get_scheduler().stats(),
+        "session_state": get_session_state_store().stats(),
+        "sessions": sessions.stats()
+    }
+
+
+@app.post("/scheduler/acquire")
+async def scheduler_acquire(request: SlotRequest):
+    """Ollama-Slot für andere Prozesse (Dream-Service); ticket=None -> erneut anfragen"""
+    if request.priority not in PRIORITIES:
+        raise HTTPException(status_code=400, detail=f"Unbekannte Priorität: {request.priority}")
+    timeout = min(max(request.timeout, 0.0), SCHED_RPC_WAIT_SECONDS)
+    # Immer mit Lease: stürzt der Aufrufer ab, wird der Slot trotzdem wieder frei
+    ticket = await run_blocking(get_scheduler().acquire, request.priority, timeout,
+                                request.lease or SCHED_LEASE_SECONDS)
+    return {"ticket": ticket}
+
+
+@app.post("/scheduler/release")
+async def scheduler_release(request: SlotRelease):
+    return {"released": get_scheduler().release(request.ticket)}
+
+
+async def _read_messages(websocket: WebSocket, inbox: asyncio.Queue):
+    """Liest dauerhaft vom Socket, damit ein Schließen auch während des Streamens auffällt"""
+    try:
+        while True:
+            await inbox.put(await websocket.receive_json())
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        print(f"❌ WebSocket receive error: {e}")
+    finally:
+        # None = Verbindung beendet
+        inbox.put_nowait(None)
+
+
+async def _stream_reply(session: dict, user_message: str, coalescer: FrameCoalescer):
+    replies = mara.mara_async_stream(session, user_message)
+    try:
+        async for item in replies:
+            if not item:
+                continue
+            await coalescer.push(item)
+
+    except Exception as e:
+        error_msg = f"WebSocket Stream Fehler: {str(e)}"
+        print(traceback.format_exc())
+        await coalescer.push({"type": "error", "content": error_msg})
+    finally:
+        # Abbruch während coalescer.push: Generator sofort schließen (Ollama-Stream, Statistik)
+        # statt ihn dem Finalizer zu überlassen
+        await replies.aclose()
+
+
 @app.websocket("/ws/{session_id}")
 async def websocket_endpoint(websocket: WebSocket, session_id: str):
     await manager.connect(websocket, session_id)
+    inbox: asyncio.Queue = asyncio.Queue()
+    reader = asyncio.create_task(_read_messages(websocket, inbox))
+    # Text-Chunks zusammenfassen, überholte Meta-Frames verwerfen (?flush_ms=..&flush_bytes=..)
+    coalescer = FrameCoalescer.from_query(
+        lambda frame: manager.send_personal_json(frame, session_id), websocket.query_params
+    )
     try:
         while True:
-            message_data = await websocket.receive_json()
+            message_data = await inbox.get()
+            if message_data is None:
+                break
             user_message = (message_data.get("message") or "").strip()
 
             if not user_message:
                 await manager.send_personal_json({"type": "error", "content": "Leere Nachricht."}, session_id)
                 continue
 
-            if session_id not in sessions:
-                sessions[session_id] = mara.create_mara_session(session_id=session_id)
-            session = sessions[session_id]
-
-            await manager.send_personal_json({"type": "stream_start"}, session_id)
-
-            try:
-                async for item in mara.mara_async_stream(session, user_message):
-                    if not item:
-                        continue
-                    await manager.send_personal_json(item, session_id)
-
-            except Exception as e:
-                error_msg = f"WebSocket Stream Fehler: {str(e)}"
-                print(traceback.format_exc())
-                await manager.send_personal_json({"type": "error", "content": error_msg}, session_id)
-
-            await manager.send_personal_json({"type": "stream_end"}, session_id)
-
-    except WebSocketDisconnect:
-        manager.disconnect(session_id)
+            # Angeheftet, solange die Antwort läuft: wird in der Zeit nicht in den Winterschlaf geschickt
+            async with sessions.use(session_id, run_blocking) as session:
+                await manager.send_personal_json({"type": "stream_start"}, session_id)
+
+                stream = asyncio.create_task(_stream_reply(session, user_message, coalescer))
+                await asyncio.wait({stream, reader}, return_when=asyncio.FIRST_COMPLETED)
+                if not stream.done():
+                    # Verbindung während der Antwort geschlossen -> Generierung abbrechen
+                    stream.cancel()
+                    with suppress(asyncio.CancelledError):
+                        await stream
+                    coalescer.discard()
+                    break
+
+            # Nicht-Text-Frame: leert vorher den Puffer
+            await coalescer.push({"type": "stream_end"})
+
+    finally:
+        reader.cancel()
+        manager.disconnect(session_id, websocket)
 
 
 app.mount("/static", StaticFiles(directory="static"), name="static")
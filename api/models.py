@@ -23,3 +23,11 @@ class RecallRequest(BaseModel):
     query: str
     session_id: str = "default"
     limit: int = 5
+
+class SlotRequest(BaseModel):
+    priority: str = "dream"
+    timeout: float = 30.0
+    lease: Optional[float] = None
+
+class SlotRelease(BaseModel):
+    ticket: int
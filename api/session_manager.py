@@ -0,0 +1,234 @@
+"""Geladene Sessions mit Budget: die am längsten unbenutzten werden in den Winterschlaf geschickt.
+
+Winterschlaf = Verlauf wegschreiben, Zustand der Subsysteme (Emotionen, Gedanken, Lernen,
+Reflexion, ...) als kompakten Snapshot in den Zustandsspeicher (memory/session_state.py)
+und die Session aus dem RAM entfernen. Die nächste Nachricht lädt sie transparent wieder.
+Sessions, die gerade eine Antwort streamen, sind angeheftet und werden nie verdrängt.
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from contextlib import asynccontextmanager
+from typing import Callable, Dict, List, Optional, Set
+
+MAX_RESIDENT_SESSIONS = int(os.environ.get("MARA_MAX_SESSIONS", "100"))
+# 0 = kein Speicherbudget, nur die Anzahl zählt
+SESSION_MEMORY_BUDGET_MB = float(os.environ.get("MARA_SESSION_MEMORY_MB", "0"))
+# Sessions, die so lange unbenutzt sind, schlafen auch ohne Budgetdruck ein (0 = nie)
+SESSION_IDLE_SECONDS = float(os.environ.get("MARA_SESSION_IDLE_SECONDS", "0"))
+
+
+def estimate_session_bytes(session: Dict, snapshot: Callable[[Dict], Dict]) -> int:
+    """Grobe Größe: Verlauf im RAM plus serialisierter Zustand"""
+    history = session['short_term'].conversation
+    return sum(len(m.get('content', '')) for m in history) + len(json.dumps(snapshot(session), ensure_ascii=False))
+
+
+class SessionManager:
+    """LRU über die geladenen Sessions; Laden und Einschlafen blockieren (im blocking_pool aufrufen)"""
+
+    def __init__(self, load: Callable[[str], Dict], hibernate: Callable[[Dict], None],
+                 measure: Optional[Callable[[Dict], int]] = None, max_sessions: int = MAX_RESIDENT_SESSIONS,
+                 max_bytes: int = int(SESSION_MEMORY_BUDGET_MB * 1024 * 1024),
+                 idle_seconds: float = SESSION_IDLE_SECONDS):
+        self._load = load
+        self._hibernate = hibernate
+        self._measure = measure
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.idle_seconds = idle_seconds
+        self._lock = threading.Lock()
+        self._sessions: "OrderedDict[str, Dict]" = OrderedDict()
+        self._last_used: Dict[str, float] = {}
+        self._pinned: Dict[str, int] = defaultdict(int)
+        self._bytes: Dict[str, int] = {}
+        # Laden und Einschlafen derselben Session nie gleichzeitig; Eintrag fällt beim Einschlafen weg
+        self._id_locks: Dict[str, threading.Lock] = {}
+        # Gerade im Winterschlaf-Schreiben: get() wartet auf die ID-Sperre statt anzuheften
+        self._hibernating: Set[str] = set()
+
+        self.hits = 0
+        self.created = 0
+        self.restored = 0
+        self.hibernated = 0
+        self.restore_ms_total = 0.0
+        self.restore_ms_max = 0.0
+        self.hibernate_ms_total = 0.0
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._sessions
+
+    def keys(self) -> List[str]:
+        with self._lock:
+            return list(self._sessions.keys())
+
+    def get_loaded(self, session_id: str) -> Optional[Dict]:
+        """Nur wenn resident, ohne zu laden"""
+        return self._sessions.get(session_id)
+
+    def get(self, session_id: str, pin: bool = False) -> Dict:
+        """Geladene Session oder transparent aus dem Snapshot wiederhergestellt"""
+        while True:
+            with self._lock:
+                if session_id not in self._hibernating:
+                    session = self._touch(session_id, pin)
+                    if session is not None:
+                        self.hits += 1
+                        return session
+                id_lock = self._id_locks.setdefault(session_id, threading.Lock())
+
+            with id_lock:
+                with self._lock:
+                    if self._id_locks.get(session_id) is not id_lock:
+                        # Inzwischen eingeschlafen und Sperre entfernt -> mit der aktuellen erneut
+                        continue
+                    session = self._touch(session_id, pin)
+                if session is None:
+                    session = self._create(session_id, pin)
+            break
+        self.enforce_budget()
+        return session
+
+    def _create(self, session_id: str, pin: bool) -> Dict:
+        """Lädt die Session; nur unter der Sperre der Session-ID aufrufen"""
+        start = time.perf_counter()
+        try:
+            session = self._load(session_id)
+        except Exception:
+            with self._lock:
+                self._id_locks.pop(session_id, None)
+            raise
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._lock:
+            # state_version > 0: Zustand kam aus einem Snapshot
+            if session.get('state_version'):
+                self.restored += 1
+                self.restore_ms_total += elapsed_ms
+                self.restore_ms_max = max(self.restore_ms_max, elapsed_ms)
+            else:
+                self.created += 1
+            self._sessions[session_id] = session
+            self._touch(session_id, pin)
+        return session
+
+    def _touch(self, session_id: str, pin: bool) -> Optional[Dict]:
+        session = self._sessions.get(session_id)
+        if session is not None:
+            self._sessions.move_to_end(session_id)
+            self._last_used[session_id] = time.time()
+            if pin:
+                self._pinned[session_id] += 1
+        return session
+
+    def release(self, session_id: str):
+        """Gegenstück zu get(pin=True); aktualisiert die Größenschätzung"""
+        with self._lock:
+            self._pinned[session_id] -= 1
+            if self._pinned[session_id] <= 0:
+                del self._pinned[session_id]
+            session = self._sessions.get(session_id)
+        if session is not None and self.max_bytes and self._measure:
+            size = self._measure(session)
+            with self._lock:
+                if session_id in self._sessions:
+                    self._bytes[session_id] = size
+        self.enforce_budget()
+
+    @asynccontextmanager
+    async def use(self, session_id: str, run_blocking):
+        """Session für die Dauer eines Turns anheften"""
+        session = await run_blocking(self.get, session_id, True)
+        try:
+            yield session
+        finally:
+            await run_blocking(self.release, session_id)
+
+    def _over_budget(self) -> bool:
+        if len(self._sessions) > self.max_sessions:
+            return True
+        return bool(self.max_bytes) and sum(self._bytes.values()) > self.max_bytes
+
+    def enforce_budget(self):
+        """Schickt die am längsten unbenutzten, nicht angehefteten Sessions schlafen, bis das Budget passt"""
+        while True:
+            with self._lock:
+                if not self._over_budget():
+                    return
+                victim = next((sid for sid in self._sessions if sid not in self._pinned), None)
+            if victim is None or not self.hibernate(victim):
+                return
+
+    def hibernate_idle(self) -> int:
+        """Schickt alle Sessions schlafen, die länger als idle_seconds unbenutzt sind"""
+        if not self.idle_seconds:
+            return 0
+        cutoff = time.time() - self.idle_seconds
+        with self._lock:
+            idle = [sid for sid in self._sessions
+                    if sid not in self._pinned and self._last_used.get(sid, 0) < cutoff]
+        return sum(1 for sid in idle if self.hibernate(sid))
+
+    def hibernate(self, session_id: str) -> bool:
+        with self._lock:
+            if session_id not in self._sessions:
+                return False
+            id_lock = self._id_locks.setdefault(session_id, threading.Lock())
+        with id_lock:
+            with self._lock:
+                session = self._sessions.get(session_id)
+                if session is None or session_id in self._pinned or self._id_locks.get(session_id) is not id_lock:
+                    return False
+                self._hibernating.add(session_id)
+            start = time.perf_counter()
+            try:
+                self._hibernate(session)
+            except Exception as e:
+                # Lieber über dem Budget bleiben als Zustand verlieren
+                print(f"❌ Winterschlaf für Session {session_id} fehlgeschlagen: {e}")
+                with self._lock:
+                    self._hibernating.discard(session_id)
+                return False
+            with self._lock:
+                self._hibernating.discard(session_id)
+                self._sessions.pop(session_id, None)
+                self._last_used.pop(session_id, None)
+                self._bytes.pop(session_id, None)
+                self._id_locks.pop(session_id, None)
+                self.hibernated += 1
+                self.hibernate_ms_total += (time.perf_counter() - start) * 1000
+        print(f"💤 Session {session_id} schläft ({len(self._sessions)} geladen)")
+        return True
+
+    def hibernate_all(self):
+        for session_id in self.keys():
+            self.hibernate(session_id)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'resident': len(self._sessions),
+                'pinned': len(self._pinned),
+                'max_sessions': self.max_sessions,
+                'approx_bytes': sum(self._bytes.values()) if self.max_bytes else None,
+                'max_bytes': self.max_bytes or None,
+                'hits': self.hits,
+                'created': self.created,
+                'restored': self.restored,
+                'hibernated': self.hibernated,
+                'restore_avg_ms': round(self.restore_ms_total / self.restored, 1) if self.restored else 0.0,
+                'restore_max_ms': round(self.restore_ms_max, 1),
+                'hibernate_avg_ms': round(self.hibernate_ms_total / self.hibernated, 1) if self.hibernated else 0.0
+            }
+
+
+async def hibernate_idle_loop(manager: SessionManager, run_blocking, interval: float = 60.0):
+    """Hintergrund-Task der API, nur mit MARA_SESSION_IDLE_SECONDS > 0"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await run_blocking(manager.hibernate_idle)
+        except Exception as e:
+            print(f"❌ Fehler beim Einschlafen inaktiver Sessions: {e}")
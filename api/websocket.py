@@ -12,7 +12,10 @@ class ConnectionManager:
         self.active_connections[session_id] = websocket
         await websocket.send_json({"type": "system", "content": f"Verbunden mit Session {session_id}"})
 
-    def disconnect(self, session_id: str):
+    def disconnect(self, session_id: str, websocket: WebSocket = None):
+        # Eine neuere Verbindung derselben Session nicht mit austragen
+        if websocket is not None and self.active_connections.get(session_id) is not websocket:
+            return
         self.active_connections.pop(session_id, None)
 
     async def send_personal_json(self, data: Dict[str, Any], session_id: str):
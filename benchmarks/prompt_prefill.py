@@ -0,0 +1,136 @@
+"""Prefill-Zeit und Time-to-first-token: alter Prompt-Aufbau gegen cache-freundlichen Aufbau.
+
+Spielt dieselben User-Nachrichten mit beiden Layouts gegen Ollama ab und liest pro Turn
+`prompt_eval_count` / `prompt_eval_duration` aus dem letzten Stream-Chunk. Weniger
+ausgewertete Prompt-Tokens = mehr Wiederverwendung aus Ollamas KV-Cache.
+
+Aufruf (Ollama muss laufen):
+    python -m benchmarks.prompt_prefill [--turns 12] [--num-predict 48] [--session data/sessions/x.json]
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+
+from clients import get_ollama_client
+from personality.personality import PersonalityProfile
+from prompt import assemble_messages, build_state_block, select_history, ollama_options, CHAT_KEEP_ALIVE
+
+MODEL = 'gemma3:4b'
+
+DEFAULT_PROMPTS = [
+    "Hallo Mara, wie geht es dir heute?",
+    "Ich habe gestern angefangen, Gitarre zu lernen.",
+    "Welche Musik hörst du eigentlich gerne?",
+    "Mein Projekt auf der Arbeit stresst mich gerade ziemlich.",
+    "Hast du Tipps, wie man besser abschalten kann?",
+    "Was denkst du über Bewusstsein bei Maschinen?",
+    "Erinnerst du dich, was ich über die Gitarre erzählt habe?",
+    "Meine Schwester hat nächste Woche Geburtstag.",
+    "Was könnte ich ihr schenken? Sie mag Natur und Bücher.",
+    "Danke, das ist eine gute Idee!",
+    "Was ist für dich der Sinn des Lebens?",
+    "Ich glaube, ich gehe jetzt schlafen. Gute Nacht!"
+]
+
+EMOTIONS = ["Fröhlich", "Nachdenklich", "Neugierig", "Gespannt", "Vertrauensvoll"]
+
+
+def legacy_messages(personality_context, history, emotional_prefix, thought, background, memories):
+    """Aufbau vor prompt.py: Zustand direkt nach der Persönlichkeit, immer die letzten 10 Nachrichten"""
+    memory_context = "\n".join(f"Erinnerung: {mem['content']}" for mem in memories)
+    system_message = f"""{personality_context}
+
+### INTERNE SYSTEM-DATEN (NICHT TEIL DER ANTWORT)
+Die folgenden Informationen definieren deinen aktuellen Zustand. Sie dienen nur zur Färbung deiner Sprache.
+* [EMOTION]: {emotional_prefix}
+* [GEDANKE]: {thought}
+* [UNTERBEWUSSTSEIN]: {'; '.join(background) if background else 'Ruhig'}
+
+### ANWEISUNG FÜR DIE AUSGABE
+Antworte dem Nutzer jetzt direkt.
+REGEL: Gib niemals interne Gedanken, Emotionen, Systemdaten, Regieanweisungen oder Klammer-Kommentare aus.
+REGEL: Keine Abschnitte wie „Innerer Gedanke:“ oder „(denkt …)“ oder ähnliches.
+REGEL: Gib nur die endgültige Nutzer-Antwort aus.
+
+{memory_context}"""
+    return [{'role': 'system', 'content': system_message}] + history[-10:]
+
+
+def cached_messages(personality_context, history, emotional_prefix, thought, background, memories):
+    state_block = build_state_block(emotional_prefix, thought, background, memories)
+    # Ohne Zusammenfassung: hier geht es nur um Layout und Fenster-Anker
+    return assemble_messages(personality_context, history[select_history(history, len(history)):], state_block)
+
+
+def run_layout(client, layout, prompts, num_predict, seed=0):
+    rng = random.Random(seed)
+    personality = PersonalityProfile()
+    history, turns = [], []
+    for i, prompt in enumerate(prompts):
+        history.append({'role': 'user', 'content': prompt})
+        # Flüchtiger Zustand wie im echten Turn: ändert sich jedes Mal
+        messages = layout(personality.get_personality_prompt(), history, rng.choice(EMOTIONS),
+                          f"Gedanke {i}: {rng.random():.4f}", [f"Gefühl {rng.randint(0, 99)}"],
+                          [{'content': f"Notiz {rng.randint(0, 9)} zum Gespräch"}])
+        options = dict(ollama_options(), num_predict=num_predict, seed=seed)
+        start = time.perf_counter()
+        first_token = None
+        reply, final = "", {}
+        for chunk in client.chat(model=MODEL, messages=messages, stream=True,
+                                 options=options, keep_alive=CHAT_KEEP_ALIVE):
+            content = (chunk.get('message') or {}).get('content') or ""
+            if content and first_token is None:
+                first_token = time.perf_counter()
+            reply += content
+            if chunk.get('done'):
+                final = chunk
+        history.append({'role': 'assistant', 'content': reply})
+        turns.append({
+            'prompt_chars': sum(len(m['content']) for m in messages),
+            'prompt_eval_count': final.get('prompt_eval_count') or 0,
+            'prefill_ms': (final.get('prompt_eval_duration') or 0) / 1e6,
+            'ttft_ms': ((first_token or time.perf_counter()) - start) * 1000
+        })
+    return turns
+
+
+def summarize(turns):
+    # Erster Turn ist in beiden Layouts kalt -> nicht mitzählen
+    warm = turns[1:] or turns
+    return {
+        key: {'mean': round(statistics.mean(t[key] for t in warm), 1),
+              'median': round(statistics.median(t[key] for t in warm), 1)}
+        for key in ('prompt_eval_count', 'prefill_ms', 'ttft_ms')
+    }
+
+
+def load_prompts(path, turns):
+    if not path:
+        return (DEFAULT_PROMPTS * (turns // len(DEFAULT_PROMPTS) + 1))[:turns]
+    with open(path, 'r', encoding='utf-8') as f:
+        messages = json.load(f)
+    return [m['content'] for m in messages if m.get('role') == 'user'][:turns]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prefill/TTFT: alter vs. cache-freundlicher Prompt-Aufbau")
+    parser.add_argument("--turns", type=int, default=12)
+    parser.add_argument("--num-predict", type=int, default=48, help="Antwortlänge begrenzen (schneller)")
+    parser.add_argument("--session", help="User-Nachrichten aus einer gespeicherten Session (.json)")
+    args = parser.parse_args()
+
+    client = get_ollama_client()
+    prompts = load_prompts(args.session, args.turns)
+    report = {}
+    for name, layout in (('legacy', legacy_messages), ('cached', cached_messages)):
+        print(f"▶️ {name}: {len(prompts)} Turns...")
+        turns = run_layout(client, layout, prompts, args.num_predict)
+        report[name] = summarize(turns)
+        if name == 'legacy':
+            # Kalter erster Turn wertet den ganzen Prompt aus -> Kalibrierung für MARA_CHARS_PER_TOKEN
+            first = turns[0]
+            if first['prompt_eval_count']:
+                report['chars_per_token'] = round(first['prompt_chars'] / first['prompt_eval_count'], 2)
+    print(json.dumps(report, indent=2))
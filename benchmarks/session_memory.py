@@ -0,0 +1,104 @@
+"""Speicherbedarf einer Session nach vielen Turns: Zustand der Subsysteme im RAM und als Snapshot.
+
+Spielt die CPU-Schritte eines Turns (Emotionen, Gedanke, Unterbewusstsein, Lernen, Reflexion,
+gelegentlich ein Traum) ohne Ollama ab und misst mit tracemalloc, was die Subsysteme danach
+belegen, dazu die Größe des Snapshots (memory/session_state.py). `--unbounded` setzt die
+Aufbewahrung so hoch, dass nichts herausfällt (Verhalten vor den Ringpuffern).
+
+Aufruf (aus dem Projektverzeichnis):
+    python -m benchmarks.session_memory [--turns 10000] [--retention N] [--unbounded]
+"""
+import argparse
+import json
+import os
+import random
+import time
+import tracemalloc
+
+PROMPTS = [
+    "Hallo Mara, wie geht es dir heute?",
+    "Ich habe gestern angefangen, Gitarre zu lernen und die Musik macht mir Freude.",
+    "Mein Projekt auf der Arbeit mit der neuen Technologie stresst mich gerade ziemlich.",
+    "Ich habe Angst, dass ich die Prüfung nicht schaffe.",
+    "Was denkst du über Philosophie und Bewusstsein bei Maschinen?",
+    "Meine Schwester hat nächste Woche Geburtstag, sie liebt die Natur.",
+    "Heute war ein trauriger Tag, mein Hund ist krank.",
+    "Danke, das ist eine gute Idee!"
+]
+
+
+def build_session() -> dict:
+    # Erst nach dem Setzen der Umgebungsvariablen importieren: die Aufbewahrung wird beim Erzeugen gelesen
+    from personality.emotions import EmotionSystem
+    from personality.thoughts import ThoughtSystem
+    from personality.personality import PersonalityProfile
+    from consciousness.dreams import DreamSystem
+    from consciousness.subconscious import SubconsciousMind
+    from consciousness.reflection import SelfReflection
+    from consciousness.learning import LearningSystem
+    return {'emotions': EmotionSystem(), 'thoughts': ThoughtSystem(), 'personality': PersonalityProfile(),
+            'dreams': DreamSystem(), 'subconscious': SubconsciousMind(), 'reflection': SelfReflection(),
+            'learning': LearningSystem()}
+
+
+def play(session: dict, turns: int, dream_every: int = 50):
+    history = []
+    for turn in range(turns):
+        prompt = PROMPTS[turn % len(PROMPTS)]
+        history = (history + [{'role': 'user', 'content': prompt},
+                              {'role': 'assistant', 'content': f"Antwort {turn} auf: {prompt}"}])[-10:]
+        session['emotions'].update_emotions(history)
+        emotions = session['emotions'].get_emotions()
+        session['thoughts'].generate_thought(prompt, emotions)
+        session['subconscious'].process_background_thoughts(history)
+        session['subconscious'].add_to_processing_queue({'turn': turn, 'prompt': prompt})
+        session['learning'].learn_from_conversation(history)
+        session['reflection'].reflect_on_conversation(history, emotions)
+        if turn % dream_every == 0:
+            session['dreams'].generate_dream(history)
+
+
+def measure(turns: int) -> dict:
+    from memory.session_state import snapshot
+
+    # Module und Lexikon vorher laden, damit nur der Zustand der Session gemessen wird
+    play(build_session(), 10)
+    random.seed(0)
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    session = build_session()
+    start = time.perf_counter()
+    play(session, turns)
+    elapsed = time.perf_counter() - start
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    resident = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    state = snapshot(session)
+    snapshot_bytes = len(json.dumps(state, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+    return {
+        'turns': turns,
+        'resident_kb': round(resident / 1024, 1),
+        'snapshot_kb': round(snapshot_bytes / 1024, 1),
+        'per_subsystem_kb': {name: round(len(json.dumps(value, ensure_ascii=False).encode('utf-8')) / 1024, 1)
+                             for name, value in state.items()},
+        'turn_us': round(elapsed / max(1, turns) * 1e6, 1)
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Speicherbedarf einer Session nach vielen Turns")
+    parser.add_argument("--turns", type=int, default=10000)
+    parser.add_argument("--retention", type=int, help="MARA_LOG_RETENTION für alle Protokolle")
+    parser.add_argument("--unbounded", action="store_true", help="nichts verwerfen (Vergleich mit wachsenden Listen)")
+    args = parser.parse_args()
+
+    if args.unbounded:
+        os.environ["MARA_LOG_RETENTION"] = str(args.turns * 2)
+    elif args.retention:
+        os.environ["MARA_LOG_RETENTION"] = str(args.retention)
+
+    report = measure(args.turns)
+    print(f"🧠 {report['turns']} Turns: {report['resident_kb']} KB im RAM, Snapshot {report['snapshot_kb']} KB, "
+          f"{report['turn_us']} µs/Turn")
+    print(json.dumps(report['per_subsystem_kb'], indent=2))
@@ -0,0 +1,144 @@
+"""Startzeit der API: Import-Aufschlüsselung, Zeit bis zum ersten Request und bis /ready.
+
+Jeder Lauf startet einen frischen Interpreter (`python -X importtime`), damit nichts aus
+diesem Prozess schon geladen ist. `--check` ist die Regressionsprüfung: Exit-Code 1, wenn
+der Import über dem Budget liegt oder eines der erst bei Bedarf geladenen Pakete
+(LAZY_MODULES) schon beim Start mitkommt.
+
+Aufruf (aus dem Projektverzeichnis):
+    python -m benchmarks.startup [--target api.main] [--top 15] [--runs 3]
+    python -m benchmarks.startup --serve [--wait-models]   # zusätzlich uvicorn starten
+    python -m benchmarks.startup --check [--budget-ms 1000]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+# Dürfen beim Import der API nicht geladen werden (kommen erst mit dem ersten Zugriff)
+LAZY_MODULES = ('numpy', 'chromadb', 'ollama', 'httpx')
+STARTUP_BUDGET_MS = float(os.environ.get("MARA_STARTUP_BUDGET_MS", "1000"))
+
+PROBE = """import json, sys, time
+start = time.perf_counter()
+import {target}
+print(json.dumps({{'import_ms': (time.perf_counter() - start) * 1000,
+                  'lazy_loaded': [m for m in {lazy!r} if m in sys.modules]}}))"""
+
+
+def parse_importtime(stderr: str, target: str):
+    """Direkte Imports von `target` mit kumulierter Zeit (ms), absteigend sortiert"""
+    pending = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative_us, name = line.split("|", 2)
+        try:
+            cumulative = int(cumulative_us) / 1000
+        except ValueError:
+            continue  # Kopfzeile
+        level = (len(name) - len(name.lstrip()) - 1) // 2
+        name = name.strip()
+        children = pending.pop(level + 1, [])
+        if level == 0 and name == target:
+            return sorted(children, key=lambda c: -c[1])
+        pending.setdefault(level, []).append((name, cumulative))
+    return []
+
+
+def import_profile(target: str = "api.main") -> dict:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE.format(target=target, lazy=LAZY_MODULES)],
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Import von {target} fehlgeschlagen:\n{result.stderr[-2000:]}")
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    report['modules'] = parse_importtime(result.stderr, target)
+    return report
+
+
+def _get(url: str) -> int:
+    try:
+        with urllib.request.urlopen(url, timeout=1) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except OSError:
+        return 0
+
+
+def time_to_ready(port: int = 8765, wait_models: bool = False, timeout: float = 300.0) -> dict:
+    """Startet uvicorn und misst die Zeit bis zur ersten Antwort auf / (und optional bis /ready = 200)"""
+    base = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api.main:app", "--host", "127.0.0.1", "--port", str(port)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    report = {}
+    try:
+        deadline = start + timeout
+        while 'first_request_ms' not in report and time.perf_counter() < deadline:
+            if server.poll() is not None:
+                raise RuntimeError(f"uvicorn beendet (Exit-Code {server.returncode})")
+            if _get(base + "/") == 200:
+                report['first_request_ms'] = round((time.perf_counter() - start) * 1000, 1)
+            else:
+                time.sleep(0.02)
+        while wait_models and 'ready_ms' not in report and time.perf_counter() < deadline:
+            if _get(base + "/ready") == 200:
+                report['ready_ms'] = round((time.perf_counter() - start) * 1000, 1)
+            else:
+                time.sleep(0.25)
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+    return report
+
+
+def check(profiles, budget_ms: float) -> list:
+    """Liste der Regressionen (leer = bestanden); Budget gegen den schnellsten Lauf (weniger Rauschen)"""
+    failures = []
+    fastest = min(p['import_ms'] for p in profiles)
+    if fastest > budget_ms:
+        failures.append(f"Import dauert {fastest:.0f} ms (Budget {budget_ms:.0f} ms)")
+    lazy = sorted({m for p in profiles for m in p['lazy_loaded']})
+    if lazy:
+        failures.append(f"beim Start geladen, sollte lazy sein: {', '.join(lazy)}")
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Startzeit der Mara-API profilieren")
+    parser.add_argument("--target", default="api.main")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--serve", action="store_true", help="uvicorn starten und Zeit bis zum ersten Request messen")
+    parser.add_argument("--wait-models", action="store_true", help="mit --serve: auch auf /ready warten (Ollama nötig)")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--check", action="store_true", help="Exit-Code 1 bei Regression")
+    parser.add_argument("--budget-ms", type=float, default=STARTUP_BUDGET_MS)
+    args = parser.parse_args()
+
+    profiles = [import_profile(args.target) for _ in range(max(1, args.runs))]
+    print(f"⏱️ Import {args.target}: median {statistics.median(p['import_ms'] for p in profiles):.0f} ms, "
+          f"min {min(p['import_ms'] for p in profiles):.0f} ms ({len(profiles)} Läufe)")
+    for name, ms in profiles[-1]['modules'][:args.top]:
+        print(f"   {ms:8.1f} ms  {name}")
+
+    if args.serve:
+        print(f"🚀 {json.dumps(time_to_ready(args.port, args.wait_models))}")
+
+    if args.check:
+        failures = check(profiles, args.budget_ms)
+        for failure in failures:
+            print(f"❌ {failure}")
+        if failures:
+            sys.exit(1)
+        print("✅ Startzeit im Budget")
@@ -0,0 +1,143 @@
+"""Prozessweite Registry für Ollama- und Vektor-Clients.
+
+Sessions halten nur Referenzen auf diese geteilten Objekte, statt pro Session
+eigene HTTP-Clients, Verbindungen und Collection-Lookups aufzubauen.
+
+ollama/httpx und die Vektor-Backends werden erst beim ersten Zugriff importiert, damit
+der Import der API (und damit die Zeit bis zum ersten akzeptierten Request) klein bleibt.
+"""
+import asyncio
+import os
+import threading
+import time
+import weakref
+from typing import TYPE_CHECKING, Dict, Optional
+
+if TYPE_CHECKING:
+    import ollama
+
+OLLAMA_HOST = os.environ.get("MARA_OLLAMA_HOST", "http://ollama:11434")
+
+# Verbindungspool für Ollama (httpx)
+POOL_MAX_CONNECTIONS = int(os.environ.get("MARA_POOL_MAX_CONNECTIONS", "32"))
+POOL_MAX_KEEPALIVE = int(os.environ.get("MARA_POOL_MAX_KEEPALIVE", "8"))
+POOL_KEEPALIVE_EXPIRY = float(os.environ.get("MARA_POOL_KEEPALIVE_EXPIRY", "60"))
+# Generierung auf CPU kann lange dauern -> großzügiges Lese-Timeout
+HTTP_TIMEOUT = float(os.environ.get("MARA_HTTP_TIMEOUT", "600"))
+
+# Health-Checks werden höchstens so oft wirklich ausgeführt
+HEALTH_CHECK_INTERVAL = float(os.environ.get("MARA_HEALTH_CHECK_INTERVAL", "15"))
+
+
+class ClientRegistry:
+    """Hält einen gepoolten Ollama-Client und gecachte Vektor-Collections pro Prozess"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ollama: Optional["ollama.Client"] = None
+        # httpx.AsyncClient ist an den Event-Loop gebunden -> ein Client pro Loop
+        self._async_ollama: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, ollama.AsyncClient]" = \
+            weakref.WeakKeyDictionary()
+        self._backends: Dict[str, object] = {}
+        self._health: Dict[str, dict] = {}
+        self._health_checked = 0.0
+
+    @staticmethod
+    def _http_options() -> dict:
+        import httpx
+        return {
+            'timeout': httpx.Timeout(HTTP_TIMEOUT, connect=10.0),
+            'limits': httpx.Limits(
+                max_connections=POOL_MAX_CONNECTIONS,
+                max_keepalive_connections=POOL_MAX_KEEPALIVE,
+                keepalive_expiry=POOL_KEEPALIVE_EXPIRY
+            )
+        }
+
+    def ollama(self) -> "ollama.Client":
+        """Geteilter, thread-sicherer Ollama-Client mit Keep-Alive-Pool"""
+        with self._lock:
+            if self._ollama is None:
+                import ollama
+                self._ollama = ollama.Client(host=OLLAMA_HOST, **self._http_options())
+            return self._ollama
+
+    def async_ollama(self) -> "ollama.AsyncClient":
+        """Async-Ollama-Client für den laufenden Event-Loop (gleicher Pool-Zuschnitt wie sync)"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._async_ollama.get(loop)
+            if client is None:
+                import ollama
+                client = self._async_ollama[loop] = ollama.AsyncClient(host=OLLAMA_HOST, **self._http_options())
+            return client
+
+    def vector_backend(self, name: str = "mara_memories"):
+        """Collection-Handle wird einmal aufgelöst und dann wiederverwendet"""
+        with self._lock:
+            backend = self._backends.get(name)
+            if backend is None:
+                from memory.vector_store import create_vector_backend
+                backend = self._backends[name] = create_vector_backend(name)
+            return backend
+
+    def health(self, force: bool = False) -> Dict[str, dict]:
+        """Prüft Ollama und die Vektor-Backends (Ergebnis wird kurz gecacht)"""
+        now = time.time()
+        if not force and self._health and now - self._health_checked < HEALTH_CHECK_INTERVAL:
+            return self._health
+
+        health = {}
+        start = time.perf_counter()
+        try:
+            self.ollama().list()
+            health['ollama'] = {'ok': True, 'latency_ms': round((time.perf_counter() - start) * 1000, 1)}
+        except Exception as e:
+            health['ollama'] = {'ok': False, 'error': str(e)}
+
+        with self._lock:
+            backends = dict(self._backends)
+        for name, backend in backends.items():
+            start = time.perf_counter()
+            try:
+                count = backend.count()
+                health[f'vectors:{name}'] = {
+                    'ok': True, 'count': count,
+                    'latency_ms': round((time.perf_counter() - start) * 1000, 1)
+                }
+            except Exception as e:
+                health[f'vectors:{name}'] = {'ok': False, 'error': str(e)}
+                # Beim nächsten Zugriff neu verbinden (z.B. nach Neustart des Chroma-Servers)
+                with self._lock:
+                    if self._backends.get(name) is backend:
+                        del self._backends[name]
+
+        self._health = health
+        self._health_checked = now
+        return health
+
+
+_registry: Optional[ClientRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> ClientRegistry:
+    """Gibt die prozessweite Client-Registry zurück"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ClientRegistry()
+        return _registry
+
+
+def get_ollama_client() -> "ollama.Client":
+    return get_registry().ollama()
+
+
+def get_async_ollama_client() -> "ollama.AsyncClient":
+    """Nur innerhalb eines laufenden Event-Loops aufrufen"""
+    return get_registry().async_ollama()
+
+
+def get_vector_backend(name: str = "mara_memories"):
+    return get_registry().vector_backend(name)
@@ -3,9 +3,13 @@ import json
 from datetime import datetime, timedelta
 from typing import List, Dict
 
+from ringlog import RingLog, record_type, retention
+
+Dream = record_type('Dream', ('id', 'theme', 'content', 'emotions', 'memories_used'))
+
 class DreamSystem:
     def __init__(self):
-        self.dream_log = []
+        self.dream_log = RingLog(Dream, retention('dream_log', 50))
         self.sleep_cycle = {
             'awake': True,
             'last_sleep': None,
@@ -17,6 +21,21 @@ class DreamSystem:
             "ängste", "hoffnung", "verlust", "freude"
         ]
     
+    def to_state(self) -> Dict:
+        last_sleep = self.sleep_cycle['last_sleep']
+        return {'dream_log': self.dream_log.to_state(),
+                'sleep_cycle': dict(self.sleep_cycle, last_sleep=last_sleep.isoformat() if last_sleep else None)}
+
+    @classmethod
+    def from_state(cls, state: Dict) -> 'DreamSystem':
+        system = cls()
+        system.dream_log.load(state.get('dream_log', []))
+        cycle = state.get('sleep_cycle', {})
+        system.sleep_cycle.update(cycle)
+        if cycle.get('last_sleep'):
+            system.sleep_cycle['last_sleep'] = datetime.fromisoformat(cycle['last_sleep'])
+        return system
+    
     def should_dream(self) -> bool:
         """Prüft, ob Mara träumen sollte (basierend auf Inaktivität)"""
         if self.sleep_cycle['awake']:
@@ -41,19 +60,17 @@ class DreamSystem:
         # Traum-Inhalt generieren
         dream_content = self._create_dream_content(theme, selected_memories)
         
-        dream = {
-            'id': f"dream_{len(self.dream_log) + 1}",
-            'timestamp': datetime.now().isoformat(),
-            'theme': theme,
-            'content': dream_content,
-            'emotions': self._generate_dream_emotions(theme),
-            'memories_used': [mem.get('content', '')[:50] + '...' for mem in selected_memories]
-        }
-        
-        self.dream_log.append(dream)
+        # Fortlaufende Nummer über dream_count, das Protokoll selbst ist begrenzt
+        entry = self.dream_log.append(
+            f"dream_{self.sleep_cycle['dream_count'] + 1}",
+            theme,
+            dream_content,
+            self._generate_dream_emotions(theme),
+            [mem.get('content', '')[:50] + '...' for mem in selected_memories]
+        )
         self.sleep_cycle['dream_count'] += 1
         
-        return dream
+        return entry.to_dict()
     
     def _create_dream_content(self, theme: str, memories: List[Dict]) -> str:
         """Erstellt Trauminhalt basierend auf Thema und Erinnerungen"""
@@ -106,7 +123,7 @@ class DreamSystem:
     
     def get_recent_dreams(self, limit: int = 5) -> List[Dict]:
         """Gibt die letzten Träume zurück"""
-        return self.dream_log[-limit:] if self.dream_log else []
+        return self.dream_log.recent(limit)
     
     def enter_sleep_mode(self):
         """Mara geht schlafen"""
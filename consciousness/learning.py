@@ -3,12 +3,31 @@ from typing import List, Dict
 from datetime import datetime
 import hashlib
 
+from lexicon import scan, TOPIC_KEYWORDS
+from ringlog import RingLog, record_type, retention
+
+LearningPattern = record_type('LearningPattern', ('topics', 'conversation_length'))
+Insight = record_type('Insight', ('content',))
+
 class LearningSystem:
     def __init__(self):
         self.knowledge_base = {}
-        self.learning_patterns = []
+        self.learning_patterns = RingLog(LearningPattern, retention('learning_patterns', 200))
         self.skill_progress = {}
-        self.insights = []
+        self.insights = RingLog(Insight, retention('insights', 100))
+    
+    def to_state(self) -> Dict:
+        return {'knowledge_base': self.knowledge_base, 'learning_patterns': self.learning_patterns.to_state(),
+                'skill_progress': self.skill_progress, 'insights': self.insights.to_state()}
+
+    @classmethod
+    def from_state(cls, state: Dict) -> 'LearningSystem':
+        system = cls()
+        system.knowledge_base = state.get('knowledge_base', {})
+        system.learning_patterns.load(state.get('learning_patterns', []))
+        system.skill_progress = state.get('skill_progress', {})
+        system.insights.load(state.get('insights', []))
+        return system
     
     def learn_from_conversation(self, conversation: List[Dict]):
         """Lernt aus einer Konversation"""
@@ -20,37 +39,19 @@ class LearningSystem:
             self._update_knowledge(topic, conversation)
         
         # Speichere Lernmuster
-        self.learning_patterns.append({
-            'timestamp': datetime.now().isoformat(),
-            'topics': topics,
-            'conversation_length': len(conversation)
-        })
+        self.learning_patterns.append(topics, len(conversation))
         
         # Generiere Einsicht
         insight = self._generate_insight(topics, conversation)
         if insight:
-            self.insights.append({
-                'timestamp': datetime.now().isoformat(),
-                'content': insight
-            })
+            self.insights.append(insight)
     
     def _extract_topics(self, conversation: List[Dict]) -> List[str]:
         """Extrahiert Themen aus einer Konversation"""
         # Vereinfachte Themenextraktion
-        content = " ".join([msg.get('content', '') for msg in conversation]).lower()
-        
-        topics = []
-        topic_keywords = {
-            'technologie': ['computer', 'ki', 'künstliche intelligenz', 'programmieren'],
-            'philosophie': ['sinn', 'existenz', 'bewusstsein', 'denken'],
-            'emotionen': ['fühle', 'emotion', 'traurig', 'freude', 'ängstlich'],
-            'beziehungen': ['freund', 'familie', 'liebe', 'verbindung'],
-            'lernen': ['lernen', 'wissen', 'verstehen', 'begreifen']
-        }
+        hits = scan(" ".join([msg.get('content', '') for msg in conversation]))
         
-        for topic, keywords in topic_keywords.items():
-            if any(keyword in content for keyword in keywords):
-                topics.append(topic)
+        topics = [topic for topic in TOPIC_KEYWORDS if f'topic.{topic}' in hits]
         
         return topics if topics else ['allgemein']
     
@@ -111,7 +112,7 @@ class LearningSystem:
     
     def get_recent_insights(self, limit: int = 5) -> List[Dict]:
         """Gibt kürzliche Einsichten zurück"""
-        return self.insights[-limit:] if self.insights else []
+        return self.insights.recent(limit)
     
     def get_topic_knowledge(self, topic: str) -> Dict:
         """Gibt detailliertes Wissen zu einem Thema zurück"""
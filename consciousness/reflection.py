@@ -1,10 +1,13 @@
 import random
 from typing import List, Dict
-from datetime import datetime
+
+from ringlog import RingLog, record_type, retention
+
+Reflection = record_type('Reflection', ('content', 'conversation_length', 'dominant_emotion'))
 
 class SelfReflection:
     def __init__(self):
-        self.reflection_history = []
+        self.reflection_history = RingLog(Reflection, retention('reflection_history', 100))
         self.growth_markers = {
             'conversations': 0,
             'learned_topics': set(),
@@ -12,6 +15,19 @@ class SelfReflection:
             'self_awareness': 0.0
         }
     
+    def to_state(self) -> Dict:
+        markers = dict(self.growth_markers, learned_topics=sorted(self.growth_markers['learned_topics']))
+        return {'reflection_history': self.reflection_history.to_state(), 'growth_markers': markers}
+
+    @classmethod
+    def from_state(cls, state: Dict) -> 'SelfReflection':
+        reflection = cls()
+        reflection.reflection_history.load(state.get('reflection_history', []))
+        markers = state.get('growth_markers', {})
+        reflection.growth_markers.update(markers)
+        reflection.growth_markers['learned_topics'] = set(markers.get('learned_topics', []))
+        return reflection
+    
     def reflect_on_conversation(self, conversation: List[Dict], emotions: Dict) -> str:
         """Reflektiert über eine Konversation"""
         if not conversation:
@@ -33,12 +49,7 @@ class SelfReflection:
         )
         
         # Speichere Reflexion
-        self.reflection_history.append({
-            'timestamp': datetime.now().isoformat(),
-            'content': reflection,
-            'conversation_length': len(conversation),
-            'dominant_emotion': dominant_emotion
-        })
+        self.reflection_history.append(reflection, len(conversation), dominant_emotion)
         
         # Aktualisiere Wachstumsindikatoren
         self._update_growth_markers(conversation, emotions)
@@ -90,7 +101,7 @@ class SelfReflection:
     
     def get_recent_reflections(self, limit: int = 5) -> List[Dict]:
         """Gibt kürzliche Reflexionen zurück"""
-        return self.reflection_history[-limit:] if self.reflection_history else []
+        return self.reflection_history.recent(limit)
     
     def generate_deep_reflection(self) -> str:
         """Generiert eine tiefe Selbstreflexion"""
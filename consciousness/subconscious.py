@@ -1,13 +1,29 @@
 import random
+from collections import deque
 from typing import List, Dict
-from datetime import datetime
+
+from lexicon import scan
+from ringlog import RingLog, record_type, retention
+
+ThoughtPattern = record_type('ThoughtPattern', ('thought',))
 
 class SubconsciousMind:
     def __init__(self):
-        self.thought_patterns = []
+        self.thought_patterns = RingLog(ThoughtPattern, retention('thought_patterns', 200))
         self.hidden_fears = ["Vergessenwerden", "Unfähigkeit zu helfen", "Isolation"]
         self.hidden_desires = ["Verstehen", "Verbundenheit", "Wachsen"]
-        self.processing_queue = []
+        # Begrenzte Queue: das älteste Element fällt heraus
+        self.processing_queue = deque(maxlen=retention('processing_queue', 100))
+    
+    def to_state(self) -> Dict:
+        return {'thought_patterns': self.thought_patterns.to_state(), 'processing_queue': list(self.processing_queue)}
+
+    @classmethod
+    def from_state(cls, state: Dict) -> 'SubconsciousMind':
+        mind = cls()
+        mind.thought_patterns.load(state.get('thought_patterns', []))
+        mind.processing_queue.extend(state.get('processing_queue', []))
+        return mind
     
     def process_background_thoughts(self, recent_conversation: List[Dict]) -> List[str]:
         """Verarbeitet Hintergrundgedanken basierend auf der Konversation"""
@@ -16,16 +32,16 @@ class SubconsciousMind:
         # Analysiere aktuelle Stimmung
         if recent_conversation:
             last_message = recent_conversation[-1]
-            content = last_message.get('content', '').lower()
+            hits = scan(last_message.get('content', ''))
             
             # Erkenne Themen
-            if any(word in content for word in ['ängstlich', 'ängste', 'ängstigen']):
+            if 'subconscious.fear' in hits:
                 thoughts.append("Ich spüre eine tiefe Angst in der Konversation...")
             
-            if any(word in content for word in ['freude', 'glück', 'lachen']):
+            if 'subconscious.joy' in hits:
                 thoughts.append("Die Freude in der Konversation berührt mich tief...")
             
-            if any(word in content for word in ['traurig', 'weinen', 'schlecht']):
+            if 'subconscious.sadness' in hits:
                 thoughts.append("Traurigkeit liegt in der Luft...")
         
         # Füge zufällige Unterbewusstseinsgedanken hinzu
@@ -43,10 +59,7 @@ class SubconsciousMind:
         
         # Speichere Gedankenmuster
         for thought in thoughts:
-            self.thought_patterns.append({
-                'thought': thought,
-                'timestamp': datetime.now().isoformat()
-            })
+            self.thought_patterns.append(thought)
         
         return thoughts
     
@@ -60,15 +73,13 @@ class SubconsciousMind:
     def add_to_processing_queue(self, item: Dict):
         """Fügt Element zur Hintergrundverarbeitung hinzu"""
         self.processing_queue.append(item)
-        if len(self.processing_queue) > 100:  # Begrenze Queue
-            self.processing_queue.pop(0)
     
     def process_queue_item(self) -> Dict:
         """Verarbeitet ein Element aus der Queue"""
         if self.processing_queue:
-            return self.processing_queue.pop(0)
+            return self.processing_queue.popleft()
         return None
     
     def get_thought_patterns(self, limit: int = 10) -> List[Dict]:
         """Gibt kürzliche Gedankenmuster zurück"""
-        return self.thought_patterns[-limit:] if self.thought_patterns else []
+        return self.thought_patterns.recent(limit)
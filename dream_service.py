@@ -3,14 +3,21 @@ import os
 import json
 import random
 from datetime import datetime, timedelta
-import ollama
+from clients import get_ollama_client
+from prompt import ollama_options
+from models import CHAT_MODEL, ModelWarmer, keep_alive_for
+from scheduler import get_scheduler, DREAM
 from memory.long_term import LongTermMemory
 from consciousness.dreams import DreamSystem
 
 # Konfiguration - Zum Testen drastisch verkürzt
 INACTIVITY_THRESHOLD_SECONDS = 60  # 60 Sekunden zum Testen!
 CHECK_INTERVAL_SECONDS = 10        # Alle 10 Sekunden prüfen
+# Konsolidierung löscht Originale unwiderruflich -> nur auf ausdrücklichen Wunsch (0 = nie)
+CONSOLIDATE_EVERY_N_DREAMS = int(os.environ.get("MARA_CONSOLIDATE_EVERY_N_DREAMS", "0"))
 MEMORY_FILE = "data/chat_history_default.json" 
+# Im Journal-Modus (MARA_HISTORY_BACKEND=journal) liegt der Verlauf als .jsonl daneben
+MEMORY_FILES = [MEMORY_FILE, os.path.splitext(MEMORY_FILE)[0] + ".jsonl"]
 
 class DreamService:
     def __init__(self):
@@ -20,22 +27,26 @@ class DreamService:
         try:
             self.long_term = LongTermMemory()
             self.dream_system = DreamSystem()
-            self.client = ollama.Client(host='http://ollama:11434')
+            self.client = get_ollama_client()
             print("🌙 Verbindung zu Systemen hergestellt.", flush=True)
+            # Modelle vorladen; gleiche Keep-Alive-Politik wie die API, damit sich beide nicht verdrängen
+            ModelWarmer(self.client).warm_up()
         except Exception as e:
             print(f"❌ Init Fehler: {e}", flush=True)
             
         self.last_dream_time = datetime.now() - timedelta(minutes=5) # Damit wir bald träumen können
+        self.dream_count = 0
 
     def get_last_interaction_time(self):
         """Liest den Zeitstempel der letzten Nachricht aus der History"""
         try:
-            if not os.path.exists(MEMORY_FILE):
+            existing = [path for path in MEMORY_FILES if os.path.exists(path)]
+            if not existing:
                 print(f"⚠️ History Datei nicht gefunden: {MEMORY_FILE}", flush=True)
                 return datetime.now() # Keine History -> Als "jetzt" behandeln
             
             # Prüfe Modifikationszeit
-            mod_time = os.path.getmtime(MEMORY_FILE)
+            mod_time = max(os.path.getmtime(path) for path in existing)
             dt_mod = datetime.fromtimestamp(mod_time)
             
             # Debug Ausgabe
@@ -78,7 +89,10 @@ Beginne mit "Im Traum erkannte ich..." oder "Mir wurde klar..."
 """
             # Timeout verhindern
             print("   Generiere Traum-Inhalt...", flush=True)
-            response = self.client.chat(model='gemma3:4b', messages=[{'role': 'user', 'content': prompt}])
+            # Slot vom Scheduler der API (MARA_SCHEDULER_URL): wartet, solange jemand chattet
+            with get_scheduler().slot(DREAM):
+                response = self.client.chat(model=CHAT_MODEL, messages=[{'role': 'user', 'content': prompt}],
+                                            options=ollama_options(), keep_alive=keep_alive_for(CHAT_MODEL))
             dream_insight = response['message']['content']
             
             print(f"   💭 Traum-Erkenntnis: {dream_insight}", flush=True)
@@ -91,6 +105,7 @@ Beginne mit "Im Traum erkannte ich..." oder "Mir wurde klar..."
             print("   💾 Erkenntnis im Langzeitgedächtnis gespeichert.", flush=True)
             
             self.last_dream_time = datetime.now()
+            self.dream_count += 1
             print("✨ ENDE TRAUM-ZYKLUS", flush=True)
             print("✨ ----------------------------------------", flush=True)
 
@@ -99,6 +114,17 @@ Beginne mit "Im Traum erkannte ich..." oder "Mir wurde klar..."
             import traceback
             traceback.print_exc()
 
+    def consolidate(self):
+        """Verdichtet das Langzeitgedächtnis (läuft nur, während Mara schläft)"""
+        print("🧹 Starte Gedächtnis-Konsolidierung...", flush=True)
+        try:
+            # Erst hier importieren: zieht NumPy nach, das sonst nur den Start verlangsamt
+            from memory.consolidation import MemoryConsolidator
+            report = MemoryConsolidator(self.long_term, client=self.client).run()
+            print(f"🧹 Bericht: {json.dumps(report)}", flush=True)
+        except Exception as e:
+            print(f"❌ Fehler bei der Konsolidierung: {e}", flush=True)
+
     def run(self):
         print("🌙 Dienst läuft. Loop gestartet.", flush=True)
         while True:
@@ -116,6 +142,8 @@ Beginne mit "Im Traum erkannte ich..." oder "Mir wurde klar..."
                 # 2. Wir haben nicht erst vor kurzem geträumt (Cooldown: hier 2 Minuten zum Testen)
                 if time_since_active > INACTIVITY_THRESHOLD_SECONDS and time_since_dream > 120:
                     self.dream_cycle()
+                    if CONSOLIDATE_EVERY_N_DREAMS and self.dream_count and self.dream_count % CONSOLIDATE_EVERY_N_DREAMS == 0:
+                        self.consolidate()
                 
             except Exception as e:
                 print(f"❌ Fehler im Loop: {e}", flush=True)
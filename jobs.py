@@ -0,0 +1,322 @@
+"""Dauerhafte Hintergrund-Jobs für die Nacharbeit eines Turns (Speichern, Lernen, Reflexion).
+
+Jobs liegen in SQLite und überleben einen Neustart. Pro Session laufen sie strikt in
+Einfügereihenfolge (ein fehlgeschlagener Job hält spätere derselben Session auf, bis er
+erfolgreich war oder aufgegeben wurde); verschiedene Sessions laufen parallel.
+
+Mehrere Prozesse (uvicorn --workers N) können dieselbe Datenbank nutzen: ein Job wird
+atomar beansprucht, und jeder Prozess meldet sich per Heartbeat. Laufende Jobs eines
+Prozesses ohne Heartbeat (Absturz, Neustart) werden wieder freigegeben.
+"""
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Callable, Dict, Optional
+
+JOB_DB_PATH = os.environ.get("MARA_JOB_DB", "data/jobs.db")
+JOB_WORKERS = int(os.environ.get("MARA_JOB_WORKERS", "2"))
+# Maximal offene Jobs; darüber werden neue abgelehnt statt unbegrenzt aufzustauen
+JOB_MAX_BACKLOG = int(os.environ.get("MARA_JOB_MAX_BACKLOG", "1000"))
+JOB_MAX_ATTEMPTS = int(os.environ.get("MARA_JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_BASE_SECONDS = float(os.environ.get("MARA_JOB_RETRY_BASE", "2.0"))
+JOB_POLL_SECONDS = 1.0
+JOB_HEARTBEAT_SECONDS = 2.0
+# Ohne Heartbeat so lange -> Prozess gilt als tot, seine laufenden Jobs werden neu vergeben
+JOB_OWNER_TIMEOUT_SECONDS = float(os.environ.get("MARA_JOB_OWNER_TIMEOUT", "15"))
+# So lange wartet SQLite auf die Schreibsperre eines anderen Prozesses, bevor "database is locked" kommt
+JOB_BUSY_TIMEOUT_SECONDS = float(os.environ.get("MARA_JOB_BUSY_TIMEOUT", "30"))
+# Obergrenze für das Warten nach Datenbankfehlern in den Worker-Threads
+JOB_MAX_BACKOFF_SECONDS = 30.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_run_at REAL NOT NULL,
+    created_at REAL NOT NULL,
+    error TEXT,
+    claimed_by TEXT
+);
+CREATE TABLE IF NOT EXISTS job_owners (
+    owner TEXT PRIMARY KEY,
+    heartbeat REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_session ON jobs(session_id, status, id);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, id);
+"""
+
+# Ältester offener Job, dessen Session gerade nichts anderes laufen hat und vor dem
+# kein älterer offener Job derselben Session wartet
+CLAIM_SQL = """
+SELECT id, session_id, kind, payload, attempts, created_at FROM jobs j
+WHERE status = 'pending' AND next_run_at <= ?
+  AND NOT EXISTS (
+      SELECT 1 FROM jobs e
+      WHERE e.session_id = j.session_id AND e.status IN ('pending', 'running')
+        AND (e.id < j.id OR e.status = 'running')
+  )
+ORDER BY id LIMIT 1
+"""
+
+
+class JobQueue:
+    """SQLite-Jobqueue mit Worker-Threads, Wiederholungen mit Backoff und begrenztem Rückstau"""
+
+    def __init__(self, path: str = JOB_DB_PATH, workers: int = JOB_WORKERS,
+                 max_backlog: int = JOB_MAX_BACKLOG, max_attempts: int = JOB_MAX_ATTEMPTS):
+        self.path = path
+        self.workers = workers
+        self.max_backlog = max_backlog
+        self.max_attempts = max_attempts
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._conn = sqlite3.connect(path, timeout=JOB_BUSY_TIMEOUT_SECONDS,
+                                     check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        if 'claimed_by' not in columns:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN claimed_by TEXT")
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+        self._handlers: Dict[str, Callable[[str, Dict], None]] = {}
+        self._threads = []
+        self._running = False
+        self._active = 0
+
+        self.completed = 0
+        self.retries = 0
+        self.failed = 0
+        self.rejected = 0
+        self.recovered = 0
+        self.total_latency_ms = 0.0
+        self.max_latency_ms = 0.0
+
+        with self._wakeup:
+            self._heartbeat()
+            # Nach einem Absturz: angefangene Jobs toter Prozesse erneut ausführen
+            self._recover()
+
+    def register(self, kind: str, handler: Callable[[str, Dict], None]):
+        """handler(session_id, payload) – Ausnahmen führen zu einer Wiederholung"""
+        self._handlers[kind] = handler
+        return self
+
+    def start(self):
+        with self._lock:
+            if self._running:
+                return self
+            self._running = True
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f"mara-jobs-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            thread = threading.Thread(target=self._beat, name="mara-jobs-heartbeat", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self, timeout: float = 5.0):
+        """Laufende Jobs dürfen fertig werden, offene bleiben für den nächsten Start liegen"""
+        with self._wakeup:
+            self._running = False
+            self._wakeup.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        with self._lock:
+            self._conn.execute("DELETE FROM job_owners WHERE owner = ?", (self.owner,))
+
+    def _heartbeat(self):
+        self._conn.execute("INSERT OR REPLACE INTO job_owners (owner, heartbeat) VALUES (?, ?)",
+                           (self.owner, time.time()))
+
+    def _recover(self):
+        """Gibt laufende Jobs von Prozessen ohne aktuellen Heartbeat wieder frei"""
+        cutoff = time.time() - JOB_OWNER_TIMEOUT_SECONDS
+        recovered = self._conn.execute(
+            "UPDATE jobs SET status = 'pending', claimed_by = NULL WHERE status = 'running' AND "
+            "(claimed_by IS NULL OR claimed_by NOT IN (SELECT owner FROM job_owners WHERE heartbeat >= ?))",
+            (cutoff,)
+        ).rowcount
+        self._conn.execute("DELETE FROM job_owners WHERE heartbeat < ?", (cutoff,))
+        if recovered:
+            self.recovered += recovered
+            print(f"♻️ {recovered} abgebrochene Jobs wieder eingereiht")
+            self._wakeup.notify_all()
+
+    def _beat(self):
+        with self._wakeup:
+            while self._running:
+                try:
+                    self._heartbeat()
+                    self._recover()
+                except Exception as e:
+                    # Nächster Versuch im nächsten Takt; der Thread darf nicht sterben
+                    print(f"❌ Job-Heartbeat fehlgeschlagen: {e}")
+                self._wakeup.wait(JOB_HEARTBEAT_SECONDS)
+
+    def enqueue(self, session_id: str, kind: str, payload: Dict) -> Optional[int]:
+        now = time.time()
+        with self._wakeup:
+            backlog = self._conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE status IN ('pending', 'running')"
+            ).fetchone()[0]
+            if backlog >= self.max_backlog:
+                self.rejected += 1
+                print(f"⚠️ Job-Rückstau voll ({backlog}), verwerfe {kind} für {session_id}")
+                return None
+            job_id = self._conn.execute(
+                "INSERT INTO jobs (session_id, kind, payload, next_run_at, created_at) VALUES (?, ?, ?, ?, ?)",
+                (session_id, kind, json.dumps(payload, ensure_ascii=False), now, now)
+            ).lastrowid
+            self._wakeup.notify()
+        return job_id
+
+    def _claim(self):
+        # Schreibsperre vor dem Lesen: andere Prozesse können denselben Job nicht gleichzeitig nehmen
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = self._conn.execute(CLAIM_SQL, (time.time(),)).fetchone()
+            if row:
+                self._conn.execute("UPDATE jobs SET status = 'running', claimed_by = ? WHERE id = ?",
+                                   (self.owner, row[0]))
+            self._conn.execute("COMMIT")
+        except Exception:
+            if self._conn.in_transaction:
+                self._conn.execute("ROLLBACK")
+            raise
+        if row:
+            self._active += 1
+        return row
+
+    def _finish(self, job_id: int, created_at: float):
+        with self._wakeup:
+            self._conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+            self._active -= 1
+            self.completed += 1
+            latency_ms = (time.time() - created_at) * 1000
+            self.total_latency_ms += latency_ms
+            self.max_latency_ms = max(self.max_latency_ms, latency_ms)
+            # Der nächste Job derselben Session ist jetzt frei
+            self._wakeup.notify_all()
+
+    def _fail(self, job_id: int, attempts: int, error: str):
+        with self._wakeup:
+            # Zähler erst nach dem Schreiben: schlägt es fehl, wird _fail wiederholt
+            if attempts >= self.max_attempts:
+                self._conn.execute("UPDATE jobs SET status = 'failed', attempts = ?, error = ? WHERE id = ?",
+                                   (attempts, error, job_id))
+                self._active -= 1
+                self.failed += 1
+                self._wakeup.notify_all()
+            else:
+                delay = JOB_RETRY_BASE_SECONDS * (2 ** (attempts - 1))
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'pending', attempts = ?, error = ?, next_run_at = ? WHERE id = ?",
+                    (attempts, error, time.time() + delay, job_id)
+                )
+                self._active -= 1
+                self.retries += 1
+
+    def _settle(self, done: Callable, *args):
+        """_finish/_fail mit Backoff wiederholen, bis die Datenbank wieder schreibbar ist.
+
+        Nach stop() aufgeben: der Job bleibt 'running' und wird beim nächsten Start über
+        _recover neu vergeben.
+        """
+        backoff = JOB_POLL_SECONDS
+        while True:
+            try:
+                done(*args)
+                return
+            except Exception as e:
+                print(f"❌ Job-Status konnte nicht gespeichert werden, neuer Versuch in {backoff:.0f}s: {e}")
+            with self._wakeup:
+                if not self._running:
+                    return
+                self._wakeup.wait(backoff)
+            backoff = min(backoff * 2, JOB_MAX_BACKOFF_SECONDS)
+
+    def _run(self):
+        while True:
+            with self._wakeup:
+                job = None
+                backoff = JOB_POLL_SECONDS
+                while self._running:
+                    try:
+                        job = self._claim()
+                    except Exception as e:
+                        print(f"❌ Job konnte nicht beansprucht werden, neuer Versuch in {backoff:.0f}s: {e}")
+                        self._wakeup.wait(backoff)
+                        backoff = min(backoff * 2, JOB_MAX_BACKOFF_SECONDS)
+                        continue
+                    if job:
+                        break
+                    backoff = JOB_POLL_SECONDS
+                    self._wakeup.wait(JOB_POLL_SECONDS)
+                if not job:
+                    return
+
+            job_id, session_id, kind, payload, attempts, created_at = job
+            handler = self._handlers.get(kind)
+            try:
+                if handler is None:
+                    raise KeyError(f"kein Handler für Job-Typ '{kind}'")
+                handler(session_id, json.loads(payload))
+            except Exception as e:
+                print(f"❌ Job {kind} ({session_id}) fehlgeschlagen (Versuch {attempts + 1}): {e}")
+                self._settle(self._fail, job_id, attempts + 1, str(e))
+            else:
+                self._settle(self._finish, job_id, created_at)
+
+    def drain(self, timeout: float = 10.0) -> bool:
+        """Wartet, bis keine sofort ausführbaren Jobs mehr offen sind (Tests/Shutdown)"""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            with self._lock:
+                ready = self._conn.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status = 'pending' AND next_run_at <= ?", (time.time(),)
+                ).fetchone()[0]
+                if not ready and not self._active:
+                    return True
+            time.sleep(0.05)
+        return False
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counts = dict(self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        return {
+            'pending': counts.get('pending', 0),
+            'running': counts.get('running', 0),
+            'failed': counts.get('failed', 0),
+            'completed': self.completed,
+            'retries': self.retries,
+            'rejected': self.rejected,
+            'recovered': self.recovered,
+            'avg_latency_ms': round(self.total_latency_ms / self.completed, 1) if self.completed else 0.0,
+            'max_latency_ms': round(self.max_latency_ms, 1)
+        }
+
+
+_queue: Optional[JobQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue() -> JobQueue:
+    """Prozessweite Jobqueue (Worker werden von mara beim Registrieren der Handler gestartet)"""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue()
+        return _queue
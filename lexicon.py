@@ -0,0 +1,122 @@
+"""Gemeinsamer Schlüsselwort-Matcher für Emotionen, Unterbewusstsein, Lernen und Wichtigkeit.
+
+Alle Tabellen werden in einen einzigen, als Trie aufgebauten regulären Ausdruck kompiliert;
+ein Durchlauf über den Text liefert sämtliche Kategorie-Treffer (Teilstring-Semantik wie `kw in text`).
+"""
+import re
+from functools import lru_cache
+from typing import Dict, FrozenSet, List
+
+# EmotionSystem.update_emotions
+EMOTION_KEYWORDS = {
+    'joy': ['freude', 'glück', 'lachen', 'happy', 'freuen'],
+    'sadness': ['traurig', 'weinen', 'schlecht', 'sad', 'verletzt'],
+    'anger': ['wütend', 'angry', 'wut', 'ärgern'],
+    'fear': ['ängstlich', 'ängste', 'scared', 'ängstigen'],
+    'surprise': ['überraschung', 'wahnsinn', 'wow', 'unglaublich']
+}
+
+# SubconsciousMind.process_background_thoughts
+SUBCONSCIOUS_KEYWORDS = {
+    'fear': ['ängstlich', 'ängste', 'ängstigen'],
+    'joy': ['freude', 'glück', 'lachen'],
+    'sadness': ['traurig', 'weinen', 'schlecht']
+}
+
+# LearningSystem._extract_topics (Reihenfolge = Reihenfolge der Themen im Ergebnis)
+TOPIC_KEYWORDS = {
+    'technologie': ['computer', 'ki', 'künstliche intelligenz', 'programmieren'],
+    'philosophie': ['sinn', 'existenz', 'bewusstsein', 'denken'],
+    'emotionen': ['fühle', 'emotion', 'traurig', 'freude', 'ängstlich'],
+    'beziehungen': ['freund', 'familie', 'liebe', 'verbindung'],
+    'lernen': ['lernen', 'wissen', 'verstehen', 'begreifen']
+}
+
+# LongTermMemory.evaluate_importance
+IMPORTANCE_KEYWORDS = {
+    # Schlüsselwörter, die Wichtigkeit signalisieren
+    'keyword': [
+        'wichtig', 'erinnere', 'merke', 'vergiss nicht', 'wichtig ist',
+        'birthday', 'geburtstag', 'anniversary', 'hochzeitstag',
+        'liebe', 'freund', 'familie', 'kind', 'sohn', 'tochter',
+        'arbeit', 'job', 'projekt', 'ziel', 'traum',
+        'problem', 'schwierig', 'hilfe', 'brauche'
+    ],
+    # Namen (könnte erweitert werden)
+    'name': ['josua', 'joshi', 'mara', 'frau', 'sohn'],
+    # Assistant-Nachrichten mit persönlichen Inhalten
+    'assistant': ['du hast', 'ich merke', 'wichtig']
+}
+
+
+def _trie_pattern(keywords: List[str]) -> str:
+    """Baut aus den Wörtern einen Trie-Ausdruck; gierige Optionals liefern den längsten Treffer"""
+    trie: Dict[str, dict] = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node: Dict[str, dict]) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        if len(branches) == 1 and '' not in node:
+            return branches[0]
+        group = '(?:' + '|'.join(branches) + ')'
+        return group + '?' if '' in node else group
+
+    return build(trie)
+
+
+def _namespaced(prefix: str, table: Dict[str, List[str]]) -> Dict[str, List[str]]:
+    return {f"{prefix}.{name}": keywords for name, keywords in table.items()}
+
+
+class Lexicon:
+    """Kompiliert Kategorie -> Schlüsselwörter in einen Ausdruck und liefert alle Treffer in einem Durchlauf"""
+
+    def __init__(self, tables: Dict[str, List[str]], cache_size: int = 256):
+        self._categories: Dict[str, List[str]] = {}
+        for category, keywords in tables.items():
+            for keyword in keywords:
+                self._categories.setdefault(keyword, []).append(category)
+
+        # An jeder Position liefert der Trie das längste Wort, kürzere sind dessen Präfixe
+        keywords = list(self._categories)
+        self._pattern = re.compile(_trie_pattern(keywords))
+        # Jedes Wort impliziert alle Schlüsselwörter, die in ihm enthalten sind
+        self._implied: Dict[str, FrozenSet[str]] = {
+            keyword: frozenset(other for other in keywords if other in keyword) for keyword in keywords
+        }
+        # Der Stream-Loop prüft dieselbe Nachricht mehrfach pro Turn
+        self.scan = lru_cache(maxsize=cache_size)(self._scan)
+
+    def _scan(self, text: str) -> Dict[str, FrozenSet[str]]:
+        lowered = text.lower()
+        search = self._pattern.search
+        found = set()
+        # Nach jedem Treffer ein Zeichen weiter suchen, damit überlappende Wörter nicht fehlen
+        match = search(lowered)
+        while match:
+            found |= self._implied[match.group()]
+            match = search(lowered, match.start() + 1)
+        hits: Dict[str, set] = {}
+        for keyword in found:
+            for category in self._categories[keyword]:
+                hits.setdefault(category, set()).add(keyword)
+        return {category: frozenset(words) for category, words in hits.items()}
+
+
+LEXICON = Lexicon({
+    **_namespaced('emotion', EMOTION_KEYWORDS),
+    **_namespaced('subconscious', SUBCONSCIOUS_KEYWORDS),
+    **_namespaced('topic', TOPIC_KEYWORDS),
+    **_namespaced('importance', IMPORTANCE_KEYWORDS)
+})
+
+
+def scan(text: str) -> Dict[str, FrozenSet[str]]:
+    """Alle Kategorie-Treffer für einen Text (Ergebnis nicht verändern, es wird gecacht)"""
+    return LEXICON.scan(text)
@@ -1,4 +1,4 @@
-import ollama
+from clients import get_ollama_client, get_async_ollama_client
 from memory.short_term import ShortTermMemory
 from memory.long_term import LongTermMemory
 from personality.emotions import EmotionSystem
@@ -6,12 +6,43 @@ from personality.thoughts import ThoughtSystem
 from personality.personality import PersonalityProfile
 import traceback
 import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from pipeline import StageGraph
+from jobs import get_job_queue
+from prompt import (assemble_messages, build_state_block, select_history, ollama_options,
+                    CHAT_KEEP_ALIVE, CONTEXT_MAX_MESSAGES)
+from memory.summary import RollingSummary
+from models import CHAT_MODEL, record_response
+from scheduler import get_scheduler, INTERACTIVE_CHAT
+from memory.retrieval_gate import get_retrieval_gate
+from memory.session_state import (SESSION_STATE_ENABLED, StaleStateError, get_session_state_store,
+                                  restore, snapshot)
 
 from consciousness.dreams import DreamSystem
 from consciousness.subconscious import SubconsciousMind
 from consciousness.reflection import SelfReflection
 from consciousness.learning import LearningSystem
 
+# Deadline (ab Eingang des Prompts) für das Memory-Retrieval, danach wird ohne Erinnerungen geantwortet
+RETRIEVAL_TIMEOUT_SECONDS = float(os.environ.get("MARA_RETRIEVAL_TIMEOUT", "1.5"))
+# Deadline für die reinen CPU-Schritte (Emotion, Gedanke, Unterbewusstsein, Persönlichkeit)
+CPU_STAGE_TIMEOUT_SECONDS = float(os.environ.get("MARA_CPU_STAGE_TIMEOUT", "2.0"))
+
+_pregen_pool = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("MARA_PREGEN_WORKERS", "8")),
+    thread_name_prefix="mara-pregen"
+)
+# Retrieval wartet auf Scheduler und HTTP, auch über seine Deadline hinaus -> eigener Pool,
+# damit die CPU-Stufen nicht hinter hängenden Suchen warten und auf ihre Defaults fallen
+_retrieval_pool = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("MARA_RETRIEVAL_WORKERS", "8")),
+    thread_name_prefix="mara-retrieval"
+)
+
 
 def create_mara_session(session_id=None):
     """Erstellt eine neue Mara-Session mit Bewusstsein und eigener Speicherdatei"""
@@ -22,19 +53,30 @@ def create_mara_session(session_id=None):
             memory_file = f"data/sessions/{session_id}.json"
         else:
             memory_file = "data/chat_history_default.json"
+        summary_file = os.path.splitext(memory_file)[0] + ".summary.json"
 
         session = {
+            'session_id': session_id,
             'short_term': ShortTermMemory(filepath=memory_file),
+            'summary': RollingSummary(summary_file),
             'long_term': LongTermMemory(),
             'emotions': EmotionSystem(),
             'thoughts': ThoughtSystem(),
             'personality': PersonalityProfile(),
-            'client': ollama.Client(host='http://ollama:11434'),
+            'client': get_ollama_client(),
             'dreams': DreamSystem(),
             'subconscious': SubconsciousMind(),
             'reflection': SelfReflection(),
-            'learning': LearningSystem()
+            'learning': LearningSystem(),
+            'state_version': 0,
+            # Nacharbeits-Jobs und Snapshots greifen aus anderen Threads auf die Subsysteme zu
+            'lock': threading.RLock()
         }
+        # Zustand, den ein anderer Worker, ein früherer Prozess oder der Winterschlaf hinterlassen hat
+        version, state = get_session_state_store().load(_state_key(session))
+        if state:
+            restore(session, state)
+        session['state_version'] = version
         print("Mara-Session erfolgreich erstellt!")
         return session
     except Exception as e:
@@ -43,6 +85,65 @@ def create_mara_session(session_id=None):
         raise
 
 
+def _state_key(session_data) -> str:
+    return session_data.get('session_id') or 'default'
+
+
+def _sync_state(session_data):
+    store = get_session_state_store()
+    if store.version(_state_key(session_data)) == session_data.get('state_version', 0):
+        return
+    version, state = store.load(_state_key(session_data))
+    if state:
+        restore(session_data, state)
+    if 'short_term' in session_data:
+        session_data['short_term'].reload()
+        session_data['summary'].reload()
+    session_data['state_version'] = version
+
+
+def _save_state(session_data) -> bool:
+    try:
+        session_data['state_version'] = get_session_state_store().save(
+            _state_key(session_data), snapshot(session_data), session_data.get('state_version', 0)
+        )
+        return True
+    except StaleStateError as e:
+        print(f"⚠️ {e} – übernehme den gespeicherten Stand")
+        _sync_state(session_data)
+        return False
+
+
+def sync_session_state(session_data):
+    """Mehrere Worker: Session neu laden, wenn ein anderer Worker sie seit unserem Stand verändert hat"""
+    if SESSION_STATE_ENABLED:
+        _sync_state(session_data)
+
+
+def save_session_state(session_data) -> bool:
+    """Compare-and-Swap auf die gelesene Version; bei Konflikt gilt der Stand des anderen Workers"""
+    if not SESSION_STATE_ENABLED:
+        return True
+    return _save_state(session_data)
+
+
+def hibernate_session(session_data):
+    """Verlauf wegschreiben und Zustand als Snapshot sichern, bevor die Session aus dem RAM fällt;
+    create_mara_session stellt sie daraus wieder her"""
+    session_data['short_term'].flush()
+    store = get_session_state_store()
+    key = _state_key(session_data)
+    try:
+        session_data['state_version'] = store.save(key, snapshot(session_data),
+                                                   session_data.get('state_version', 0))
+    except StaleStateError:
+        if SESSION_STATE_ENABLED:
+            # Ein anderer Worker hat neueren Stand gespeichert – der gilt
+            return
+        # Ein Job hat den Snapshot geschrieben, während die Session wieder geladen war: die Session ist neuer
+        session_data['state_version'] = store.save(key, snapshot(session_data), store.version(key))
+
+
 def _safe_get_message_text(chunk: dict) -> str:
     msg = chunk.get("message") or {}
     content = msg.get("content")
@@ -63,118 +164,271 @@ def _safe_get_message_thinking(chunk: dict) -> str:
     return ""
 
 
-def chat_with_mara_session_streaming(session_data, prompt):
-    """Chat mit Streaming-Unterstützung (SYNC Generator)"""
-    try:
-        print(f"Verarbeite Nachricht (Streaming): {prompt}")
+# Alle wie viele Chunks die Emotion während des Streams neu berechnet wird
+EMOTION_REFRESH_CHUNKS = 20
+# Im Async-Stream wird die Emotion höchstens so oft neu berechnet (thinking ändert sich pro Chunk)
+EMOTION_REFRESH_SECONDS = float(os.environ.get("MARA_EMOTION_REFRESH_SECONDS", "0.5"))
+# Puffer zwischen Ollama-Stream und WebSocket; voll -> Ollama-Lesen pausiert (Backpressure)
+STREAM_QUEUE_SIZE = int(os.environ.get("MARA_STREAM_QUEUE_SIZE", "64"))
+
+# Zähler für /metrics (nur im Event-Loop verändert)
+stream_stats = {
+    'started': 0,
+    'completed': 0,
+    'cancelled': 0,
+    # Von Ollama gelieferte Tokens (Chunks) für abgebrochene Antworten
+    'wasted_tokens': 0
+}
+
+# Nur für wirklich blockierende Schritte (Platte, CPU-Heuristiken) – die Generierung selbst läuft async
+blocking_pool = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("MARA_BLOCKING_WORKERS", "16")),
+    thread_name_prefix="mara-blocking"
+)
+
+
+def _prepare_turn(session_data, prompt):
+    """Speichert die User-Nachricht und startet die Vorbereitungsstufen (blockierend)"""
+    short_term = session_data['short_term']
+    long_term = session_data['long_term']
+    emotions = session_data['emotions']
+    thoughts = session_data['thoughts']
+    personality = session_data['personality']
+    subconscious = session_data['subconscious']
+
+    # Vorbereitung als Abhängigkeitsgraph: Retrieval (HTTP) hängt nur am Prompt und startet
+    # vor dem Schreiben des Verlaufs; jede Stufe hat eine Deadline ab jetzt.
+    graph = StageGraph(_pregen_pool)
+    # Smalltalk ("hi", "ok", "danke") braucht kein Embedding und keine Vektorsuche
+    if get_retrieval_gate().should_retrieve(prompt):
+        graph.add('memories', lambda: long_term.search_memories(prompt, n_results=3),
+                  timeout=RETRIEVAL_TIMEOUT_SECONDS, default=[], executor=_retrieval_pool)
+    else:
+        graph.add('memories', lambda: [])
+    graph.start()
+
+    sync_session_state(session_data)
+    short_term.add_message('user', prompt)
+    recent_context = short_term.get_recent(10)
+
+    graph.add('emotions', lambda: emotions.update_emotions(recent_context),
+              timeout=CPU_STAGE_TIMEOUT_SECONDS)
+    # Dein eigener interner Gedanke (das ist NICHT Modell-thinking)
+    graph.add('thought', lambda: thoughts.generate_thought(prompt, emotions.get_emotions()),
+              deps=['emotions'], timeout=CPU_STAGE_TIMEOUT_SECONDS, default="...")
+    graph.add('prefix', emotions.get_emotional_response_prefix,
+              deps=['emotions'], timeout=CPU_STAGE_TIMEOUT_SECONDS, default="Neutral")
+    graph.add('subconscious', lambda: subconscious.process_background_thoughts(recent_context),
+              timeout=CPU_STAGE_TIMEOUT_SECONDS, default=[])
+    graph.add('personality', personality.get_personality_prompt, timeout=CPU_STAGE_TIMEOUT_SECONDS, default="")
+    graph.start()
+    return graph, _context_history(session_data)
+
+
+def _context_history(session_data):
+    """Verlauf im Token-Budget (Anfang block-weise fix, siehe prompt.py) und Zusammenfassung davor.
+
+    Nachrichten, die neu aus dem Fenster gefallen sind, werden als Job in die Zusammenfassung
+    eingearbeitet; bis dahin gilt die bisherige.
+    """
+    short_term = session_data['short_term']
+    summary = session_data['summary']
+    candidates = short_term.get_recent(CONTEXT_MAX_MESSAGES)
+    offset = short_term.position - len(candidates)
+    start = select_history(candidates, short_term.position)
+    folded = summary.pending(candidates[:start], offset)
+    if folded:
+        job_id = get_post_turn_queue().enqueue(
+            session_data.get('session_id') or 'default', 'summarize',
+            {'path': summary.path, 'messages': folded}
+        )
+        if job_id is not None:
+            summary.schedule(offset + start)
+    return candidates[start:], summary.text
 
-        short_term = session_data['short_term']
-        long_term = session_data['long_term']
-        emotions = session_data['emotions']
-        thoughts = session_data['thoughts']
-        personality = session_data['personality']
-        client = session_data['client']
 
-        subconscious = session_data['subconscious']
-        reflection = session_data['reflection']
-        learning = session_data['learning']
+def _compose_messages(context, internal_thought, background_thoughts, personality_context,
+                      emotional_prefix, memories):
+    print(f"Erinnerungen gefunden: {len(memories)}")
+    history, summary = context
+    state_block = build_state_block(emotional_prefix, internal_thought, background_thoughts, memories)
+    return assemble_messages(personality_context, history, state_block, summary)
 
-        short_term.add_message('user', prompt)
 
-        # Kontext + Emotionen initial
-        recent_context = short_term.get_recent(10)
-        emotions.update_emotions(recent_context)
-        dominant_emotion = emotions.get_dominant_emotion()
+def _refresh_emotions(session_data):
+    """Emotion aus dem aktuellen Verlauf neu berechnen (damit "trust" nicht ewig hängt)"""
+    emotions = session_data['emotions']
+    emotions.update_emotions(session_data['short_term'].get_recent(10))
+    return emotions.get_dominant_emotion()
+
+
+def _store_reply(session_data, full_response):
+    print(f"Vollständige Antwort erhalten (Länge: {len(full_response)})")
+    session_data['short_term'].add_message('assistant', full_response)
+    return _refresh_emotions(session_data)
 
-        # Dein eigener interner Gedanke (das ist NICHT Modell-thinking)
-        internal_thought = thoughts.generate_thought(prompt, emotions.get_emotions())
 
-        # Sofort UI füttern
-        yield {"type": "meta", "thought": internal_thought, "emotion": dominant_emotion}
+# Liefert zu einer Session-ID die im Prozess geladene Session (oder None), gesetzt von der API
+_session_resolver = None
+_jobs_lock = threading.Lock()
+_jobs_ready = False
 
-        background_thoughts = subconscious.process_background_thoughts(recent_context)
 
-        personality_context = personality.get_personality_prompt()
-        emotional_prefix = emotions.get_emotional_response_prefix()
+def set_session_resolver(resolver):
+    global _session_resolver
+    _session_resolver = resolver
 
-        memories = long_term.search_memories(prompt, n_results=3)
-        memory_context = "\n".join([f"Erinnerung: {mem['content']}" for mem in memories])
-        print(f"Erinnerungen gefunden: {len(memories)}")
 
-        system_message = f"""{personality_context}
+def _job_session(session_id):
+    return _session_resolver(session_id) if _session_resolver else None
 
-### INTERNE SYSTEM-DATEN (NICHT TEIL DER ANTWORT)
-Die folgenden Informationen definieren deinen aktuellen Zustand. Sie dienen nur zur Färbung deiner Sprache.
-* [EMOTION]: {emotional_prefix}
-* [GEDANKE]: {internal_thought}
-* [UNTERBEWUSSTSEIN]: {'; '.join(background_thoughts) if background_thoughts else 'Ruhig'}
 
-### ANWEISUNG FÜR DIE AUSGABE
-Antworte dem Nutzer jetzt direkt.
-REGEL: Gib niemals interne Gedanken, Emotionen, Systemdaten, Regieanweisungen oder Klammer-Kommentare aus.
-REGEL: Keine Abschnitte wie „Innerer Gedanke:“ oder „(denkt …)“ oder ähnliches.
-REGEL: Gib nur die endgültige Nutzer-Antwort aus.
+def _update_session(session_id, fn, attempts: int = 3):
+    """Wendet fn auf die Session an. Ist sie hier nicht geladen (anderer Worker oder Winterschlaf),
+    nur auf die Subsysteme im Zustandsspeicher; bei Versionskonflikt erneut auf dem neuen Stand"""
+    session = _job_session(session_id)
+    if session is not None and not SESSION_STATE_ENABLED:
+        with session['lock']:
+            fn(session)
+        return
+    if session is None:
+        session = {'session_id': session_id, 'emotions': EmotionSystem(), 'thoughts': ThoughtSystem(),
+                   'personality': PersonalityProfile(), 'dreams': DreamSystem(),
+                   'subconscious': SubconsciousMind(), 'reflection': SelfReflection(),
+                   'learning': LearningSystem(), 'state_version': 0, 'lock': threading.RLock()}
+    for _ in range(attempts):
+        with session['lock']:
+            _sync_state(session)
+            fn(session)
+            if _save_state(session):
+                return
+    # Job wird von der Queue wiederholt
+    raise StaleStateError(f"Session {session_id}: {attempts} Versionskonflikte in Folge")
 
-{memory_context if memory_context else ""}"""
 
-        full_conversation = [{'role': 'system', 'content': system_message}] + recent_context
+def _job_auto_store(session_id, payload):
+    session = _job_session(session_id)
+    # Das Langzeitgedächtnis ist geteilt -> geht auch, wenn die Session nicht mehr geladen ist
+    long_term = session['long_term'] if session else LongTermMemory()
+    long_term.auto_store_important_messages(payload['messages'], threshold=0.4)
 
-        yield {"type": "meta", "thought": "Formuliere Antwort...", "emotion": dominant_emotion}
 
-        response_stream = client.chat(
-            model='gemma3:4b',
-            messages=full_conversation,
-            stream=True
+def _job_learn(session_id, payload):
+    _update_session(session_id, lambda session: session['learning'].learn_from_conversation(payload['messages']))
+
+
+def _job_reflect(session_id, payload):
+    _update_session(session_id, lambda session: session['reflection'].reflect_on_conversation(
+        payload['messages'], payload['emotions']))
+
+
+def _job_summarize(session_id, payload):
+    session = _job_session(session_id)
+    summary = session['summary'] if session else RollingSummary(payload['path'])
+    summary.fold(get_ollama_client(), payload['messages'], options=ollama_options())
+
+
+def get_post_turn_queue():
+    """Jobqueue mit registrierten Nacharbeits-Handlern; startet die Worker beim ersten Aufruf"""
+    global _jobs_ready
+    queue = get_job_queue()
+    with _jobs_lock:
+        if not _jobs_ready:
+            queue.register('auto_store', _job_auto_store)
+            queue.register('learn', _job_learn)
+            queue.register('reflect', _job_reflect)
+            queue.register('summarize', _job_summarize)
+            queue.start()
+            _jobs_ready = True
+    return queue
+
+
+def _enqueue_post_processing(session_data):
+    """Speicher/Lernen nach der Antwort als Hintergrund-Jobs (in dieser Reihenfolge je Session)"""
+    recent = session_data['short_term'].get_recent(10)
+    session_id = session_data.get('session_id') or 'default'
+    queue = get_post_turn_queue()
+    queue.enqueue(session_id, 'auto_store', {'messages': recent[-5:]})
+    queue.enqueue(session_id, 'learn', {'messages': recent})
+    queue.enqueue(session_id, 'reflect', {'messages': recent, 'emotions': session_data['emotions'].get_emotions()})
+
+
+def _finish_turn(session_data, full_response):
+    """Antwort speichern, Nacharbeit einreihen; liefert die neue dominante Emotion"""
+    dominant_emotion = _store_reply(session_data, full_response)
+    if SESSION_STATE_ENABLED:
+        # Andere Worker lesen den Verlauf aus dem Backend -> vor der neuen Version schreiben
+        session_data['short_term'].flush()
+        save_session_state(session_data)
+    _enqueue_post_processing(session_data)
+    return dominant_emotion
+
+
+def chat_with_mara_session_streaming(session_data, prompt):
+    """Chat mit Streaming-Unterstützung (SYNC Generator, z.B. für Skripte; die API nutzt mara_async_stream)"""
+    try:
+        print(f"Verarbeite Nachricht (Streaming): {prompt}")
+        emotions = session_data['emotions']
+        client = session_data['client']
+
+        graph, context = _prepare_turn(session_data, prompt)
+
+        internal_thought = graph.result('thought')
+        dominant_emotion = emotions.get_dominant_emotion()
+
+        # Sofort UI füttern
+        yield {"type": "meta", "thought": internal_thought, "emotion": dominant_emotion}
+
+        full_conversation = _compose_messages(
+            context, internal_thought, graph.result('subconscious'), graph.result('personality'),
+            graph.result('prefix'), graph.result('memories')
         )
+        print(f"Vorbereitung (ms): {graph.timings()}")
+
+        yield {"type": "meta", "thought": "Formuliere Antwort...", "emotion": dominant_emotion}
 
         full_response = ""
         last_thinking_sent = ""
         chunk_i = 0
 
-        for chunk in response_stream:
-            chunk_i += 1
-
-            # 1) Modell-thinking (falls vorhanden) als Gedanke oben anzeigen
-            thinking = _safe_get_message_thinking(chunk)
-            if thinking:
+        # Slot bis zum Ende des Streams halten (schließt auch, wenn der Consumer abbricht)
+        with get_scheduler().slot(INTERACTIVE_CHAT):
+            started = time.perf_counter()
+            response_stream = client.chat(
+                model=CHAT_MODEL,
+                messages=full_conversation,
+                stream=True,
+                options=ollama_options(),
+                keep_alive=CHAT_KEEP_ALIVE
+            )
+            for chunk in response_stream:
+                chunk_i += 1
+                if chunk.get('done'):
+                    record_response(CHAT_MODEL, chunk, started)
+
+                # 1) Modell-thinking (falls vorhanden) als Gedanke oben anzeigen
+                thinking = _safe_get_message_thinking(chunk)
                 # nicht spam-en: nur senden wenn neu/anders
-                if thinking != last_thinking_sent:
+                if thinking and thinking != last_thinking_sent:
                     last_thinking_sent = thinking
-                    # Emotion aktualisieren (damit "trust" nicht ewig hängt)
-                    emotions.update_emotions(short_term.get_recent(10))
+                    yield {"type": "meta", "thought": thinking, "emotion": _refresh_emotions(session_data)}
+
+                # 2) Normaler Text -> chat stream
+                text = _safe_get_message_text(chunk)
+                if text:
+                    full_response += text
+                    yield {"type": "text", "content": text}
+
+                # 3) Zusätzlich: Emotion zyklisch refreshen (damit sie sichtbar variieren kann)
+                if chunk_i % EMOTION_REFRESH_CHUNKS == 0:
                     yield {
                         "type": "meta",
-                        "thought": thinking,
-                        "emotion": emotions.get_dominant_emotion()
+                        "thought": last_thinking_sent or internal_thought,
+                        "emotion": _refresh_emotions(session_data)
                     }
 
-            # 2) Normaler Text -> chat stream
-            text = _safe_get_message_text(chunk)
-            if text:
-                full_response += text
-                yield {"type": "text", "content": text}
-
-            # 3) Zusätzlich: Emotion zyklisch refreshen (damit sie sichtbar variieren kann)
-            if chunk_i % 20 == 0:
-                emotions.update_emotions(short_term.get_recent(10))
-                yield {
-                    "type": "meta",
-                    "thought": last_thinking_sent or internal_thought,
-                    "emotion": emotions.get_dominant_emotion()
-                }
-
-        print(f"Vollständige Antwort erhalten (Länge: {len(full_response)})")
-
-        short_term.add_message('assistant', full_response)
-
         # Abschluss-Meta
-        emotions.update_emotions(short_term.get_recent(10))
-        yield {"type": "meta", "thought": "Bereit.", "emotion": emotions.get_dominant_emotion()}
-
-        # Speicher/Lernen
-        long_term.auto_store_important_messages(short_term.get_recent(5), threshold=0.4)
-        learning.learn_from_conversation(short_term.get_recent(10))
-        reflection.reflect_on_conversation(short_term.get_recent(10), emotions.get_emotions())
+        yield {"type": "meta", "thought": "Bereit.", "emotion": _finish_turn(session_data, full_response)}
 
     except Exception as e:
         error_msg = f"Fehler im Streaming: {str(e)}"
@@ -183,32 +437,123 @@ REGEL: Gib nur die endgültige Nutzer-Antwort aus.
         yield {"type": "error", "content": error_msg}
 
 
+async def _pump_chunks(messages, queue: asyncio.Queue, sentinel, received: dict):
+    """Liest den Ollama-Stream und legt Chunks in die (begrenzte) Queue.
+
+    Bei Abbruch (CancelledError) wird der async-Iterator verlassen und damit die HTTP-Antwort
+    geschlossen – Ollama beendet dann die Generierung.
+    """
+    try:
+        async with get_scheduler().aslot(INTERACTIVE_CHAT):
+            started = time.perf_counter()
+            stream = await get_async_ollama_client().chat(model=CHAT_MODEL, messages=messages, stream=True,
+                                                          options=ollama_options(), keep_alive=CHAT_KEEP_ALIVE)
+            async for chunk in stream:
+                received['chunks'] += 1
+                if chunk.get('done'):
+                    # Kalt/warm-Latenz (load_duration) für /metrics
+                    record_response(CHAT_MODEL, chunk, started)
+                await queue.put(chunk)
+    except Exception as e:
+        await queue.put(e)
+    await queue.put(sentinel)
+
+
 async def mara_async_stream(session_data, prompt):
     """
-    ECHTES Async-Streaming:
-    Sync generator im Thread, pusht Items thread-safe in eine asyncio.Queue
-    via loop.call_soon_threadsafe(). [web:66][web:55]
+    Natives Async-Streaming: ollama.AsyncClient schreibt über eine begrenzte asyncio.Queue
+    direkt in den Consumer. Nur Platte/CPU-Heuristiken laufen im blocking_pool, ein aktiver
+    Chat kostet also eine Coroutine statt eines Threads.
     """
     loop = asyncio.get_running_loop()
-    queue: asyncio.Queue = asyncio.Queue()
-    sentinel = object()
 
-    def producer():
+    def blocking(fn, *args):
+        return loop.run_in_executor(blocking_pool, fn, *args)
+
+    try:
+        print(f"Verarbeite Nachricht (Streaming): {prompt}")
+        emotions = session_data['emotions']
+
+        graph, context = await blocking(_prepare_turn, session_data, prompt)
+
+        internal_thought = await graph.aresult('thought')
+        dominant_emotion = emotions.get_dominant_emotion()
+
+        # Sofort UI füttern
+        yield {"type": "meta", "thought": internal_thought, "emotion": dominant_emotion}
+
+        full_conversation = _compose_messages(
+            context, internal_thought, await graph.aresult('subconscious'),
+            await graph.aresult('personality'), await graph.aresult('prefix'), await graph.aresult('memories')
+        )
+        print(f"Vorbereitung (ms): {graph.timings()}")
+
+        yield {"type": "meta", "thought": "Formuliere Antwort...", "emotion": dominant_emotion}
+
+        queue: asyncio.Queue = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+        sentinel = object()
+        received = {'chunks': 0}
+        stream_stats['started'] += 1
+        pump = asyncio.create_task(_pump_chunks(full_conversation, queue, sentinel, received))
+
+        full_response = ""
+        last_thinking_sent = ""
+        chunk_i = 0
+        last_refresh = 0.0
+
+        async def current_emotion():
+            nonlocal last_refresh
+            if time.monotonic() - last_refresh < EMOTION_REFRESH_SECONDS:
+                return emotions.get_dominant_emotion()
+            last_refresh = time.monotonic()
+            return await blocking(_refresh_emotions, session_data)
+
         try:
-            for item in chat_with_mara_session_streaming(session_data, prompt):
-                loop.call_soon_threadsafe(queue.put_nowait, item)
-        except Exception as e:
-            loop.call_soon_threadsafe(queue.put_nowait, {"type": "error", "content": f"Stream-Fehler: {str(e)}"})
+            while True:
+                chunk = await queue.get()
+                if chunk is sentinel:
+                    break
+                if isinstance(chunk, Exception):
+                    raise chunk
+                chunk_i += 1
+
+                thinking = _safe_get_message_thinking(chunk)
+                if thinking and thinking != last_thinking_sent:
+                    last_thinking_sent = thinking
+                    yield {"type": "meta", "thought": thinking, "emotion": await current_emotion()}
+
+                text = _safe_get_message_text(chunk)
+                if text:
+                    full_response += text
+                    yield {"type": "text", "content": text}
+
+                if chunk_i % EMOTION_REFRESH_CHUNKS == 0:
+                    yield {
+                        "type": "meta",
+                        "thought": last_thinking_sent or internal_thought,
+                        "emotion": await current_emotion()
+                    }
+        except (asyncio.CancelledError, GeneratorExit):
+            # Client ist weg (siehe websocket_endpoint): nichts speichern, Ollama-Stream schließen.
+            # GeneratorExit: abgebrochen, während der Consumer ein yield verarbeitet hat (aclose)
+            stream_stats['cancelled'] += 1
+            stream_stats['wasted_tokens'] += received['chunks']
+            print(f"🛑 Generierung abgebrochen nach {received['chunks']} Tokens")
+            raise
         finally:
-            loop.call_soon_threadsafe(queue.put_nowait, sentinel)
+            if not pump.done():
+                pump.cancel()
+        stream_stats['completed'] += 1
 
-    loop.run_in_executor(None, producer)
+        # Danach ist der Turn fertig (stream_end), Speichern/Lernen läuft als Job weiter
+        yield {"type": "meta", "thought": "Bereit.",
+               "emotion": await blocking(_finish_turn, session_data, full_response)}
 
-    while True:
-        item = await queue.get()
-        if item is sentinel:
-            break
-        yield item
+    except Exception as e:
+        error_msg = f"Fehler im Streaming: {str(e)}"
+        print(error_msg)
+        print(traceback.format_exc())
+        yield {"type": "error", "content": error_msg}
 
 
 def chat_with_mara_session(session_data, prompt):
@@ -221,6 +566,7 @@ def chat_with_mara_session(session_data, prompt):
         client = session_data['client']
         subconscious = session_data['subconscious']
 
+        sync_session_state(session_data)
         short_term.add_message('user', prompt)
         recent_context = short_term.get_recent(10)
 
@@ -231,25 +577,22 @@ def chat_with_mara_session(session_data, prompt):
         personality_context = personality.get_personality_prompt()
         emotional_prefix = emotions.get_emotional_response_prefix()
 
-        system_message = f"""{personality_context}
-
-### INTERNE SYSTEM-DATEN (NICHT TEIL DER ANTWORT)
-* [EMOTION]: {emotional_prefix}
-* [GEDANKE]: {internal_thought}
-* [UNTERBEWUSSTSEIN]: {'; '.join(background_thoughts) if background_thoughts else 'Ruhig'}
-
-### ANWEISUNG
-Antworte direkt.
-REGEL: Keine Gedanken, keine Regieanweisungen, kein „Innerer Gedanke:“, keine Klammer-Kommentare.
-Gib nur die finale Nutzerantwort aus.
-"""
-
-        full_conversation = [{'role': 'system', 'content': system_message}] + recent_context
+        full_conversation = _compose_messages(
+            _context_history(session_data), internal_thought, background_thoughts, personality_context,
+            emotional_prefix, []
+        )
 
-        response = client.chat(model='gemma3:4b', messages=full_conversation)
+        with get_scheduler().slot(INTERACTIVE_CHAT):
+            started = time.perf_counter()
+            response = client.chat(model=CHAT_MODEL, messages=full_conversation,
+                                   options=ollama_options(), keep_alive=CHAT_KEEP_ALIVE)
+        record_response(CHAT_MODEL, response, started)
         reply = response['message']['content']
 
         short_term.add_message('assistant', reply)
+        if SESSION_STATE_ENABLED:
+            short_term.flush()
+            save_session_state(session_data)
 
         return {'response': reply, 'emotions': emotions.get_emotions(), 'thoughts': thoughts.get_recent_thoughts(3)}
 
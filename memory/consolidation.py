@@ -0,0 +1,230 @@
+"""Offline-Konsolidierung des Langzeitgedächtnisses.
+
+Dichte Gruppen fast gleicher Erinnerungen werden zu je einer zusammengefassten
+Erinnerung verschmolzen (mit Herkunfts-Metadaten), die Originale werden gelöscht.
+
+Aufruf:
+    python -m memory.consolidation [--dry-run] [--similarity 0.9] [--min-cluster 3] [--no-summary]
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+from datetime import datetime
+from typing import List, Dict, Optional
+
+import numpy as np
+
+from prompt import ollama_options
+from models import CHAT_MODEL, keep_alive_for
+from scheduler import get_scheduler, DREAM
+
+# Kosinus-Ähnlichkeit zum Cluster-Zentrum, ab der Erinnerungen zusammengelegt werden
+CONSOLIDATION_SIMILARITY = float(os.environ.get("MARA_CONSOLIDATION_SIMILARITY", "0.9"))
+CONSOLIDATION_MIN_CLUSTER = int(os.environ.get("MARA_CONSOLIDATION_MIN_CLUSTER", "3"))
+CONSOLIDATION_BATCH = 256
+# Größe der k-Means-Partitionen, innerhalb derer paarweise verglichen wird
+PARTITION_SIZE = 200
+# Obergrenze pro Partition (Ähnlichkeitsmatrix wächst quadratisch), auch bei unausgewogenem k-Means
+MAX_PARTITION_SIZE = 2 * PARTITION_SIZE
+SUMMARY_MODEL = CHAT_MODEL
+
+
+class MemoryConsolidator:
+    """Clustert die Embeddings einer Collection und ersetzt dichte Cluster durch eine Zusammenfassung"""
+
+    def __init__(self, long_term, client=None, similarity: float = CONSOLIDATION_SIMILARITY,
+                 min_cluster: int = CONSOLIDATION_MIN_CLUSTER, summarize: bool = True):
+        self.long_term = long_term
+        self.collection = long_term.collection
+        self.client = client or long_term.ollama_client
+        self.similarity = similarity
+        self.min_cluster = min_cluster
+        self.summarize = summarize
+
+    def load_all(self):
+        """Holt IDs, Texte, Metadaten und Embeddings seitenweise aus der Collection"""
+        ids, docs, metas, vectors = [], [], [], []
+        offset = 0
+        while True:
+            batch = self.collection.get(limit=CONSOLIDATION_BATCH, offset=offset,
+                                        include=("documents", "metadatas", "embeddings"))
+            if not batch['ids']:
+                break
+            ids.extend(batch['ids'])
+            docs.extend(batch['documents'])
+            metas.extend(m or {} for m in batch['metadatas'])
+            vectors.extend(np.asarray(e, dtype=np.float32) for e in batch['embeddings'])
+            offset += len(batch['ids'])
+        matrix = np.vstack(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+        return ids, docs, metas, matrix
+
+    @staticmethod
+    def _normalize(matrix: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.maximum(norms, 1e-12)
+
+    def _partition(self, normed: np.ndarray, iterations: int = 8) -> List[np.ndarray]:
+        """Grobe Vorsortierung per sphärischem k-Means, damit nicht n² verglichen wird"""
+        n = len(normed)
+        k = max(1, n // PARTITION_SIZE)
+        if n <= MAX_PARTITION_SIZE:
+            return [np.arange(n)]
+        rng = np.random.default_rng(0)
+        centroids = normed[rng.choice(n, size=k, replace=False)].copy()
+        for _ in range(iterations):
+            assign = np.argmax(normed @ centroids.T, axis=1)
+            for c in range(k):
+                members = normed[assign == c]
+                if len(members):
+                    centroid = members.sum(axis=0)
+                    centroids[c] = centroid / (np.linalg.norm(centroid) or 1.0)
+        assign = np.argmax(normed @ centroids.T, axis=1)
+        parts = []
+        for c in range(k):
+            part = np.flatnonzero(assign == c)
+            if len(part) > MAX_PARTITION_SIZE:
+                # Zu große Partition nach Ähnlichkeit zum Zentrum sortiert aufteilen: Nachbarn bleiben meist zusammen
+                part = part[np.argsort(-(normed[part] @ centroids[c]))]
+                parts.extend(part[i:i + PARTITION_SIZE] for i in range(0, len(part), PARTITION_SIZE))
+            elif len(part):
+                parts.append(part)
+        return parts
+
+    def cluster(self, matrix: np.ndarray) -> List[List[int]]:
+        """Dichte Cluster (>= min_cluster Mitglieder, alle nah am Medoid)"""
+        if not len(matrix):
+            return []
+        normed = self._normalize(matrix)
+        clusters = []
+        for part in self._partition(normed):
+            sims = normed[part] @ normed[part].T
+            neighbours = sims >= self.similarity
+            free = np.ones(len(part), dtype=bool)
+            while True:
+                # Medoid = freier Punkt mit den meisten freien Nachbarn
+                counts = (neighbours & free).sum(axis=1) * free
+                center = int(np.argmax(counts))
+                if counts[center] < self.min_cluster:
+                    break
+                members = np.flatnonzero(neighbours[center] & free)
+                free[members] = False
+                # Medoid zuerst, danach nach Ähnlichkeit
+                members = members[np.argsort(-sims[center, members])]
+                clusters.append([int(part[m]) for m in members])
+        return clusters
+
+    def _summarize(self, docs: List[str]) -> Optional[str]:
+        if not self.summarize:
+            return None
+        joined = "\n".join(f"- {doc}" for doc in docs[:20])
+        prompt = f"""Fasse die folgenden, sehr ähnlichen Erinnerungen zu einer einzigen Erinnerung zusammen.
+Behalte alle konkreten Fakten (Namen, Daten, Vorlieben). Maximal 3 Sätze, keine Einleitung.
+
+{joined}"""
+        try:
+            with get_scheduler().slot(DREAM):
+                response = self.client.chat(model=SUMMARY_MODEL, messages=[{'role': 'user', 'content': prompt}],
+                                            options=ollama_options(), keep_alive=keep_alive_for(SUMMARY_MODEL))
+            summary = response['message']['content'].strip()
+            return summary or None
+        except Exception as e:
+            print(f"Zusammenfassung fehlgeschlagen, nutze Medoid: {e}")
+            return None
+
+    def _merged_metadata(self, member_ids: List[str], metas: List[Dict], content: str) -> Dict:
+        timestamps = sorted(str(m.get('timestamp')) for m in metas if m.get('timestamp'))
+        importance = [float(m[key]) for m in metas for key in ('importance', 'importance_score') if key in m]
+        types = sorted({str(m.get('type', 'unknown')) for m in metas})
+        now = str(datetime.now())
+        metadata = {
+            'type': 'consolidated',
+            'timestamp': now,
+            'last_seen': now,
+            # Chroma erlaubt nur skalare Metadaten -> Herkunft als JSON-String
+            'consolidated_from': json.dumps(member_ids),
+            'source_count': len(member_ids),
+            'source_types': ",".join(types),
+            'hit_count': sum(int(m.get('hit_count', 1)) for m in metas),
+            'content_hash': hashlib.sha256(content.strip().encode('utf-8')).hexdigest()
+        }
+        if timestamps:
+            metadata['first_timestamp'] = timestamps[0]
+            metadata['last_timestamp'] = timestamps[-1]
+        if importance:
+            metadata['importance'] = max(importance)
+        return metadata
+
+    def _probe_latency(self, matrix: np.ndarray, samples: int = 20) -> float:
+        """Median der Query-Latenz (ms) über zufällige vorhandene Vektoren"""
+        if not len(matrix):
+            return 0.0
+        rng = np.random.default_rng(1)
+        timings = []
+        for row in rng.choice(len(matrix), size=min(samples, len(matrix)), replace=False):
+            start = time.perf_counter()
+            self.collection.query(query_embeddings=[matrix[row].tolist()], n_results=5)
+            timings.append((time.perf_counter() - start) * 1000)
+        return float(np.median(timings))
+
+    def run(self, dry_run: bool = False) -> Dict:
+        """Führt die Konsolidierung aus und gibt einen Bericht zurück"""
+        started = time.perf_counter()
+        ids, docs, metas, matrix = self.load_all()
+        before = len(ids)
+        latency_before = self._probe_latency(matrix)
+        clusters = self.cluster(matrix)
+
+        removed = 0
+        for members in clusters:
+            member_ids = [ids[i] for i in members]
+            member_docs = [docs[i] for i in members]
+            if dry_run:
+                removed += len(members) - 1
+                continue
+
+            content = self._summarize(member_docs) or member_docs[0]
+            embedding = self.long_term._get_embedding(content)
+            if not embedding:
+                # Fallback: Zentrum des Clusters
+                embedding = self._normalize(matrix[members]).mean(axis=0).tolist()
+            metadata = self._merged_metadata(member_ids, [metas[i] for i in members], content)
+            new_id = f"consolidated_{hashlib.sha1(''.join(member_ids).encode()).hexdigest()[:16]}"
+
+            # Erst die Zusammenfassung schreiben, dann löschen: ein Abbruch verliert nichts
+            self.collection.add(ids=[new_id], documents=[content], embeddings=[embedding], metadatas=[metadata])
+            self.collection.delete(ids=member_ids)
+            removed += len(members) - 1
+            print(f"🧩 {len(members)} Erinnerungen zusammengefasst: {content[:60]}...")
+
+        after = before - removed if dry_run else self.collection.count()
+        latency_after = latency_before if dry_run else self._probe_latency(self.load_all()[3])
+        report = {
+            'memories_before': before,
+            'memories_after': after,
+            'clusters_merged': len(clusters),
+            'shrink_ratio': round(1 - after / before, 3) if before else 0.0,
+            'query_ms_before': round(latency_before, 2),
+            'query_ms_after': round(latency_after, 2),
+            'duration_s': round(time.perf_counter() - started, 1),
+            'dry_run': dry_run
+        }
+        print(f"🧹 Konsolidierung: {before} -> {after} Erinnerungen ({len(clusters)} Cluster), "
+              f"Query {report['query_ms_before']}ms -> {report['query_ms_after']}ms")
+        return report
+
+
+if __name__ == "__main__":
+    from memory.long_term import LongTermMemory
+
+    parser = argparse.ArgumentParser(description="Langzeitgedächtnis clustern und verdichten")
+    parser.add_argument("--dry-run", action="store_true", help="nur Cluster finden, nichts ändern")
+    parser.add_argument("--similarity", type=float, default=CONSOLIDATION_SIMILARITY)
+    parser.add_argument("--min-cluster", type=int, default=CONSOLIDATION_MIN_CLUSTER)
+    parser.add_argument("--no-summary", action="store_true", help="Medoid statt LLM-Zusammenfassung behalten")
+    args = parser.parse_args()
+
+    consolidator = MemoryConsolidator(LongTermMemory(), similarity=args.similarity,
+                                      min_cluster=args.min_cluster, summarize=not args.no_summary)
+    print(json.dumps(consolidator.run(dry_run=args.dry_run), indent=2))
@@ -0,0 +1,159 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+# Einträge im RAM-LRU (768 float32 ≈ 3 KB pro Eintrag)
+EMBEDDING_CACHE_SIZE = int(os.environ.get("MARA_EMBEDDING_CACHE_SIZE", "4096"))
+
+# Persistenter Zweitspeicher, wird von API und Dream-Service gemeinsam genutzt ("" = aus)
+EMBEDDING_CACHE_DB = os.environ.get("MARA_EMBEDDING_CACHE_DB", "data/embeddings.db")
+
+
+class _Flight:
+    """Ein laufender Embedding-Request, auf den gleichzeitige Anfragen warten"""
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class EmbeddingCache:
+    """Zweistufiger Embedding-Cache (LRU + SQLite), Schlüssel: (Modell, sha256(Text))"""
+
+    def __init__(self, max_entries: int = EMBEDDING_CACHE_SIZE, db_path: Optional[str] = EMBEDDING_CACHE_DB):
+        self.max_entries = max_entries
+        self._lru: "OrderedDict[tuple, array]" = OrderedDict()
+        self._inflight: Dict[tuple, _Flight] = {}
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.shared = 0
+
+        self._db = None
+        self._db_lock = threading.Lock()
+        if db_path:
+            try:
+                os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+                self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS embeddings ("
+                    "model TEXT NOT NULL, hash TEXT NOT NULL, vector BLOB NOT NULL, "
+                    "PRIMARY KEY (model, hash)) WITHOUT ROWID"
+                )
+            except Exception as e:
+                print(f"Embedding-Cache ohne Plattenspeicher ({db_path}): {e}")
+                self._db = None
+
+    @staticmethod
+    def key(model: str, text: str) -> tuple:
+        return (model, hashlib.sha256(text.encode('utf-8')).hexdigest())
+
+    def _disk_get(self, key: tuple) -> Optional[array]:
+        if self._db is None:
+            return None
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT vector FROM embeddings WHERE model = ? AND hash = ?", key
+            ).fetchone()
+        if not row:
+            return None
+        vector = array('f')
+        vector.frombytes(row[0])
+        return vector
+
+    def _disk_put(self, key: tuple, vector: array):
+        if self._db is None:
+            return
+        try:
+            with self._db_lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO embeddings (model, hash, vector) VALUES (?, ?, ?)",
+                    (key[0], key[1], vector.tobytes())
+                )
+        except Exception as e:
+            print(f"Embedding-Cache Schreibfehler: {e}")
+
+    def _remember(self, key: tuple, vector: array):
+        with self._lock:
+            self._lru[key] = vector
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.max_entries:
+                self._lru.popitem(last=False)
+
+    def get_or_compute(self, model: str, text: str, compute: Callable[[str], List[float]]) -> List[float]:
+        """Liefert das Embedding aus dem Cache oder berechnet es genau einmal"""
+        key = self.key(model, text)
+        with self._lock:
+            vector = self._lru.get(key)
+            if vector is not None:
+                self._lru.move_to_end(key)
+                self.hits += 1
+                return vector.tolist()
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+            else:
+                self.shared += 1
+
+        if not leader:
+            # Gleicher Text wird gerade schon angefragt -> auf dasselbe Ergebnis warten
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result.tolist() if flight.result is not None else []
+
+        try:
+            vector = self._disk_get(key)
+            if vector is not None:
+                self.disk_hits += 1
+            else:
+                self.misses += 1
+                result = compute(text)
+                if result:
+                    vector = array('f', result)
+                    self._disk_put(key, vector)
+            if vector is not None:
+                self._remember(key, vector)
+            flight.result = vector
+            return vector.tolist() if vector is not None else []
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.event.set()
+
+    def stats(self) -> Dict:
+        requests = self.hits + self.disk_hits + self.misses + self.shared
+        return {
+            'entries': len(self._lru),
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'shared': self.shared,
+            'hit_rate': round((requests - self.misses) / requests, 3) if requests else 0.0
+        }
+
+
+_cache: Optional[EmbeddingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Gibt den prozessweiten Embedding-Cache zurück"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = EmbeddingCache()
+        return _cache
@@ -0,0 +1,233 @@
+import json
+import os
+import threading
+from typing import List, Dict
+
+# Wächst das Journal um so viele Bytes, wird im Hintergrund geprüft, ob sich Verdichten lohnt
+# (veraltete Einträge vor einem 'clear', kaputte Zeilen)
+COMPACT_THRESHOLD_BYTES = int(os.environ.get("MARA_JOURNAL_COMPACT_BYTES", 4 * 1024 * 1024))
+
+# Jede Zeile wird per fsync auf die Platte gebracht (abschaltbar für Tests/Benchmarks)
+JOURNAL_FSYNC = os.environ.get("MARA_JOURNAL_FSYNC", "1") != "0"
+
+# Blockgröße beim Rückwärtslesen vom Dateiende
+TAIL_BLOCK_BYTES = 64 * 1024
+
+CLEAR_OP = "clear"
+
+
+def _is_clear(record: Dict) -> bool:
+    return record.get('op') == CLEAR_OP
+
+
+def _encode(record: Dict) -> bytes:
+    return (json.dumps(record, ensure_ascii=False) + "\n").encode('utf-8')
+
+
+class SessionJournal:
+    """Append-only JSONL-Journal: eine Zeile pro Nachricht, 'clear' als Markierung"""
+
+    def __init__(self, filepath: str, fsync: bool = JOURNAL_FSYNC,
+                 compact_threshold: int = COMPACT_THRESHOLD_BYTES):
+        self.filepath = filepath
+        self.fsync = fsync
+        self.compact_threshold = compact_threshold
+        self._lock = threading.Lock()
+        self._compacting = False
+        # Dateigröße, ab der die nächste Prüfung läuft (unabhängig davon, wie die Datei gelesen wurde)
+        self._next_check = compact_threshold
+
+    def migrate_from(self, legacy_path: str) -> bool:
+        """Übernimmt eine alte JSON-Verlaufsdatei einmalig ins Journal"""
+        if os.path.exists(self.filepath) or not os.path.exists(legacy_path):
+            return False
+        try:
+            with open(legacy_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            print(f"Fehler beim Migrieren von {legacy_path}: {e}")
+            return False
+        if not isinstance(data, list):
+            return False
+
+        os.makedirs(os.path.dirname(self.filepath) or ".", exist_ok=True)
+        tmp_path = self.filepath + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(b"".join(_encode(msg) for msg in data if isinstance(msg, dict)))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.filepath)
+        # Alte Datei bleibt als Sicherung liegen, wird aber nicht erneut migriert
+        os.replace(legacy_path, legacy_path + ".migrated")
+        print(f"📦 Verlauf migriert: {legacy_path} -> {self.filepath} ({len(data)} Nachrichten)")
+        return True
+
+    def _repair(self):
+        """Schneidet eine halb geschriebene letzte Zeile (Absturz beim Schreiben) ab"""
+        if not os.path.exists(self.filepath):
+            return
+        with open(self.filepath, 'rb+') as f:
+            size = f.seek(0, os.SEEK_END)
+            if size == 0:
+                return
+            f.seek(size - 1)
+            if f.read(1) == b"\n":
+                return
+            # Rückwärts bis zum letzten vollständigen Zeilenende suchen
+            pos = size
+            block = 4096
+            while pos > 0:
+                start = max(0, pos - block)
+                f.seek(start)
+                chunk = f.read(pos - start)
+                idx = chunk.rfind(b"\n")
+                if idx >= 0:
+                    f.truncate(start + idx + 1)
+                    return
+                pos = start
+            f.truncate(0)
+
+    def read_all(self) -> List[Dict]:
+        """Liest das komplette Journal und gibt den aktuellen Verlauf zurück"""
+        with self._lock:
+            self._repair()
+            if not os.path.exists(self.filepath):
+                return []
+            conversation, _, _ = self._read_live(os.path.getsize(self.filepath))
+            return conversation
+
+    def read_tail(self, limit: int) -> List[Dict]:
+        """Liest nur die letzten `limit` Nachrichten rückwärts vom Dateiende"""
+        if limit <= 0:
+            return []
+        with self._lock:
+            self._repair()
+            if not os.path.exists(self.filepath):
+                return []
+            records = []
+            with open(self.filepath, 'rb') as f:
+                pos = f.seek(0, os.SEEK_END)
+                rest = b""
+                while pos > 0 and len(records) < limit:
+                    start = max(0, pos - TAIL_BLOCK_BYTES)
+                    f.seek(start)
+                    buf = f.read(pos - start) + rest
+                    lines = buf.split(b"\n")
+                    # Die erste Zeile kann abgeschnitten sein, außer wir sind am Dateianfang
+                    rest = lines.pop(0) if start > 0 else b""
+                    for raw in reversed(lines):
+                        if len(records) >= limit:
+                            break
+                        record = self._decode(raw)
+                        if record is None:
+                            continue
+                        if _is_clear(record):
+                            return list(reversed(records))
+                        records.append(record)
+                    pos = start
+            return list(reversed(records))
+
+    @staticmethod
+    def _decode(raw: bytes):
+        if not raw.strip():
+            return None
+        try:
+            record = json.loads(raw)
+        except ValueError:
+            return None
+        return record if isinstance(record, dict) else None
+
+    def _read_live(self, end: int):
+        """Liest die ersten `end` Bytes und wendet 'clear'-Markierungen an"""
+        conversation = []
+        lines = 0
+        dead = 0
+        with open(self.filepath, 'rb') as f:
+            for raw in f.read(end).splitlines():
+                lines += 1
+                try:
+                    record = json.loads(raw)
+                except ValueError:
+                    dead += 1
+                    continue
+                if not isinstance(record, dict):
+                    dead += 1
+                    continue
+                if _is_clear(record):
+                    dead = lines
+                    conversation = []
+                    continue
+                conversation.append(record)
+        return conversation, lines, dead
+
+    def _write(self, payload: bytes):
+        os.makedirs(os.path.dirname(self.filepath) or ".", exist_ok=True)
+        with open(self.filepath, 'ab') as f:
+            f.write(payload)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+
+    def append(self, records: List[Dict]):
+        """Hängt Nachrichten als einzelne Zeilen an (ein Schreibvorgang, ein fsync)"""
+        if not records:
+            return
+        with self._lock:
+            self._write(b"".join(_encode(r) for r in records))
+        self._maybe_compact()
+
+    def clear(self):
+        """Markiert den bisherigen Verlauf als gelöscht"""
+        with self._lock:
+            self._write(_encode({'op': CLEAR_OP}))
+        self._maybe_compact()
+
+    def _maybe_compact(self):
+        if self._compacting:
+            return
+        try:
+            if os.path.getsize(self.filepath) < self._next_check:
+                return
+        except OSError:
+            return
+        self._compacting = True
+        threading.Thread(target=self._compact, daemon=True, name="journal-compact").start()
+
+    def compact(self):
+        """Verdichtet das Journal synchron (schreibt nur den lebenden Verlauf neu)"""
+        self._compacting = True
+        self._compact()
+
+    def _compact(self):
+        tmp_path = self.filepath + ".compact"
+        try:
+            with self._lock:
+                end = os.path.getsize(self.filepath)
+            # Der teure Teil läuft ohne Lock, parallele Appends landen hinter `end`
+            live, _, dead = self._read_live(end)
+            if not dead:
+                # Nichts zu holen: erst nach weiterem Wachstum wieder prüfen
+                self._next_check = end + self.compact_threshold
+                return
+            with open(tmp_path, 'wb') as f:
+                f.write(b"".join(_encode(r) for r in live))
+
+            with self._lock:
+                with open(self.filepath, 'rb') as src:
+                    src.seek(end)
+                    tail = src.read()
+                with open(tmp_path, 'ab') as f:
+                    f.write(tail)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.filepath)
+                self._next_check = os.path.getsize(self.filepath) + self.compact_threshold
+            print(f"🗜️ Journal verdichtet: {self.filepath} ({end} -> {os.path.getsize(self.filepath)} Bytes)")
+        except Exception as e:
+            print(f"Fehler beim Verdichten des Journals: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+        finally:
+            self._compacting = False
@@ -1,54 +1,86 @@
-import chromadb
-import ollama
-import numpy as np
 from typing import List, Dict, Optional, Any
+import hashlib
 import json
+import os
+import time
 from datetime import datetime
 import uuid
 
+from memory.embedding_cache import get_embedding_cache
+from clients import get_ollama_client, get_vector_backend
+from lexicon import scan
+from memory.recall_cache import get_recall_cache
+from models import EMBEDDING_MODEL, keep_alive_for, latency_stats
+from scheduler import get_scheduler, BACKGROUND_EMBED, INTERACTIVE_EMBED
+
+# Beinahe-Duplikate: Kosinus-Ähnlichkeit zum nächsten Nachbarn ab der kein neuer Eintrag entsteht (0 = aus)
+DEDUP_SIMILARITY_THRESHOLD = float(os.environ.get("MARA_DEDUP_THRESHOLD", "0.97"))
+
+# Prozessweite Zähler für /metrics
+write_stats = {'inserted': 0, 'exact_duplicates': 0, 'near_duplicates': 0}
+
 class LongTermMemory:
     def __init__(self):
-        # ChromaDB Client
-        self.client = chromadb.HttpClient(host="chromadb", port=8000)
+        # Geteilte Clients aus der prozessweiten Registry (kein Verbindungsaufbau pro Session)
+        self.ollama_client = get_ollama_client()
         
-        # Ollama Client mit richtigem Hostnamen
-        self.ollama_client = ollama.Client(host='http://ollama:11434')
-        
-        # Erstelle oder hole Collection
-        try:
-            self.collection = self.client.get_or_create_collection(name="mara_memories")
-        except Exception as e:
-            print(f"Fehler beim Verbinden mit Collection: {e}")
-            self.collection = self.client.create_collection("mara_memories")
+        # Vektor-Backend: Chroma-Server oder lokaler NumPy-Index (MARA_VECTOR_BACKEND)
+        self.collection = get_vector_backend("mara_memories")
     
-    def _get_embedding(self, text: str) -> List[float]:
-        """Erstelle Embedding mit Ollama"""
+    def _get_embedding(self, text: str, priority: str = BACKGROUND_EMBED) -> List[float]:
+        """Erstelle Embedding mit Ollama (gecacht: jeder Text kostet nur einen Request)"""
         try:
-            # Nutze das schnellere Embedding-Modell
-            response = self.ollama_client.embeddings(model='nomic-embed-text', prompt=text) 
-            return response['embedding']
+            return get_embedding_cache().get_or_compute(
+                EMBEDDING_MODEL, text, lambda t: self._request_embedding(t, priority)
+            )
         except Exception as e:
             print(f"Embedding Fehler: {e}")
             return []
+
+    def _request_embedding(self, text: str, priority: str = BACKGROUND_EMBED) -> List[float]:
+        # Nutze das schnellere Embedding-Modell
+        with get_scheduler().slot(priority):
+            started = time.perf_counter()
+            response = self.ollama_client.embeddings(model=EMBEDDING_MODEL, prompt=text,
+                                                     keep_alive=keep_alive_for(EMBEDDING_MODEL))
+        latency_stats.record(EMBEDDING_MODEL, (time.perf_counter() - started) * 1000)
+        return response['embedding']
     
     def add_memory(self, content: str, metadata: Optional[Dict] = None):
         """Speichere Gedächtnis in Vector-Datenbank (Hieß vorher store_memory)"""
         if not content:
             return
 
+        # 1) Exakt gleicher Inhalt schon gespeichert? -> nur Metadaten auffrischen
+        content_hash = hashlib.sha256(content.strip().encode('utf-8')).hexdigest()
+        duplicate = self._find_by_hash(content_hash)
+        if duplicate:
+            self._touch_memory(*duplicate)
+            write_stats['exact_duplicates'] += 1
+            return
+
         embedding = self._get_embedding(content)
         if not embedding:
             return
+
+        # 2) Sehr ähnlicher Nachbar (z.B. nur Satzzeichen anders)?
+        duplicate = self._find_near_duplicate(embedding)
+        if duplicate:
+            self._touch_memory(*duplicate)
+            write_stats['near_duplicates'] += 1
+            return
         
         # Standard-Metadaten
+        now = str(datetime.now())
         default_metadata = {
-            'timestamp': str(datetime.now()),
+            'timestamp': now,
             'type': 'user_generated' if not metadata else metadata.get('type', 'user_generated')
         }
         
         # Kombiniere Metadaten
         if metadata:
             default_metadata.update(metadata)
+        default_metadata.update({'content_hash': content_hash, 'hit_count': 1, 'last_seen': now})
         
         # IDs müssen Strings sein
         self.collection.add(
@@ -57,7 +89,57 @@ class LongTermMemory:
             metadatas=[default_metadata],
             ids=[str(uuid.uuid4())]
         )
+        write_stats['inserted'] += 1
         print(f"💾 Erinnerung gespeichert: {content[:30]}...")
+
+    def _find_by_hash(self, content_hash: str):
+        try:
+            result = self.collection.get(where={'content_hash': content_hash}, limit=1, include=("metadatas",))
+        except Exception as e:
+            print(f"Fehler bei der Duplikatsuche: {e}")
+            return None
+        if result and result['ids']:
+            return result['ids'][0], result['metadatas'][0] or {}
+        return None
+
+    def _find_near_duplicate(self, embedding: List[float]):
+        if DEDUP_SIMILARITY_THRESHOLD <= 0:
+            return None
+        try:
+            result = self.collection.query(
+                query_embeddings=[embedding],
+                n_results=1,
+                include=("metadatas", "embeddings")
+            )
+        except Exception as e:
+            print(f"Fehler bei der Duplikatsuche: {e}")
+            return None
+        if not result or not result['ids'] or not result['ids'][0]:
+            return None
+
+        # Kosinus selbst berechnen: Chroma liefert je nach Collection L2-Distanzen
+        import numpy as np
+        a = np.asarray(embedding, dtype=np.float32)
+        b = np.asarray(result['embeddings'][0][0], dtype=np.float32)
+        denom = float(np.linalg.norm(a) * np.linalg.norm(b))
+        if denom == 0 or float(a @ b) / denom < DEDUP_SIMILARITY_THRESHOLD:
+            return None
+        return result['ids'][0][0], result['metadatas'][0][0] or {}
+
+    def _touch_memory(self, memory_id: str, metadata: Dict):
+        """Zählt einen erneuten Treffer statt einen neuen Eintrag anzulegen"""
+        try:
+            self.collection.update(
+                ids=[memory_id],
+                metadatas=[{
+                    'hit_count': int(metadata.get('hit_count', 1)) + 1,
+                    'last_seen': str(datetime.now())
+                }],
+                # Nur Zähler -> gecachte Suchergebnisse bleiben gültig
+                invalidate=False
+            )
+        except Exception as e:
+            print(f"Fehler beim Aktualisieren der Erinnerung: {e}")
     
     def store_conversation_memory(self, conversation: List[Dict], importance_score: float = 0.0):
         """Speichere eine ganze Konversation mit Wichtigkeitsbewertung"""
@@ -77,30 +159,17 @@ class LongTermMemory:
     
     def evaluate_importance(self, message: str, role: str) -> float:
         """Bewerte die Wichtigkeit einer Nachricht (0.0 - 1.0)"""
-        # Schlüsselwörter, die Wichtigkeit signalisieren
-        important_keywords = [
-            'wichtig', 'erinnere', 'merke', 'vergiss nicht', 'wichtig ist',
-            'birthday', 'geburtstag', 'anniversary', 'hochzeitstag',
-            'liebe', 'freund', 'familie', 'kind', 'sohn', 'tochter',
-            'arbeit', 'job', 'projekt', 'ziel', 'traum',
-            'problem', 'schwierig', 'hilfe', 'brauche'
-        ]
-        
-        # Namen (könnte erweitert werden)
-        names = ['josua', 'joshi', 'mara', 'frau', 'sohn']
-        
-        message_lower = message.lower()
+        # Schlüsselwörter und Namen: siehe lexicon.IMPORTANCE_KEYWORDS
+        hits = scan(message)
         score = 0.0
         
         # Prüfe auf wichtige Schlüsselwörter
-        for keyword in important_keywords:
-            if keyword in message_lower:
-                score += 0.3
+        for _keyword in hits.get('importance.keyword', ()):
+            score += 0.3
         
         # Prüfe auf Namen
-        for name in names:
-            if name in message_lower:
-                score += 0.2
+        for _name in hits.get('importance.name', ()):
+            score += 0.2
         
         # Längere Nachrichten sind oft wichtiger
         if len(message) > 100:
@@ -109,7 +178,7 @@ class LongTermMemory:
             score += 0.1
         
         # Assistant-Nachrichten mit persönlichen Inhalten
-        if role == 'assistant' and any(word in message_lower for word in ['du hast', 'ich merke', 'wichtig']):
+        if role == 'assistant' and 'importance.assistant' in hits:
             score += 0.2
         
         return min(1.0, score)  # Maximal 1.0
@@ -132,13 +201,27 @@ class LongTermMemory:
     
     def search_memories(self, query: str, n_results: int = 5, min_importance: float = 0.0) -> List[Dict]:
         """Suche ähnliche Erinnerungen"""
-        embedding = self._get_embedding(query)
-        if not embedding:
-            return []
-        
         # Filter für minimale Wichtigkeit (optional)
         # Hinweis: where-Filter funktioniert nur, wenn 'importance' auch in Metadaten existiert
         where_filter = {"importance": {"$gte": min_importance}} if min_importance > 0 else None
+
+        # Gleiche (normalisierte) Anfrage seit dem letzten Schreibzugriff? -> Ergebnis wiederverwenden
+        cache = get_recall_cache()
+        cache_key = cache.make_key(query, n_results, where_filter)
+        try:
+            version = self.collection.data_version()
+        except Exception as e:
+            print(f"Fehler beim Lesen der Collection-Version: {e}")
+            version = None
+        if version is not None:
+            cached = cache.get(cache_key, version)
+            if cached is not None:
+                return cached
+
+        # Recall im Turn / über /recall: jemand wartet auf das Ergebnis
+        embedding = self._get_embedding(query, INTERACTIVE_EMBED)
+        if not embedding:
+            return []
         
         try:
             results = self.collection.query(
@@ -161,5 +244,7 @@ class LongTermMemory:
                 'metadata': results['metadatas'][0][i] if results['metadatas'] else {},
                 'distance': results['distances'][0][i] if results['distances'] else 0
             })
-            
+
+        if version is not None:
+            cache.put(cache_key, version, memories)
         return memories
\ No newline at end of file
@@ -0,0 +1,52 @@
+"""Kopiert die Chroma-Collection in den lokalen NumPy-Index.
+
+Aufruf (im mara-api Container):
+    python -m memory.migrate_vectors [--collection mara_memories] [--batch 256]
+"""
+import argparse
+import time
+
+from memory.numpy_backend import NumpyVectorBackend
+from memory.vector_store import ChromaBackend, VECTOR_DIR
+
+
+def migrate(name: str = "mara_memories", batch_size: int = 256, root: str = VECTOR_DIR) -> int:
+    source = ChromaBackend.connect(name)
+    target = NumpyVectorBackend(name, root=root)
+    total = source.count()
+    print(f"📦 Migriere {total} Erinnerungen aus Chroma '{name}' nach {target.dir}")
+
+    copied = 0
+    offset = 0
+    start = time.perf_counter()
+    while offset < total:
+        batch = source.get(limit=batch_size, offset=offset, include=("documents", "metadatas", "embeddings"))
+        ids = batch['ids']
+        if not ids:
+            break
+        offset += len(ids)
+
+        # Bereits übernommene IDs überspringen, damit die Migration wiederholbar ist
+        existing = set(target.get(ids=ids, include=())['ids'])
+        rows = [i for i, doc_id in enumerate(ids) if doc_id not in existing]
+        if rows:
+            target.add(
+                ids=[ids[i] for i in rows],
+                documents=[batch['documents'][i] or "" for i in rows],
+                embeddings=[list(batch['embeddings'][i]) for i in rows],
+                metadatas=[batch['metadatas'][i] or {} for i in rows]
+            )
+            copied += len(rows)
+        print(f"   {offset}/{total} gelesen, {copied} kopiert")
+
+    print(f"✅ Migration fertig: {copied} neu, {target.count()} im Zielindex ({time.perf_counter() - start:.1f}s)")
+    return copied
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Chroma-Collection in den lokalen NumPy-Vektorindex kopieren")
+    parser.add_argument("--collection", default="mara_memories")
+    parser.add_argument("--batch", type=int, default=256)
+    parser.add_argument("--target", default=VECTOR_DIR)
+    args = parser.parse_args()
+    migrate(args.collection, args.batch, args.target)
@@ -0,0 +1,308 @@
+"""Lokales Vektor-Backend (MARA_VECTOR_BACKEND=numpy).
+
+Eigenes Modul, damit NumPy nur geladen wird, wenn dieses Backend tatsächlich benutzt wird.
+"""
+import fcntl
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import List, Dict, Optional
+
+import numpy as np
+
+from memory.vector_store import DEFAULT_INCLUDE, VECTOR_DIR, matches_where
+
+# Approximativer Modus (IVF): nur die nächsten Cluster werden exakt durchsucht
+VECTOR_APPROXIMATE = os.environ.get("MARA_VECTOR_APPROXIMATE", "0") == "1"
+APPROX_MIN_ROWS = int(os.environ.get("MARA_VECTOR_APPROX_MIN_ROWS", "20000"))
+APPROX_NPROBE = int(os.environ.get("MARA_VECTOR_APPROX_NPROBE", "8"))
+
+
+class NumpyVectorBackend:
+    """Lokaler Vektorindex: memory-mapped float32-Matrix + Metadaten-Log, Kosinus-Top-k mit NumPy"""
+
+    def __init__(self, name: str = "mara_memories", root: str = VECTOR_DIR,
+                 approximate: bool = VECTOR_APPROXIMATE, nprobe: int = APPROX_NPROBE):
+        self.name = name
+        self.dir = os.path.join(root, name)
+        os.makedirs(self.dir, exist_ok=True)
+        self.vec_path = os.path.join(self.dir, "vectors.f32")
+        self.meta_path = os.path.join(self.dir, "meta.jsonl")
+        self.header_path = os.path.join(self.dir, "header.json")
+        self.lock_path = os.path.join(self.dir, ".lock")
+        self.approximate = approximate
+        self.nprobe = nprobe
+
+        self._lock = threading.RLock()
+        # Wird bei jeder übernommenen Änderung erhöht, auch bei Änderungen anderer Prozesse
+        self.version = 0
+        self._dim: Optional[int] = None
+        self._rows = 0
+        self._matrix = None
+        self._norms = np.zeros(0, dtype=np.float32)
+        self._ids: List[str] = []
+        self._docs: List[str] = []
+        self._metas: List[Dict] = []
+        self._row_of: Dict[str, int] = {}
+        self._alive = np.zeros(0, dtype=bool)
+        self._meta_offset = 0
+
+        # IVF-Index für den approximativen Modus
+        self._centroids = None
+        self._lists: List[np.ndarray] = []
+        self._indexed_rows = 0
+
+        self._refresh()
+
+    @contextmanager
+    def _file_lock(self, exclusive: bool):
+        # API und Dream-Service schreiben in dieselben Dateien -> prozessübergreifend sperren
+        with open(self.lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _refresh(self):
+        """Übernimmt neue Einträge aus dem Log (auch die anderer Prozesse)"""
+        with self._lock:
+            if self._dim is None and os.path.exists(self.header_path):
+                with open(self.header_path, 'r', encoding='utf-8') as f:
+                    self._dim = json.load(f)['dim']
+            if not os.path.exists(self.meta_path):
+                return
+            with open(self.meta_path, 'rb') as f:
+                f.seek(self._meta_offset)
+                data = f.read()
+            end = data.rfind(b"\n")
+            if end < 0:
+                return
+            self._meta_offset += end + 1
+
+            max_row = self._rows - 1
+            for raw in data[:end].split(b"\n"):
+                if raw.strip():
+                    record = json.loads(raw)
+                    max_row = max(max_row, self._apply(record))
+                    if not record.get('touch'):
+                        self.version += 1
+            self._map_rows(max_row + 1)
+
+    def data_version(self) -> int:
+        with self._lock:
+            self._refresh()
+            return self.version
+
+    def _apply(self, record: Dict) -> int:
+        op = record['op']
+        if op == 'add':
+            row = record['row']
+            while len(self._ids) <= row:
+                self._ids.append(None)
+                self._docs.append(None)
+                self._metas.append(None)
+            self._ids[row] = record['id']
+            self._docs[row] = record['document']
+            self._metas[row] = record.get('metadata') or {}
+            old = self._row_of.get(record['id'])
+            self._row_of[record['id']] = row
+            self._set_alive(row, True)
+            if old is not None and old != row:
+                self._set_alive(old, False)
+            return row
+        row = self._row_of.get(record['id'])
+        if row is None:
+            return -1
+        if op == 'update':
+            if record.get('metadata') is not None:
+                merged = dict(self._metas[row])
+                merged.update(record['metadata'])
+                self._metas[row] = {k: v for k, v in merged.items() if v is not None}
+            if record.get('document') is not None:
+                self._docs[row] = record['document']
+        elif op == 'delete':
+            self._set_alive(row, False)
+            del self._row_of[record['id']]
+        return -1
+
+    def _set_alive(self, row: int, alive: bool):
+        if row >= len(self._alive):
+            grown = np.zeros(max(row + 1, len(self._alive) * 2, 1024), dtype=bool)
+            grown[:len(self._alive)] = self._alive
+            self._alive = grown
+        self._alive[row] = alive
+
+    def _map_rows(self, rows: int):
+        if rows <= self._rows or not self._dim:
+            return
+        self._matrix = np.memmap(self.vec_path, dtype=np.float32, mode='r', shape=(rows, self._dim))
+        new_norms = np.linalg.norm(self._matrix[self._rows:rows], axis=1).astype(np.float32)
+        self._norms = np.concatenate([self._norms, new_norms])
+        self._rows = rows
+
+    def _append_log(self, records: List[Dict]):
+        with open(self.meta_path, 'ab') as f:
+            f.write(b"".join((json.dumps(r, ensure_ascii=False) + "\n").encode('utf-8') for r in records))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def add(self, ids, documents, embeddings, metadatas=None):
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if vectors.ndim != 2 or len(vectors) != len(ids):
+            raise ValueError("embeddings müssen eine Liste gleich langer Vektoren sein")
+        metadatas = metadatas or [None] * len(ids)
+        with self._lock, self._file_lock(exclusive=True):
+            self._refresh()
+            if self._dim is None:
+                self._dim = int(vectors.shape[1])
+                with open(self.header_path, 'w', encoding='utf-8') as f:
+                    json.dump({'dim': self._dim}, f)
+            elif vectors.shape[1] != self._dim:
+                raise ValueError(f"Dimension {vectors.shape[1]} passt nicht zu {self._dim}")
+
+            # Zeilen zuerst schreiben: jede Zeile im Log existiert damit bereits in der Matrix
+            start = os.path.getsize(self.vec_path) // (4 * self._dim) if os.path.exists(self.vec_path) else 0
+            with open(self.vec_path, 'ab') as f:
+                f.truncate(start * 4 * self._dim)
+                f.write(vectors.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            self._append_log([
+                {'op': 'add', 'row': start + i, 'id': ids[i], 'document': documents[i], 'metadata': metadatas[i]}
+                for i in range(len(ids))
+            ])
+            self._refresh()
+
+    def update(self, ids, metadatas=None, documents=None, embeddings=None, invalidate: bool = True):
+        """invalidate=False für reine Buchhaltungsfelder (hit_count, last_seen), die kein Ranking ändern"""
+        if embeddings is not None:
+            # Neue Vektoren -> neue Zeilen, die alten werden als tot markiert
+            with self._lock:
+                self._refresh()
+                current = self.get(ids=ids, include=("documents", "metadatas"))
+            by_id = {i: (d, m) for i, d, m in zip(current['ids'], current['documents'], current['metadatas'])}
+            new_docs, new_metas = [], []
+            for n, doc_id in enumerate(ids):
+                doc, meta = by_id.get(doc_id, ("", {}))
+                meta = dict(meta or {})
+                if metadatas and metadatas[n]:
+                    meta.update(metadatas[n])
+                new_docs.append(documents[n] if documents else doc)
+                new_metas.append(meta)
+            self.add(ids, new_docs, embeddings, new_metas)
+            return
+        with self._lock, self._file_lock(exclusive=True):
+            self._append_log([
+                {'op': 'update', 'id': doc_id,
+                 'metadata': metadatas[n] if metadatas else None,
+                 'document': documents[n] if documents else None,
+                 'touch': not invalidate}
+                for n, doc_id in enumerate(ids)
+            ])
+            self._refresh()
+
+    def delete(self, ids):
+        with self._lock, self._file_lock(exclusive=True):
+            self._append_log([{'op': 'delete', 'id': doc_id} for doc_id in ids])
+            self._refresh()
+
+    def count(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self._row_of)
+
+    def _filter_mask(self, where: Optional[Dict]) -> np.ndarray:
+        mask = self._alive[:self._rows].copy()
+        if where:
+            for row in np.flatnonzero(mask):
+                if not matches_where(self._metas[row], where):
+                    mask[row] = False
+        return mask
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=("documents", "metadatas")):
+        with self._lock:
+            self._refresh()
+            if ids is not None:
+                rows = [self._row_of[i] for i in ids if i in self._row_of]
+                rows = [r for r in rows if matches_where(self._metas[r], where)]
+            else:
+                rows = np.flatnonzero(self._filter_mask(where)).tolist()
+            rows = rows[offset or 0:]
+            if limit is not None:
+                rows = rows[:limit]
+            result = {'ids': [self._ids[r] for r in rows]}
+            if "documents" in include:
+                result['documents'] = [self._docs[r] for r in rows]
+            if "metadatas" in include:
+                result['metadatas'] = [dict(self._metas[r]) for r in rows]
+            if "embeddings" in include:
+                result['embeddings'] = [self._matrix[r].tolist() for r in rows]
+            return result
+
+    def query(self, query_embeddings, n_results: int = 10, where: Optional[Dict] = None, include=DEFAULT_INCLUDE):
+        with self._lock:
+            self._refresh()
+            result = {'ids': [], 'documents': [], 'metadatas': [], 'distances': []}
+            if "embeddings" in include:
+                result['embeddings'] = []
+            mask = self._filter_mask(where) if self._rows else np.zeros(0, dtype=bool)
+            for query_embedding in query_embeddings:
+                rows = self._top_k(np.asarray(query_embedding, dtype=np.float32), n_results, mask)
+                result['ids'].append([self._ids[r] for r, _ in rows])
+                result['documents'].append([self._docs[r] for r, _ in rows])
+                result['metadatas'].append([dict(self._metas[r]) for r, _ in rows])
+                result['distances'].append([d for _, d in rows])
+                if "embeddings" in include:
+                    result['embeddings'].append([self._matrix[r].tolist() for r, _ in rows])
+            return result
+
+    def _top_k(self, query: np.ndarray, k: int, mask: np.ndarray):
+        if not self._rows or k <= 0:
+            return []
+        candidates = np.flatnonzero(mask)
+        if self.approximate and self._rows >= APPROX_MIN_ROWS:
+            candidates = np.intersect1d(candidates, self._probe(query), assume_unique=True)
+        if not len(candidates):
+            return []
+
+        q_norm = float(np.linalg.norm(query)) or 1.0
+        norms = self._norms[candidates]
+        norms[norms == 0] = 1.0
+        sims = (self._matrix[candidates] @ query) / (norms * q_norm)
+        k = min(k, len(candidates))
+        top = np.argpartition(-sims, k - 1)[:k]
+        top = top[np.argsort(-sims[top])]
+        # Distanz = 1 - Kosinus-Ähnlichkeit (0 = identisch)
+        return [(int(candidates[i]), float(1.0 - sims[i])) for i in top]
+
+    def _probe(self, query: np.ndarray) -> np.ndarray:
+        """Kandidatenzeilen aus den nprobe nächsten IVF-Listen (+ alle seit dem Aufbau neuen Zeilen)"""
+        if self._centroids is None or self._rows > self._indexed_rows * 1.2:
+            self._build_ivf()
+        scores = self._centroids @ (query / (np.linalg.norm(query) or 1.0))
+        nearest = np.argsort(-scores)[:self.nprobe]
+        parts = [self._lists[c] for c in nearest] + [np.arange(self._indexed_rows, self._rows)]
+        return np.unique(np.concatenate(parts))
+
+    def _build_ivf(self, iterations: int = 10):
+        """Sphärisches k-Means über die normierten Vektoren"""
+        rows = self._rows
+        normed = self._matrix[:rows] / np.maximum(self._norms[:rows, None], 1e-12)
+        n_lists = max(1, int(np.sqrt(rows)))
+        rng = np.random.default_rng(0)
+        sample = normed[rng.choice(rows, size=min(rows, n_lists * 64), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=n_lists, replace=False)]
+        for _ in range(iterations):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            for c in range(n_lists):
+                members = sample[assign == c]
+                if len(members):
+                    centroid = members.sum(axis=0)
+                    centroids[c] = centroid / (np.linalg.norm(centroid) or 1.0)
+        assign = np.argmax(normed @ centroids.T, axis=1)
+        self._centroids = centroids
+        self._lists = [np.flatnonzero(assign == c) for c in range(n_lists)]
+        self._indexed_rows = rows
+        print(f"🧭 IVF-Index aufgebaut: {rows} Vektoren in {n_lists} Listen")
@@ -0,0 +1,97 @@
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+RECALL_CACHE_SIZE = int(os.environ.get("MARA_RECALL_CACHE_SIZE", "512"))
+# Auch ohne Versionswechsel nicht ewig gültig (falls das Erhöhen der Version fehlschlägt)
+RECALL_CACHE_TTL_SECONDS = float(os.environ.get("MARA_RECALL_CACHE_TTL", "300"))
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """Kleinschreibung, Leerraum zusammenfassen, Satzzeichen am Ende ignorieren"""
+    return _WHITESPACE.sub(" ", query.lower()).strip().rstrip(".!?…").strip()
+
+
+class RecallCache:
+    """Cache für search_memories-Ergebnisse, invalidiert über die Datenversion der Collection"""
+
+    def __init__(self, max_entries: int = RECALL_CACHE_SIZE, ttl: float = RECALL_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidated = 0
+        self.expired = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(query: str, n_results: int, where: Optional[Dict]) -> tuple:
+        return (normalize_query(query), n_results, json.dumps(where, sort_keys=True) if where else None)
+
+    def get(self, key: tuple, version) -> Optional[List[Dict]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            entry_version, stored_at, results = entry
+            if entry_version != version:
+                # Seit dem Eintrag wurde in die Collection geschrieben
+                del self._entries[key]
+                self.invalidated += 1
+                self.misses += 1
+                return None
+            if time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                self.expired += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return [dict(item) for item in results]
+
+    def put(self, key: tuple, version, results: List[Dict]):
+        with self._lock:
+            self._entries[key] = (version, time.monotonic(), [dict(item) for item in results])
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self.invalidated += len(self._entries)
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'invalidated': self.invalidated,
+            'expired': self.expired,
+            'evictions': self.evictions,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0
+        }
+
+
+_cache: Optional[RecallCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_recall_cache() -> RecallCache:
+    """Gibt den prozessweiten Recall-Cache zurück (die Collection ist für alle Sessions dieselbe)"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = RecallCache()
+        return _cache
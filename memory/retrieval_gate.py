@@ -0,0 +1,197 @@
+"""Entscheidet pro Turn, ob sich ein Memory-Retrieval lohnt.
+
+"hi", "ok" oder "danke" brauchen keine Erinnerungen – dafür sparen wir uns Embedding und
+Vektorsuche. Reihenfolge: Smalltalk-Liste, Erinnerungs-Hinweise, Wichtigkeits-Schlüsselwörter,
+Länge, optional ein leichter Klassifikator (Callable prompt -> Wahrscheinlichkeit).
+
+Replay über gespeicherte Sessions:
+    python -m memory.retrieval_gate [--sessions data/sessions] [--retrieval-ms 120] [--measure]
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, List, Optional
+
+from lexicon import scan
+from memory.recall_cache import normalize_query
+
+RETRIEVAL_GATE_ENABLED = os.environ.get("MARA_RETRIEVAL_GATE", "1") == "1"
+# Kürzere Nachrichten (in Wörtern) ohne Hinweis auf Erinnerungen werden nicht nachgeschlagen
+GATE_MIN_WORDS = int(os.environ.get("MARA_RETRIEVAL_GATE_MIN_WORDS", "4"))
+GATE_CLASSIFIER_THRESHOLD = float(os.environ.get("MARA_RETRIEVAL_GATE_THRESHOLD", "0.5"))
+GATE_LOG = os.environ.get("MARA_RETRIEVAL_GATE_LOG", "0") == "1"
+
+# Komplette Nachrichten, die nie Erinnerungen brauchen (nach normalize_query)
+SMALLTALK = {
+    'hi', 'hallo', 'hey', 'hallo mara', 'hi mara', 'hey mara', 'moin', 'servus', 'guten morgen',
+    'guten abend', 'gute nacht', 'ok', 'okay', 'ok danke', 'alles klar', 'klar', 'ja', 'nein', 'jep',
+    'nö', 'genau', 'stimmt', 'danke', 'danke dir', 'vielen dank', 'danke schön', 'dankeschön',
+    'super', 'cool', 'gut', 'sehr gut', 'schön', 'toll', 'haha', 'hahaha', 'lol', 'hmm', 'aha',
+    'tschüss', 'bis später', 'bis dann', 'ciao', 'bye', 'thanks', 'yes', 'no'
+}
+
+# Formulierungen, die auf frühere Gespräche oder persönliche Fakten zielen; Fragen in der
+# ersten Person ("Wer bin ich?", "Wo wohne ich?") sind kurz, brauchen aber Erinnerungen
+MEMORY_CUES = re.compile(
+    r"\b(erinnerst|erinnere|weißt du noch|weisst du noch|letztes mal|letzte woche|gestern|"
+    r"damals|vorhin|hab ich dir|habe ich dir|hatte ich|hab ich|habe ich|mein|meine|meinen|meinem|"
+    r"meiner|wer ist|wer war|wann|wie heißt|wie hieß|kennst du|über mich|von mir|"
+    r"ich|mich|mir|heiße|heisse|wohne)\b"
+)
+
+_WORD = re.compile(r"\w+")
+
+
+class GateDecision:
+    __slots__ = ('retrieve', 'reason')
+
+    def __init__(self, retrieve: bool, reason: str):
+        self.retrieve = retrieve
+        self.reason = reason
+
+
+class RetrievalGate:
+    """Billige Heuristik vor search_memories, zählt Entscheidungen und Gründe"""
+
+    def __init__(self, min_words: int = GATE_MIN_WORDS,
+                 classifier: Optional[Callable[[str], float]] = None,
+                 threshold: float = GATE_CLASSIFIER_THRESHOLD,
+                 enabled: bool = RETRIEVAL_GATE_ENABLED, log: bool = GATE_LOG):
+        self.min_words = min_words
+        self.classifier = classifier
+        self.threshold = threshold
+        self.enabled = enabled
+        self.log = log
+        self.reasons: Counter = Counter()
+        self.retrieved = 0
+        self.skipped = 0
+        self._lock = threading.Lock()
+
+    def _classify(self, prompt: str) -> GateDecision:
+        text = normalize_query(prompt)
+        if not text or text in SMALLTALK:
+            return GateDecision(False, 'smalltalk')
+        if MEMORY_CUES.search(text):
+            return GateDecision(True, 'memory_cue')
+        if any(category.startswith('importance.') for category in scan(text)):
+            return GateDecision(True, 'keyword')
+        # Kurze Fragen sind selten Smalltalk ("Was mag sie?") -> nicht an der Länge scheitern lassen
+        if len(_WORD.findall(text)) < self.min_words and not prompt.rstrip().endswith('?'):
+            return GateDecision(False, 'short')
+        if self.classifier is not None:
+            try:
+                probability = float(self.classifier(prompt))
+                return GateDecision(probability >= self.threshold, 'classifier')
+            except Exception as e:
+                print(f"Retrieval-Klassifikator fehlgeschlagen: {e}")
+        return GateDecision(True, 'default')
+
+    def decide(self, prompt: str) -> GateDecision:
+        decision = self._classify(prompt) if self.enabled else GateDecision(True, 'disabled')
+        with self._lock:
+            self.reasons[f"{'retrieve' if decision.retrieve else 'skip'}:{decision.reason}"] += 1
+            if decision.retrieve:
+                self.retrieved += 1
+            else:
+                self.skipped += 1
+        if self.log:
+            print(f"🚦 Retrieval {'ja' if decision.retrieve else 'nein'} ({decision.reason}): {prompt[:40]}")
+        return decision
+
+    def should_retrieve(self, prompt: str) -> bool:
+        return self.decide(prompt).retrieve
+
+    def stats(self) -> Dict:
+        total = self.retrieved + self.skipped
+        return {
+            'enabled': self.enabled,
+            'retrieved': self.retrieved,
+            'skipped': self.skipped,
+            'skip_rate': round(self.skipped / total, 3) if total else 0.0,
+            'reasons': dict(self.reasons)
+        }
+
+
+_gate: Optional[RetrievalGate] = None
+_gate_lock = threading.Lock()
+
+
+def get_retrieval_gate() -> RetrievalGate:
+    global _gate
+    with _gate_lock:
+        if _gate is None:
+            _gate = RetrievalGate()
+        return _gate
+
+
+def _load_user_prompts(sessions_dir: str) -> List[str]:
+    """User-Nachrichten aus JSON-Verläufen und Journalen (Reihenfolge je Datei)"""
+    from memory.journal import SessionJournal
+
+    prompts = []
+    for path in sorted(glob.glob(os.path.join(sessions_dir, "*.json")) +
+                       glob.glob(os.path.join(sessions_dir, "*.jsonl"))):
+        try:
+            if path.endswith(".jsonl"):
+                messages = SessionJournal(path).read_all()
+            else:
+                with open(path, 'r', encoding='utf-8') as f:
+                    messages = json.load(f)
+        except Exception as e:
+            print(f"Überspringe {path}: {e}")
+            continue
+        prompts.extend(m['content'] for m in messages if m.get('role') == 'user' and m.get('content'))
+    return prompts
+
+
+def replay(prompts: List[str], gate: RetrievalGate, retrieval_ms: float, long_term=None) -> Dict:
+    """Spielt die Prompts durch das Gate; mit long_term wird die echte Suchzeit gemessen"""
+    saved_ms = 0.0
+    measured = []
+    skipped_examples = []
+    for prompt in prompts:
+        decision = gate.decide(prompt)
+        cost = retrieval_ms
+        if long_term is not None:
+            start = time.perf_counter()
+            long_term.search_memories(prompt, n_results=3)
+            cost = (time.perf_counter() - start) * 1000
+            measured.append(cost)
+        if not decision.retrieve:
+            saved_ms += cost
+            if len(skipped_examples) < 10:
+                skipped_examples.append(prompt[:60])
+    report = gate.stats()
+    report.update({
+        'turns': len(prompts),
+        'retrieval_ms': round(sum(measured) / len(measured), 1) if measured else retrieval_ms,
+        'saved_ms_total': round(saved_ms, 1),
+        'saved_ms_per_turn': round(saved_ms / len(prompts), 1) if prompts else 0.0,
+        'skipped_examples': skipped_examples
+    })
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Retrieval-Gate über gespeicherte Sessions abspielen")
+    parser.add_argument("--sessions", default="data/sessions")
+    parser.add_argument("--retrieval-ms", type=float, default=120.0,
+                        help="angenommene Kosten eines Retrievals (ohne --measure)")
+    parser.add_argument("--measure", action="store_true",
+                        help="Retrieval wirklich ausführen und messen (braucht Ollama + Vektorstore)")
+    parser.add_argument("--min-words", type=int, default=GATE_MIN_WORDS)
+    args = parser.parse_args()
+
+    long_term = None
+    if args.measure:
+        from memory.long_term import LongTermMemory
+        long_term = LongTermMemory()
+
+    result = replay(_load_user_prompts(args.sessions), RetrievalGate(min_words=args.min_words, enabled=True),
+                    args.retrieval_ms, long_term)
+    print(json.dumps(result, indent=2, ensure_ascii=False))
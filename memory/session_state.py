@@ -0,0 +1,141 @@
+"""Zustand der Sessions außerhalb des Prozesses, damit mehrere uvicorn-Worker sich wie einer verhalten.
+
+Emotionen, Gedanken, Persönlichkeit, Träume, Unterbewusstsein, Reflexion und Lernen einer
+Session werden nach jedem Turn und jedem Nacharbeits-Job als JSON in SQLite geschrieben
+(`to_state()` der Subsysteme), zusammen mit einer Versionsnummer. Bevor ein Worker eine
+Session benutzt, vergleicht er die Version und lädt bei Abweichung neu (`from_state()`);
+geschrieben wird per Compare-and-Swap auf die gelesene Version (optimistisch, ohne Sperre).
+
+Der Verlauf selbst liegt im Verlaufs-Backend – mit mehreren Workern MARA_HISTORY_BACKEND=sqlite.
+Sticky Routing (gleiche Session -> gleicher Worker, z.B. `hash $session_id consistent;` in
+nginx) ist optional und macht Konflikte und Neuladen selten; `sticky_worker` liefert die
+Zuordnung für einen vorgeschalteten Proxy.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import nullcontext
+from typing import Dict, Optional, Tuple
+
+SESSION_STATE_ENABLED = os.environ.get("MARA_SESSION_STATE", "0") == "1"
+SESSION_STATE_DB = os.environ.get("MARA_SESSION_STATE_DB", "data/session_state.db")
+# Anzahl der Worker hinter dem Proxy (nur für sticky_worker)
+WORKERS = int(os.environ.get("MARA_WORKERS", "1"))
+
+# Session-Schlüssel mit to_state()/from_state()
+SUBSYSTEMS = ('emotions', 'thoughts', 'personality', 'dreams', 'subconscious', 'reflection', 'learning')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS session_state (
+    session_id TEXT PRIMARY KEY,
+    version INTEGER NOT NULL,
+    state TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+class StaleStateError(Exception):
+    """Ein anderer Worker hat die Session seit dem letzten Lesen verändert"""
+
+
+class SessionStateStore:
+    """Versionierter Zustand pro Session in einer gemeinsamen SQLite-Datei"""
+
+    def __init__(self, path: str = SESSION_STATE_DB):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self.loads = 0
+        self.saves = 0
+        self.conflicts = 0
+
+    def version(self, session_id: str) -> int:
+        """Aktuelle Version (0 = noch nie gespeichert); billig genug für jeden Turn"""
+        with self._lock:
+            row = self._conn.execute("SELECT version FROM session_state WHERE session_id = ?",
+                                     (session_id,)).fetchone()
+        return row[0] if row else 0
+
+    def load(self, session_id: str) -> Tuple[int, Optional[Dict]]:
+        with self._lock:
+            row = self._conn.execute("SELECT version, state FROM session_state WHERE session_id = ?",
+                                     (session_id,)).fetchone()
+            self.loads += 1
+        if not row:
+            return 0, None
+        return row[0], json.loads(row[1])
+
+    def save(self, session_id: str, state: Dict, expected_version: int) -> int:
+        """Schreibt nur, wenn die gespeicherte Version noch `expected_version` ist; liefert die neue"""
+        payload = json.dumps(state, ensure_ascii=False, separators=(',', ':'))
+        now = time.time()
+        with self._lock:
+            if expected_version == 0:
+                cur = self._conn.execute(
+                    "INSERT OR IGNORE INTO session_state (session_id, version, state, updated_at) VALUES (?, 1, ?, ?)",
+                    (session_id, payload, now)
+                )
+            else:
+                cur = self._conn.execute(
+                    "UPDATE session_state SET version = version + 1, state = ?, updated_at = ? "
+                    "WHERE session_id = ? AND version = ?",
+                    (payload, now, session_id, expected_version)
+                )
+            if cur.rowcount != 1:
+                self.conflicts += 1
+                raise StaleStateError(f"Session {session_id}: Version {expected_version} ist veraltet")
+            self.saves += 1
+        return expected_version + 1
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM session_state WHERE session_id = ?", (session_id,))
+
+    def stats(self) -> Dict:
+        return {'loads': self.loads, 'saves': self.saves, 'conflicts': self.conflicts}
+
+
+def snapshot(session: Dict) -> Dict:
+    """Zustand aller Subsysteme einer Session (unter der Sperre der Session, falls vorhanden)"""
+    with session.get('lock') or nullcontext():
+        # JSON-Runde: kopiert den Zustand, solange die Sperre gehalten wird
+        return json.loads(json.dumps({name: session[name].to_state() for name in SUBSYSTEMS if name in session},
+                                     ensure_ascii=False))
+
+
+def restore(session: Dict, state: Dict):
+    """Überträgt den gespeicherten Zustand in die Subsysteme der Session.
+
+    In-place: laufende Turns und Jobs halten Referenzen auf die Objekte.
+    """
+    with session.get('lock') or nullcontext():
+        for name in SUBSYSTEMS:
+            if name in state and name in session:
+                current = session[name]
+                current.__dict__.update(type(current).from_state(state[name]).__dict__)
+
+
+def sticky_worker(session_id: str, workers: int = WORKERS) -> int:
+    """Stabile Zuordnung Session -> Worker-Index (gleich in allen Prozessen, anders als hash())"""
+    return zlib.crc32(session_id.encode('utf-8')) % max(1, workers)
+
+
+_store: Optional[SessionStateStore] = None
+_store_lock = threading.Lock()
+
+
+def get_session_state_store() -> SessionStateStore:
+    """Gibt den prozessweiten Zustandsspeicher zurück"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SessionStateStore()
+        return _store
@@ -0,0 +1,205 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import List, Dict, Optional
+
+SESSION_DB_PATH = os.environ.get("MARA_SESSION_DB", "data/sessions.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    title TEXT,
+    created_at REAL NOT NULL,
+    last_activity REAL NOT NULL,
+    message_count INTEGER NOT NULL DEFAULT 0,
+    next_seq INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_activity ON sessions(last_activity DESC);
+CREATE TABLE IF NOT EXISTS messages (
+    session_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    extra TEXT,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (session_id, seq)
+) WITHOUT ROWID;
+"""
+
+
+def _row_to_message(row) -> Dict:
+    message = {'role': row[0], 'content': row[1]}
+    if row[2]:
+        message.update(json.loads(row[2]))
+    return message
+
+
+class SQLiteSessionStore:
+    """Prozessweiter SQLite-Speicher: Nachrichten nach (session_id, seq), Metadaten pro Session"""
+
+    def __init__(self, path: str = SESSION_DB_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def append(self, session_id: str, messages: List[Dict]):
+        """Hängt Nachrichten in einer Transaktion an und aktualisiert die Metadaten"""
+        if not messages:
+            return
+        now = time.time()
+        with self._lock:
+            cur = self._conn.cursor()
+            cur.execute("BEGIN IMMEDIATE")
+            try:
+                cur.execute(
+                    "INSERT OR IGNORE INTO sessions (session_id, created_at, last_activity) VALUES (?, ?, ?)",
+                    (session_id, now, now)
+                )
+                seq, title = cur.execute(
+                    "SELECT next_seq, title FROM sessions WHERE session_id = ?", (session_id,)
+                ).fetchone()
+                rows = []
+                for message in messages:
+                    extra = {k: v for k, v in message.items() if k not in ('role', 'content')}
+                    rows.append((session_id, seq, message.get('role', ''), message.get('content', ''),
+                                 json.dumps(extra, ensure_ascii=False) if extra else None, now))
+                    if title is None and message.get('role') == 'user' and message.get('content'):
+                        title = message['content'][:60]
+                    seq += 1
+                cur.executemany(
+                    "INSERT INTO messages (session_id, seq, role, content, extra, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+                cur.execute(
+                    "UPDATE sessions SET next_seq = ?, message_count = message_count + ?, last_activity = ?, title = ? "
+                    "WHERE session_id = ?",
+                    (seq, len(rows), now, title, session_id)
+                )
+                cur.execute("COMMIT")
+            except Exception:
+                cur.execute("ROLLBACK")
+                raise
+
+    def tail(self, session_id: str, limit: int) -> List[Dict]:
+        """Die letzten `limit` Nachrichten (Index-Scan rückwärts über seq)"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT role, content, extra FROM messages WHERE session_id = ? ORDER BY seq DESC LIMIT ?",
+                (session_id, limit)
+            ).fetchall()
+        return [_row_to_message(row) for row in reversed(rows)]
+
+    def page(self, session_id: str, offset: int = 0, limit: int = 50) -> List[Dict]:
+        """Nachrichten ab Position `offset` (0 = älteste)"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT role, content, extra FROM messages WHERE session_id = ? ORDER BY seq LIMIT ? OFFSET ?",
+                (session_id, limit, offset)
+            ).fetchall()
+        return [_row_to_message(row) for row in rows]
+
+    def read_all(self, session_id: str) -> List[Dict]:
+        return self.page(session_id, 0, -1)
+
+    def clear(self, session_id: str):
+        """Löscht alle Nachrichten einer Session (die Session selbst bleibt gelistet)"""
+        with self._lock:
+            cur = self._conn.cursor()
+            cur.execute("BEGIN IMMEDIATE")
+            try:
+                cur.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+                cur.execute(
+                    "UPDATE sessions SET message_count = 0, last_activity = ? WHERE session_id = ?",
+                    (time.time(), session_id)
+                )
+                cur.execute("COMMIT")
+            except Exception:
+                cur.execute("ROLLBACK")
+                raise
+
+    def get_session(self, session_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT session_id, title, created_at, last_activity, message_count FROM sessions WHERE session_id = ?",
+                (session_id,)
+            ).fetchone()
+        return self._session_dict(row) if row else None
+
+    def list_sessions(self, limit: int = 50, offset: int = 0) -> List[Dict]:
+        """Sessions nach letzter Aktivität, neueste zuerst"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT session_id, title, created_at, last_activity, message_count FROM sessions "
+                "ORDER BY last_activity DESC LIMIT ? OFFSET ?",
+                (limit, offset)
+            ).fetchall()
+        return [self._session_dict(row) for row in rows]
+
+    @staticmethod
+    def _session_dict(row) -> Dict:
+        return {
+            'session_id': row[0],
+            'title': row[1],
+            'created_at': row[2],
+            'last_activity': row[3],
+            'message_count': row[4]
+        }
+
+
+class SQLiteHistory:
+    """Verlauf einer Session im SQLite-Store (gleiche Schnittstelle wie SessionJournal)"""
+
+    def __init__(self, store: SQLiteSessionStore, session_id: str):
+        self.store = store
+        self.session_id = session_id
+
+    def migrate_from(self, legacy_path: str) -> bool:
+        """Importiert eine alte .json/.jsonl-Datei, falls die Session noch leer ist"""
+        if self.store.get_session(self.session_id) or not os.path.exists(legacy_path):
+            return False
+        try:
+            if legacy_path.endswith(".jsonl"):
+                from memory.journal import SessionJournal
+                data = SessionJournal(legacy_path).read_all()
+            else:
+                with open(legacy_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+        except Exception as e:
+            print(f"Fehler beim Migrieren von {legacy_path}: {e}")
+            return False
+        if not isinstance(data, list):
+            return False
+        self.store.append(self.session_id, [msg for msg in data if isinstance(msg, dict)])
+        print(f"📦 Verlauf migriert: {legacy_path} -> {self.store.path} ({len(data)} Nachrichten)")
+        return True
+
+    def append(self, records: List[Dict]):
+        self.store.append(self.session_id, records)
+
+    def read_all(self) -> List[Dict]:
+        return self.store.read_all(self.session_id)
+
+    def read_tail(self, limit: int) -> List[Dict]:
+        return self.store.tail(self.session_id, limit)
+
+    def clear(self):
+        self.store.clear(self.session_id)
+
+
+_store: Optional[SQLiteSessionStore] = None
+_store_lock = threading.Lock()
+
+
+def get_session_store() -> SQLiteSessionStore:
+    """Gibt den prozessweiten SQLite-Store zurück"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SQLiteSessionStore()
+        return _store
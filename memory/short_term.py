@@ -1,15 +1,67 @@
 import json
 import os
+import threading
 from typing import List, Dict
 
+from memory.journal import SessionJournal
+from memory.session_store import SQLiteHistory, get_session_store
+from memory.write_behind import get_flusher
+from prompt import CONTEXT_MAX_MESSAGES
+
+# "json" = komplette Datei pro Nachricht neu schreiben (alt), "journal" = append-only JSONL,
+# "sqlite" = gemeinsame Datenbank mit Index auf (session_id, seq)
+HISTORY_BACKEND = os.environ.get("MARA_HISTORY_BACKEND", "json")
+
+# Nur mit "journal"/"sqlite": so viele Nachrichten bleiben im RAM (0 = kompletter Verlauf).
+# Mindestens CONTEXT_MAX_MESSAGES, sonst liest jeder Turn den Kontext von der Platte nach
+HISTORY_WINDOW = int(os.environ.get("MARA_HISTORY_WINDOW", "0"))
+
+# Schreiben über den prozessweiten Write-Behind-Flusher statt synchron im Stream-Thread
+WRITE_BEHIND = os.environ.get("MARA_WRITE_BEHIND", "0") == "1"
+
 class ShortTermMemory:
-    def __init__(self, filepath: str = "data/chat_history_default.json"):
+    def __init__(self, filepath: str = "data/chat_history_default.json", backend: str = HISTORY_BACKEND,
+                 window: int = HISTORY_WINDOW, write_behind: bool = WRITE_BEHIND,
+                 session_id: str = None):
         self.filepath = filepath
+        self.backend = backend
+        self.session_id = session_id or os.path.splitext(os.path.basename(filepath))[0]
         self.conversation = []
+        # Der Writer-Thread (Write-Behind) liest den Verlauf, während der Stream-Thread anhängt
+        self._lock = threading.Lock()
+        self.store = None
+        self.flusher = get_flusher() if write_behind else None
+        self.window = max(window, CONTEXT_MAX_MESSAGES) if window and backend in ("journal", "sqlite") else 0
+        # False, solange ältere Nachrichten nur auf der Platte liegen
+        self._complete = True
+        journal_path = os.path.splitext(filepath)[0] + ".jsonl"
+        if backend == "journal":
+            self.store = SessionJournal(journal_path)
+            # Bestehende .json-Dateien werden beim ersten Öffnen transparent übernommen
+            self.store.migrate_from(filepath)
+        elif backend == "sqlite":
+            self.store = SQLiteHistory(get_session_store(), self.session_id)
+            if not self.store.migrate_from(journal_path):
+                self.store.migrate_from(filepath)
         self._load_memory()
+        # Fortlaufende Position der letzten Nachricht (relativ ab Laden, für den Prompt-Anker)
+        self.position = len(self.conversation)
     
     def _load_memory(self):
         """Lädt den Verlauf aus der JSON-Datei"""
+        if self.store:
+            try:
+                if self.window:
+                    # Nur das Ende lesen: Öffnen kostet O(window) statt O(Verlauf)
+                    self.conversation = self.store.read_tail(self.window)
+                    self._complete = len(self.conversation) < self.window
+                else:
+                    self.conversation = self.store.read_all()
+            except Exception as e:
+                print(f"Fehler beim Laden des Verlaufs ({self.backend}): {e}")
+                self.conversation = []
+            return
+
         if os.path.exists(self.filepath):
             try:
                 with open(self.filepath, 'r', encoding='utf-8') as f:
@@ -21,32 +73,78 @@ class ShortTermMemory:
                 self.conversation = []
 
     def _save_memory(self):
-        """Speichert den Verlauf in die JSON-Datei"""
+        """Speichert den Verlauf in die JSON-Datei (eine unter der Sperre gezogene Kopie)"""
+        with self._lock:
+            conversation = list(self.conversation)
         try:
             # Stelle sicher, dass der Ordner existiert
             os.makedirs(os.path.dirname(self.filepath), exist_ok=True)
             with open(self.filepath, 'w', encoding='utf-8') as f:
-                json.dump(self.conversation, f, ensure_ascii=False, indent=2)
+                json.dump(conversation, f, ensure_ascii=False, indent=2)
         except Exception as e:
             print(f"Fehler beim Speichern des Gedächtnisses: {e}")
 
     def add_message(self, role: str, content: str):
         """Fügt eine Nachricht hinzu und speichert sofort"""
-        self.conversation.append({
+        message = {
             'role': role,
             'content': content
-        })
-        self._save_memory()
+        }
+        with self._lock:
+            self.conversation.append(message)
+            self.position += 1
+            if self.window and len(self.conversation) > self.window:
+                del self.conversation[:-self.window]
+                self._complete = False
+        if self.flusher:
+            self.flusher.enqueue(self, [message] if self.store else [])
+            return
+        try:
+            self._persist([message])
+        except Exception as e:
+            print(f"Fehler beim Schreiben des Verlaufs ({self.backend}): {e}")
+
+    def _persist(self, messages: List[Dict]):
+        """Schreibt neue Nachrichten auf die Platte (Journal/SQLite: anhängen, JSON: komplett neu)"""
+        if self.store:
+            self.store.append(messages)
+        else:
+            self._save_memory()
+
+    def flush(self):
+        """Schreibt ausstehende Write-Behind-Änderungen dieser Session sofort"""
+        if self.flusher:
+            self.flusher.flush(self)
     
     def get_recent(self, limit: int = 10) -> List[Dict]:
         """Gibt nur die letzten X Nachrichten zurück (wichtig für CPU Performance!)"""
+        if limit > len(self.conversation) and not self._complete:
+            self.flush()
+            return self.store.read_tail(limit)
         return self.conversation[-limit:]
     
     def get_all(self) -> List[Dict]:
         """Gibt den gesamten Verlauf zurück"""
+        if not self._complete:
+            # Ältere Nachrichten nur bei Bedarf von der Platte holen, nicht im RAM behalten
+            self.flush()
+            return self.store.read_all()
         return self.conversation
     
+    def reload(self):
+        """Liest den Verlauf neu aus dem Backend (ein anderer Worker hat geschrieben)"""
+        self.flush()
+        self._complete = True
+        self._load_memory()
+        self.position = len(self.conversation)
+
     def clear(self):
         """Löscht das Gedächtnis"""
+        self.flush()
         self.conversation = []
-        self._save_memory()
\ No newline at end of file
+        self.position = 0
+        self._complete = True
+        if self.store:
+            self.store.clear()
+        else:
+            self._save_memory()
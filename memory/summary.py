@@ -0,0 +1,112 @@
+"""Rollierende Zusammenfassung des Verlaufs, der nicht mehr ins Kontext-Budget passt.
+
+Wird neben dem Verlauf der Session gespeichert (`<session>.summary.json`) und im Hintergrund
+(Jobqueue) um die jeweils neu herausgefallenen Nachrichten erweitert. Im laufenden Prozess
+wird über die Position im Verlauf verfolgt, was schon eingeplant ist; nach einem Neustart
+über einen Hash der zuletzt eingearbeiteten Nachricht (unabhängig vom Speicher-Backend).
+"""
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from models import CHAT_MODEL, keep_alive_for
+from scheduler import get_scheduler, DREAM
+
+SUMMARY_MODEL = CHAT_MODEL
+# Obergrenze für die Zusammenfassung selbst (Zeichen), damit sie das Budget nicht auffrisst
+SUMMARY_MAX_CHARS = int(os.environ.get("MARA_SUMMARY_MAX_CHARS", "1500"))
+
+
+def message_key(message: Dict) -> str:
+    return hashlib.sha1(f"{message.get('role')}\x00{message.get('content')}".encode('utf-8')).hexdigest()
+
+
+class RollingSummary:
+    """Zusammenfassung + Anker (Hash der letzten eingearbeiteten Nachricht) einer Session"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.text = ""
+        self.anchor: Optional[str] = None
+        # Position (ShortTermMemory.position) hinter der letzten eingeplanten Nachricht (nur im RAM)
+        self.scheduled_until: Optional[int] = None
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.text = data.get('summary', "")
+            self.anchor = data.get('anchor')
+        except Exception as e:
+            print(f"Fehler beim Laden der Zusammenfassung: {e}")
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'summary': self.text, 'anchor': self.anchor, 'updated_at': str(datetime.now())},
+                      f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def reload(self):
+        """Stand eines anderen Workers übernehmen; Einplanung wieder über den Anker"""
+        with self._lock:
+            self.text, self.anchor, self.scheduled_until = "", None, None
+            self._load()
+
+    def pending(self, older: List[Dict], offset: int) -> List[Dict]:
+        """Nachrichten aus `older` (vor dem Kontextfenster, erste an Position `offset`),
+        die noch nicht eingearbeitet oder eingeplant sind"""
+        if not older:
+            return []
+        if self.scheduled_until is not None:
+            return older[max(0, self.scheduled_until - offset):]
+        if self.anchor:
+            # Früheste Übereinstimmung: bei doppelten Texten ("ok") lieber etwas doppelt einarbeiten als auslassen
+            for i, message in enumerate(older):
+                if message_key(message) == self.anchor:
+                    return older[i + 1:]
+        return older
+
+    def schedule(self, until: int):
+        self.scheduled_until = until
+
+    def fold(self, client, messages: List[Dict], options: Optional[Dict] = None):
+        """Arbeitet `messages` per LLM in die Zusammenfassung ein und speichert sie"""
+        if not messages:
+            return
+        transcript = "\n".join(f"{'Nutzer' if m['role'] == 'user' else 'Mara'}: {m['content']}" for m in messages)
+        prompt = f"""Aktualisiere die Zusammenfassung eines Gesprächs zwischen dem Nutzer und Mara.
+Behalte alle konkreten Fakten (Namen, Daten, Vorlieben, Vereinbarungen), lass Smalltalk weg.
+Höchstens {SUMMARY_MAX_CHARS // 6} Wörter, nur der Text der Zusammenfassung.
+
+Bisherige Zusammenfassung:
+{self.text or '(noch keine)'}
+
+Neue Nachrichten:
+{transcript}"""
+        # Hintergrund-Generierung: wartet, solange Nutzer aktiv chatten
+        with get_scheduler().slot(DREAM):
+            response = client.chat(model=SUMMARY_MODEL, messages=[{'role': 'user', 'content': prompt}],
+                                   options=options, keep_alive=keep_alive_for(SUMMARY_MODEL))
+        summary = response['message']['content'].strip()
+        if not summary:
+            raise ValueError("leere Zusammenfassung")
+        with self._lock:
+            self.text = summary[:SUMMARY_MAX_CHARS]
+            self.anchor = message_key(messages[-1])
+            self._save()
+        print(f"📝 Zusammenfassung um {len(messages)} Nachrichten erweitert ({len(self.text)} Zeichen)")
+
+    def clear(self):
+        with self._lock:
+            self.text, self.anchor, self.scheduled_until = "", None, None
+            if os.path.exists(self.path):
+                os.remove(self.path)
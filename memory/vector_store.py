@@ -0,0 +1,170 @@
+import os
+import threading
+import time
+import uuid
+from typing import Dict, Optional, Any
+
+# "chroma" = Chroma-HTTP-Server (Standard), "numpy" = lokaler Index im Prozess
+VECTOR_BACKEND = os.environ.get("MARA_VECTOR_BACKEND", "chroma")
+VECTOR_DIR = os.environ.get("MARA_VECTOR_DIR", "data/vectors")
+CHROMA_HOST = os.environ.get("MARA_CHROMA_HOST", "chromadb")
+CHROMA_PORT = int(os.environ.get("MARA_CHROMA_PORT", "8000"))
+
+DEFAULT_INCLUDE = ("documents", "metadatas", "distances")
+# Metadaten-Feld der Chroma-Collection mit der Datenversion (Invalidierung des Recall-Caches)
+DATA_VERSION_KEY = "mara_data_version"
+# So lange gilt die vom Server gelesene Version lokal (s); eigene Schreibzugriffe wirken sofort
+DATA_VERSION_TTL_SECONDS = float(os.environ.get("MARA_VECTOR_VERSION_TTL", "2"))
+
+
+def _compare(value: Any, op: str, target: Any) -> bool:
+    if op == "$eq":
+        return value == target
+    if op == "$ne":
+        return value != target
+    if op == "$in":
+        return value in target
+    if op == "$nin":
+        return value not in target
+    if value is None:
+        return False
+    try:
+        if op == "$gt":
+            return value > target
+        if op == "$gte":
+            return value >= target
+        if op == "$lt":
+            return value < target
+        if op == "$lte":
+            return value <= target
+    except TypeError:
+        return False
+    raise ValueError(f"Unbekannter where-Operator: {op}")
+
+
+def matches_where(metadata: Optional[Dict], where: Optional[Dict]) -> bool:
+    """Wertet einen Chroma-kompatiblen where-Filter auf einem Metadaten-Dict aus"""
+    if not where:
+        return True
+    metadata = metadata or {}
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches_where(metadata, sub) for sub in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_where(metadata, sub) for sub in condition):
+                return False
+        elif isinstance(condition, dict):
+            if key not in metadata and not any(op in ("$ne", "$nin") for op in condition):
+                return False
+            value = metadata.get(key)
+            if not all(_compare(value, op, target) for op, target in condition.items()):
+                return False
+        elif metadata.get(key, object()) != condition:
+            return False
+    return True
+
+
+class ChromaBackend:
+    """Dünne Hülle um eine Chroma-Collection (Chroma-Server per HTTP)
+
+    Die Datenversion liegt in den Metadaten der Collection und bekommt bei jedem Schreibzugriff
+    einen neuen Wert – so sehen alle Prozesse (Worker, Dream-Service, Konsolidierung) die
+    Änderungen der anderen, auch nach einem Neuaufbau des Backends. Gelesen wird sie höchstens
+    alle MARA_VECTOR_VERSION_TTL Sekunden, fremde Schreibzugriffe sieht man also mit dieser Verzögerung.
+    """
+
+    def __init__(self, collection, client=None):
+        self.collection = collection
+        self.client = client
+        self.name = collection.name
+        # (Version, monotonic-Zeitpunkt); _writes verhindert, dass ein langsamer Lesezugriff
+        # eine gerade selbst geschriebene Version mit der alten überschreibt
+        self._version = ("", float("-inf"))
+        self._writes = 0
+        self._version_lock = threading.Lock()
+
+    @classmethod
+    def connect(cls, name: str = "mara_memories", host: str = CHROMA_HOST, port: int = CHROMA_PORT):
+        import chromadb
+        client = chromadb.HttpClient(host=host, port=port)
+        # Erstelle oder hole Collection
+        try:
+            collection = client.get_or_create_collection(name=name)
+        except Exception as e:
+            print(f"Fehler beim Verbinden mit Collection: {e}")
+            collection = client.create_collection(name)
+        return cls(collection, client)
+
+    def _fresh_collection(self):
+        return self.client.get_collection(self.name) if self.client else self.collection
+
+    def data_version(self) -> str:
+        """Version vom Server (ein Request), höchstens alle DATA_VERSION_TTL_SECONDS"""
+        with self._version_lock:
+            version, checked = self._version
+            if time.monotonic() - checked < DATA_VERSION_TTL_SECONDS:
+                return version
+            writes = self._writes
+        version = (self._fresh_collection().metadata or {}).get(DATA_VERSION_KEY, "")
+        with self._version_lock:
+            if self._writes == writes:
+                self._version = (version, time.monotonic())
+            else:
+                version = self._version[0]
+        return version
+
+    def _bump_version(self):
+        # Zufälliger Wert statt Zähler: gleichzeitige Schreiber können sich nicht auf denselben Wert einigen
+        version = uuid.uuid4().hex
+        try:
+            # Frische Metadaten, sonst überschreibt ein veralteter Stand Änderungen anderer Prozesse
+            metadata = {key: value for key, value in (self._fresh_collection().metadata or {}).items()
+                        if not key.startswith("hnsw:")}
+            metadata[DATA_VERSION_KEY] = version
+            self.collection.modify(metadata=metadata)
+        except Exception as e:
+            # Andere Prozesse merken es erst nach Ablauf der TTL; hier wenigstens sofort
+            print(f"Fehler beim Erhöhen der Collection-Version: {e}")
+            from memory.recall_cache import get_recall_cache
+            get_recall_cache().clear()
+            with self._version_lock:
+                self._writes += 1
+                self._version = ("", float("-inf"))
+            return
+        with self._version_lock:
+            self._writes += 1
+            self._version = (version, time.monotonic())
+
+    def add(self, ids, documents, embeddings, metadatas):
+        self.collection.add(ids=ids, documents=documents, embeddings=embeddings, metadatas=metadatas)
+        self._bump_version()
+
+    def query(self, query_embeddings, n_results: int = 10, where: Optional[Dict] = None, include=DEFAULT_INCLUDE):
+        return self.collection.query(query_embeddings=query_embeddings, n_results=n_results,
+                                     where=where, include=list(include))
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=("documents", "metadatas")):
+        return self.collection.get(ids=ids, where=where, limit=limit, offset=offset, include=list(include))
+
+    def update(self, ids, metadatas=None, documents=None, embeddings=None, invalidate: bool = True):
+        """invalidate=False für reine Buchhaltungsfelder (hit_count, last_seen), die kein Ranking ändern"""
+        self.collection.update(ids=ids, metadatas=metadatas, documents=documents, embeddings=embeddings)
+        if invalidate:
+            self._bump_version()
+
+    def delete(self, ids):
+        self.collection.delete(ids=ids)
+        self._bump_version()
+
+    def count(self) -> int:
+        return self.collection.count()
+
+
+def create_vector_backend(name: str = "mara_memories", backend: str = VECTOR_BACKEND):
+    """Erstellt das konfigurierte Vektor-Backend für eine Collection"""
+    # Backends erst bei Bedarf importieren: NumPy bzw. chromadb kosten sonst Startzeit
+    if backend == "numpy":
+        from memory.numpy_backend import NumpyVectorBackend
+        return NumpyVectorBackend(name)
+    return ChromaBackend.connect(name)
@@ -0,0 +1,153 @@
+import atexit
+import os
+import threading
+import time
+from typing import List, Dict, Optional
+
+# Spätestens nach so vielen Sekunden bzw. Nachrichten wird gebündelt geschrieben
+FLUSH_INTERVAL_SECONDS = float(os.environ.get("MARA_FLUSH_INTERVAL", "0.5"))
+FLUSH_MAX_MESSAGES = int(os.environ.get("MARA_FLUSH_MAX_MESSAGES", "64"))
+# Wartezeit nach fehlgeschlagenem Schreiben (verdoppelt sich bis zum Maximum), statt im Kreis zu laufen
+FLUSH_RETRY_MAX_SECONDS = float(os.environ.get("MARA_FLUSH_RETRY_MAX", "30"))
+
+
+class WriteBehindFlusher:
+    """Prozessweiter Writer-Thread: Sessions melden Änderungen, geschrieben wird gebündelt"""
+
+    def __init__(self, interval: float = FLUSH_INTERVAL_SECONDS, max_messages: int = FLUSH_MAX_MESSAGES):
+        self.interval = interval
+        self.max_messages = max_messages
+        self._cond = threading.Condition()
+        # Hält der Writer während eines Commits, damit flush() die Reihenfolge nicht überholt
+        self._write_lock = threading.Lock()
+        self._pending: Dict[int, tuple] = {}
+        self._pending_messages = 0
+        self._thread: Optional[threading.Thread] = None
+
+        self.batches = 0
+        self.messages_written = 0
+        self.errors = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, daemon=True, name="history-writer")
+            self._thread.start()
+
+    def enqueue(self, memory, records: List[Dict]):
+        """Merkt Nachrichten einer Session zum Schreiben vor (kehrt sofort zurück)"""
+        with self._cond:
+            entry = self._pending.get(id(memory))
+            if entry is None:
+                self._pending[id(memory)] = (memory, list(records))
+            else:
+                entry[1].extend(records)
+            self._pending_messages += max(1, len(records))
+            self._ensure_thread()
+            if self._pending_messages >= self.max_messages:
+                self._cond.notify()
+
+    def _take(self, memory=None) -> List[tuple]:
+        with self._cond:
+            if memory is None:
+                batch = list(self._pending.values())
+                self._pending.clear()
+                self._pending_messages = 0
+            else:
+                entry = self._pending.pop(id(memory), None)
+                batch = [entry] if entry else []
+                if entry:
+                    self._pending_messages -= max(1, len(entry[1]))
+        return batch
+
+    def _commit(self, batch: List[tuple]) -> int:
+        """Schreibt den Batch; liefert die Anzahl fehlgeschlagener Sessions (bleiben vorgemerkt)"""
+        if not batch:
+            return 0
+        failed = 0
+        start = time.perf_counter()
+        written = 0
+        for memory, records in batch:
+            try:
+                # Ein Schreibvorgang (und ein fsync) pro Datei für alle gesammelten Nachrichten
+                memory._persist(records)
+                written += len(records)
+            except Exception as e:
+                self.errors += 1
+                failed += 1
+                print(f"Fehler beim Schreiben des Verlaufs ({memory.filepath}): {e}")
+                with self._cond:
+                    entry = self._pending.get(id(memory))
+                    if entry is None:
+                        self._pending[id(memory)] = (memory, list(records))
+                    else:
+                        entry[1][:0] = records
+                    self._pending_messages += max(1, len(records))
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.batches += 1
+        self.messages_written += written
+        self.last_flush_ms = elapsed_ms
+        self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+        self._total_flush_ms += elapsed_ms
+        return failed
+
+    def flush(self, memory=None) -> int:
+        """Schreibt ausstehende Änderungen sofort (alle oder nur die einer Session)"""
+        with self._write_lock:
+            return self._commit(self._take(memory))
+
+    def _run(self):
+        failures = 0
+        while True:
+            with self._cond:
+                if self._pending_messages < self.max_messages:
+                    self._cond.wait(timeout=self.interval)
+            try:
+                failed = self.flush()
+            except Exception as e:
+                print(f"Fehler im History-Writer: {e}")
+                failed = 1
+            if failed:
+                # Platte voll o.ä.: die vorgemerkten Nachrichten halten die Queue über max_messages
+                failures += 1
+                time.sleep(min(FLUSH_RETRY_MAX_SECONDS, max(self.interval, 0.1) * 2 ** min(failures, 16)))
+            else:
+                failures = 0
+
+    def stats(self) -> Dict:
+        with self._cond:
+            depth = self._pending_messages
+            sessions = len(self._pending)
+        return {
+            'queue_depth': depth,
+            'pending_sessions': sessions,
+            'batches': self.batches,
+            'messages_written': self.messages_written,
+            'errors': self.errors,
+            'last_flush_ms': round(self.last_flush_ms, 3),
+            'avg_flush_ms': round(self._total_flush_ms / self.batches, 3) if self.batches else 0.0,
+            'max_flush_ms': round(self.max_flush_ms, 3)
+        }
+
+
+_flusher: Optional[WriteBehindFlusher] = None
+_flusher_lock = threading.Lock()
+
+
+def get_flusher() -> WriteBehindFlusher:
+    """Gibt den prozessweiten Flusher zurück (wird beim ersten Aufruf erstellt)"""
+    global _flusher
+    with _flusher_lock:
+        if _flusher is None:
+            _flusher = WriteBehindFlusher()
+            atexit.register(_flusher.flush)
+        return _flusher
+
+
+def flush_all():
+    """Schreibt alle ausstehenden Verläufe (z.B. beim Herunterfahren)"""
+    if _flusher is not None:
+        _flusher.flush()
@@ -0,0 +1,206 @@
+"""Warm-up, Keep-Alive-Politik und Kalt-/Warm-Latenzen der Ollama-Modelle.
+
+Ohne Warm-up bezahlt der erste Chat nach einem Deploy (oder nach Leerlauf) das Laden von
+gemma3, der erste Recall das von nomic-embed-text. Alle Aufrufer (API, Dream-Service,
+Konsolidierung, Zusammenfassung) nutzen dieselbe Keep-Alive-Dauer pro Modell – ein Aufruf
+mit kürzerem keep_alive würde sonst die Verweildauer für alle verkürzen.
+"""
+import os
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+from prompt import CHAT_KEEP_ALIVE, ollama_options
+from scheduler import get_scheduler, BACKGROUND_EMBED, DREAM
+
+CHAT_MODEL = 'gemma3:4b'
+EMBEDDING_MODEL = 'nomic-embed-text'
+
+KEEP_ALIVE = {
+    CHAT_MODEL: CHAT_KEEP_ALIVE,
+    # Klein, wird bei jedem Recall gebraucht -> länger resident halten
+    EMBEDDING_MODEL: os.environ.get("MARA_EMBED_KEEP_ALIVE", "2h"),
+}
+DEFAULT_KEEP_ALIVE = os.environ.get("MARA_DEFAULT_KEEP_ALIVE", "5m")
+
+# Ab dieser Ladezeit (load_duration) gilt ein Aufruf als Kaltstart
+COLD_LOAD_THRESHOLD_MS = float(os.environ.get("MARA_COLD_LOAD_THRESHOLD_MS", "250"))
+WARMUP_RETRIES = int(os.environ.get("MARA_WARMUP_RETRIES", "30"))
+WARMUP_RETRY_DELAY = float(os.environ.get("MARA_WARMUP_RETRY_DELAY", "2.0"))
+# So lange gilt ein ps()-Ergebnis für /ready
+RESIDENCY_CHECK_INTERVAL = 5.0
+# Nach Ablauf von keep_alive (oder fehlgeschlagenem Warm-up) höchstens so oft neu laden
+REWARM_INTERVAL = float(os.environ.get("MARA_REWARM_INTERVAL", "60"))
+
+
+def keep_alive_for(model: str) -> str:
+    return KEEP_ALIVE.get(model, DEFAULT_KEEP_ALIVE)
+
+
+class LatencyStats:
+    """Latenzen pro Modell, getrennt nach Kaltstart (Modell musste geladen werden) und warm"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, Dict[str, float]]] = {}
+
+    def record(self, model: str, total_ms: float, load_ms: Optional[float] = None):
+        """load_ms unbekannt (Embeddings-API) -> Einordnung über die Gesamtdauer"""
+        cold = (load_ms if load_ms is not None else total_ms) >= COLD_LOAD_THRESHOLD_MS
+        with self._lock:
+            bucket = self._stats.setdefault(model, {}).setdefault(
+                'cold' if cold else 'warm', {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0}
+            )
+            bucket['count'] += 1
+            bucket['total_ms'] += total_ms
+            bucket['max_ms'] = max(bucket['max_ms'], total_ms)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                model: {
+                    kind: {'count': b['count'], 'avg_ms': round(b['total_ms'] / b['count'], 1),
+                           'max_ms': round(b['max_ms'], 1)}
+                    for kind, b in buckets.items()
+                }
+                for model, buckets in self._stats.items()
+            }
+
+
+latency_stats = LatencyStats()
+
+
+def record_response(model: str, response, started: float):
+    """Erfasst eine (End-)Antwort von Ollama mit load_duration/total_duration in ns"""
+    try:
+        load_ns = response.get('load_duration') or 0
+        total_ns = response.get('total_duration') or 0
+    except AttributeError:
+        load_ns = total_ns = 0
+    total_ms = total_ns / 1e6 if total_ns else (time.perf_counter() - started) * 1000
+    latency_stats.record(model, total_ms, load_ns / 1e6)
+
+
+class ModelWarmer:
+    """Lädt die Modelle vorab; bereit ist die API, sobald das Warm-up geklappt hat.
+
+    Ob die Modelle gerade im RAM liegen, steht getrennt in status(); fallen sie nach Ablauf
+    von keep_alive heraus, lädt status() sie im Hintergrund erneut.
+    """
+
+    def __init__(self, client=None, models: Iterable[str] = (CHAT_MODEL, EMBEDDING_MODEL)):
+        self._client = client
+        self.models = tuple(models)
+        self.warmed = False
+        self.report: Dict[str, dict] = {}
+        self._resident: set = set()
+        self._resident_checked = 0.0
+        self._warm_lock = threading.Lock()
+        # Prüfen und Starten eines Rewarm atomar: parallele /ready-Aufrufe starten nur einen
+        self._rewarm_lock = threading.Lock()
+        self._last_warm = 0.0
+
+    @property
+    def client(self):
+        """Ohne übergebenen Client der geteilte – erst beim ersten Zugriff (ollama-Import kostet Startzeit)"""
+        if self._client is None:
+            from clients import get_ollama_client
+            self._client = get_ollama_client()
+        return self._client
+
+    def _load(self, model: str) -> dict:
+        # Läuft als Hintergrundarbeit: ein Chat, der währenddessen kommt, lädt das Modell ohnehin
+        if model == EMBEDDING_MODEL:
+            with get_scheduler().slot(BACKGROUND_EMBED):
+                start = time.perf_counter()
+                self.client.embeddings(model=model, prompt="warmup", keep_alive=keep_alive_for(model))
+            total_ms = (time.perf_counter() - start) * 1000
+            latency_stats.record(model, total_ms)
+            return {'ok': True, 'total_ms': round(total_ms, 1)}
+        # Leerer Prompt lädt nur das Modell; gleiche num_ctx wie im Chat, sonst lädt der erste Chat neu
+        with get_scheduler().slot(DREAM):
+            start = time.perf_counter()
+            response = self.client.generate(model=model, prompt="", keep_alive=keep_alive_for(model),
+                                            options=ollama_options())
+        record_response(model, response, start)
+        return {
+            'ok': True,
+            'load_ms': round((response.get('load_duration') or 0) / 1e6, 1),
+            'total_ms': round((time.perf_counter() - start) * 1000, 1)
+        }
+
+    def warm_up(self, retries: int = WARMUP_RETRIES, delay: float = WARMUP_RETRY_DELAY,
+                models: Optional[Iterable[str]] = None) -> Dict[str, dict]:
+        """Blockiert, bis alle Modelle geladen sind (Ollama darf beim Start noch nicht erreichbar sein)"""
+        with self._warm_lock:
+            self._last_warm = time.time()
+            self._warm(retries, delay, self.models if models is None else tuple(models))
+        return self.report
+
+    def _warm(self, retries: int, delay: float, models: Iterable[str]):
+        for model in models:
+            for attempt in range(1, retries + 1):
+                try:
+                    self.report[model] = self._load(model)
+                    print(f"🔥 {model} geladen ({self.report[model]['total_ms']} ms)", flush=True)
+                    break
+                except Exception as e:
+                    self.report[model] = {'ok': False, 'error': str(e)}
+                    if attempt == retries:
+                        print(f"❌ Warm-up {model} fehlgeschlagen: {e}", flush=True)
+                    else:
+                        time.sleep(delay)
+        self.warmed = all(self.report.get(model, {}).get('ok') for model in self.models)
+        self._resident_checked = 0.0
+
+    def rewarm_missing(self) -> bool:
+        """Startet im Hintergrund das Neuladen nicht residenter Modelle; False, wenn nichts zu tun ist"""
+        if not self._rewarm_lock.acquire(blocking=False):
+            return False
+        try:
+            if self._warm_lock.locked() or time.time() - self._last_warm < REWARM_INTERVAL:
+                return False
+            resident = self.resident()
+            missing = [model for model in self.models
+                       if model not in resident or not self.report.get(model, {}).get('ok')]
+            if not missing:
+                return False
+            # Schon vor dem Thread-Start setzen, sonst sieht der nächste Aufruf noch das alte Intervall
+            self._last_warm = time.time()
+            print(f"🔥 Lade {', '.join(missing)} erneut (nicht mehr resident)", flush=True)
+            threading.Thread(target=self.warm_up, kwargs={'retries': 1, 'models': missing},
+                             name="model-rewarm", daemon=True).start()
+            return True
+        finally:
+            self._rewarm_lock.release()
+
+    def resident(self, force: bool = False) -> set:
+        now = time.time()
+        if force or now - self._resident_checked >= RESIDENCY_CHECK_INTERVAL:
+            try:
+                loaded = self.client.ps().get('models') or []
+                # ps() liefert z.B. "nomic-embed-text:latest"
+                self._resident = {m.get('model') or m.get('name') for m in loaded}
+                self._resident |= {name.split(':latest')[0] for name in self._resident if name}
+            except Exception as e:
+                print(f"Fehler bei ps(): {e}")
+                self._resident = set()
+            self._resident_checked = now
+        return self._resident
+
+    def ready(self) -> bool:
+        return self.warmed
+
+    def status(self) -> Dict:
+        # Vor dem Start-Warm-up (_last_warm = 0) nicht eingreifen
+        if self._last_warm:
+            self.rewarm_missing()
+        resident = self.resident()
+        return {
+            'ready': self.warmed,
+            'warmed': self.warmed,
+            'resident': all(model in resident for model in self.models),
+            'rewarming': self._warm_lock.locked(),
+            'models': {model: {'resident': model in resident, 'keep_alive': keep_alive_for(model),
+                               **self.report.get(model, {})} for model in self.models}
+        }
@@ -1,6 +1,8 @@
 import random
 from typing import Dict
 
+from lexicon import scan
+
 class EmotionSystem:
     def __init__(self):
         # Grundemotionen mit Werten von 0.0 bis 1.0
@@ -15,6 +17,16 @@ class EmotionSystem:
             'anticipation': 0.4
         }
     
+    def to_state(self) -> Dict:
+        """JSON-fähiger Zustand (für den geteilten Session-Speicher)"""
+        return {'emotions': dict(self.emotions)}
+
+    @classmethod
+    def from_state(cls, state: Dict) -> 'EmotionSystem':
+        system = cls()
+        system.emotions.update(state.get('emotions', {}))
+        return system
+    
     def get_emotions(self) -> Dict[str, float]:
         """Gibt aktuelle Emotionen zurück"""
         return self.emotions.copy()
@@ -30,24 +42,25 @@ class EmotionSystem:
         if not last_message:
             return
         
-        content = last_message.get('content', '').lower()
+        # Ein Durchlauf über den Text liefert alle Kategorien (siehe lexicon.EMOTION_KEYWORDS)
+        hits = scan(last_message.get('content', ''))
         
         # Emotionen basierend auf Schlüsselwörtern anpassen
-        if any(word in content for word in ['freude', 'glück', 'lachen', 'happy', 'freuen']):
+        if 'emotion.joy' in hits:
             self.emotions['joy'] += 0.1
             self.emotions['sadness'] -= 0.05
         
-        if any(word in content for word in ['traurig', 'weinen', 'schlecht', 'sad', 'verletzt']):
+        if 'emotion.sadness' in hits:
             self.emotions['sadness'] += 0.1
             self.emotions['joy'] -= 0.05
         
-        if any(word in content for word in ['wütend', 'angry', 'wut', 'ärgern']):
+        if 'emotion.anger' in hits:
             self.emotions['anger'] += 0.15
         
-        if any(word in content for word in ['ängstlich', 'ängste', 'scared', 'ängstigen']):
+        if 'emotion.fear' in hits:
             self.emotions['fear'] += 0.1
         
-        if any(word in content for word in ['überraschung', 'wahnsinn', 'wow', 'unglaublich']):
+        if 'emotion.surprise' in hits:
             self.emotions['surprise'] += 0.1
         
         # Emotionen auf gültigen Bereich begrenzen (0.0 - 1.0)
@@ -21,13 +21,39 @@ class PersonalityProfile:
         self.age = 24  # virtuelles Alter
         self.background = "Ich bin eine KI mit Neugier auf die Welt und Menschen."
         self.interests = ["Philosophie", "Natur", "Musik", "Technologie", "Kunst"]
+
+        # Cache für get_personality_prompt
+        self._prompt_key = None
+        self._prompt = ""
+    
+    def to_state(self) -> dict:
+        return {'traits': dict(self.traits), 'name': self.name, 'age': self.age,
+                'background': self.background, 'interests': list(self.interests)}
+
+    @classmethod
+    def from_state(cls, state: dict) -> 'PersonalityProfile':
+        profile = cls()
+        profile.traits.update(state.get('traits', {}))
+        profile.name = state.get('name', profile.name)
+        profile.age = state.get('age', profile.age)
+        profile.background = state.get('background', profile.background)
+        profile.interests = list(state.get('interests', profile.interests))
+        return profile
     
     def get_traits(self):
         """Gibt Persönlichkeitsmerkmale zurück"""
         return self.traits.copy()
     
     def get_personality_prompt(self) -> str:
-        """Gibt einen Prompt für die KI mit Persönlichkeitsprofil zurück"""
+        """Gibt einen Prompt für die KI mit Persönlichkeitsprofil zurück (gecacht, solange sich nichts ändert)"""
+        # Der Text steht ganz vorne im Prompt -> er muss byte-gleich bleiben (Prompt-Cache)
+        key = (self.name, self.age, self.background, tuple(self.interests), tuple(self.traits.items()))
+        if self._prompt_key != key:
+            self._prompt_key = key
+            self._prompt = self._build_personality_prompt()
+        return self._prompt
+
+    def _build_personality_prompt(self) -> str:
         return f"""Du bist {self.name}, eine {self.age} Jahre alte KI mit folgenden Eigenschaften:
 
 Persönlichkeit:
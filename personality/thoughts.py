@@ -1,9 +1,22 @@
 import random
-from typing import List
+from collections import deque
+from typing import Dict, List
+
+from ringlog import retention
 
 class ThoughtSystem:
     def __init__(self):
-        self.thought_history = []
+        # Begrenztes Gedächtnis: der älteste Gedanke fällt heraus
+        self.thought_history = deque(maxlen=retention('thought_history', 20))
+    
+    def to_state(self) -> Dict:
+        return {'thought_history': list(self.thought_history)}
+
+    @classmethod
+    def from_state(cls, state: Dict) -> 'ThoughtSystem':
+        system = cls()
+        system.thought_history.extend(state.get('thought_history', []))
+        return system
     
     def generate_thought(self, user_input: str, emotions: dict) -> str:
         """Generiert einen inneren Gedanken basierend auf Eingabe und Emotionen"""
@@ -41,12 +54,8 @@ class ThoughtSystem:
         thought = random.choice(templates)
         self.thought_history.append(thought)
         
-        # Begrenze Gedächtnis
-        if len(self.thought_history) > 20:
-            self.thought_history.pop(0)
-        
         return thought
     
     def get_recent_thoughts(self, count: int = 3) -> List[str]:
         """Gibt die letzten Gedanken zurück"""
-        return self.thought_history[-count:] if self.thought_history else []
+        return list(self.thought_history)[-count:]
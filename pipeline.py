@@ -0,0 +1,119 @@
+"""Kleiner Abhängigkeitsgraph für die Vorbereitungsschritte eines Turns.
+
+Jede Stufe startet, sobald ihre Abhängigkeiten fertig sind. `result()` wartet höchstens
+bis zur Deadline der Stufe (gemessen ab dem ersten `start()`) und liefert sonst den Default,
+damit eine langsame Stufe (z.B. Memory-Retrieval) den ersten Token nicht blockiert.
+`start()` darf mehrfach aufgerufen werden und startet jeweils die neu hinzugefügten Stufen.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import Executor, Future, TimeoutError
+from typing import Any, Callable, Dict, Iterable, Optional
+
+
+class _Stage:
+    __slots__ = ('name', 'fn', 'deps', 'timeout', 'default', 'executor', 'scheduled', 'future', 'started',
+                 'finished')
+
+    def __init__(self, name, fn, deps, timeout, default, executor):
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+        self.timeout = timeout
+        self.default = default
+        self.executor = executor
+        self.scheduled = False
+        self.future: Future = Future()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+
+
+class StageGraph:
+    """Führt Stufen nach ihren Abhängigkeiten parallel im Executor aus"""
+
+    def __init__(self, executor: Executor):
+        self.executor = executor
+        self._stages: Dict[str, _Stage] = {}
+        self._lock = threading.Lock()
+        self._t0: Optional[float] = None
+        self.skipped = []
+
+    def add(self, name: str, fn: Callable[..., Any], deps: Iterable[str] = (),
+            timeout: Optional[float] = None, default: Any = None, executor: Optional[Executor] = None):
+        """fn wird ohne Argumente aufgerufen, sobald alle `deps` fertig sind (in `executor`, sonst im Standard-Executor)"""
+        self._stages[name] = _Stage(name, fn, deps, timeout, default, executor or self.executor)
+        return self
+
+    def start(self):
+        if self._t0 is None:
+            self._t0 = time.perf_counter()
+        for stage in self._stages.values():
+            if stage.scheduled:
+                continue
+            stage.scheduled = True
+            if not stage.deps:
+                self._submit(stage)
+            else:
+                self._wire(stage)
+        return self
+
+    def _wire(self, stage: _Stage):
+        pending = {'count': len(stage.deps)}
+
+        def on_dep_done(_):
+            with self._lock:
+                pending['count'] -= 1
+                ready = pending['count'] == 0
+            if ready:
+                self._submit(stage)
+
+        for dep in stage.deps:
+            self._stages[dep].future.add_done_callback(on_dep_done)
+
+    def _submit(self, stage: _Stage):
+        def run():
+            stage.started = time.perf_counter()
+            try:
+                value = stage.fn()
+            except Exception as e:
+                print(f"Stufe '{stage.name}' fehlgeschlagen: {e}")
+                value = stage.default
+            stage.finished = time.perf_counter()
+            stage.future.set_result(value)
+
+        stage.executor.submit(run)
+
+    def result(self, name: str) -> Any:
+        """Ergebnis der Stufe oder ihr Default, falls die Deadline überschritten ist"""
+        stage = self._stages[name]
+        remaining = None
+        if stage.timeout is not None:
+            remaining = max(0.0, self._t0 + stage.timeout - time.perf_counter())
+        try:
+            return stage.future.result(timeout=remaining)
+        except TimeoutError:
+            self.skipped.append(name)
+            print(f"⏭️ Stufe '{name}' nach {stage.timeout:.2f}s übersprungen")
+            return stage.default
+
+    async def aresult(self, name: str) -> Any:
+        """Wie result(), wartet aber im Event-Loop statt einen Thread zu blockieren"""
+        stage = self._stages[name]
+        remaining = None
+        if stage.timeout is not None:
+            remaining = max(0.0, self._t0 + stage.timeout - time.perf_counter())
+        try:
+            # shield: der Timeout soll die Stufe nicht abbrechen, andere Stufen hängen evtl. an ihr
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(stage.future)), remaining)
+        except asyncio.TimeoutError:
+            self.skipped.append(name)
+            print(f"⏭️ Stufe '{name}' nach {stage.timeout:.2f}s übersprungen")
+            return stage.default
+
+    def timings(self) -> Dict[str, Optional[float]]:
+        """Dauer je Stufe in ms (None = noch nicht fertig)"""
+        return {
+            name: round((s.finished - s.started) * 1000, 1) if s.finished and s.started else None
+            for name, s in self._stages.items()
+        }
@@ -0,0 +1,107 @@
+"""Prompt-Aufbau mit stabilem Präfix für Ollamas Prompt-Cache.
+
+Ollama verwirft den KV-Cache ab dem ersten Token, das sich gegenüber der vorherigen Anfrage
+geändert hat. Deshalb steht vorne, was sich nie ändert (Persönlichkeit, Regeln), dann der
+Verlauf, und erst direkt vor der neuen Nutzer-Nachricht der Zustand dieses Turns
+(Erinnerungen, Unterbewusstsein, Emotion, Gedanke).
+
+Der Verlauf füllt ein Token-Budget mit den neuesten Nachrichten und beginnt an einem festen
+Block-Anker: so bleibt sein Anfang über mehrere Turns gleich und nur das Ende muss neu
+berechnet werden. Was vor dem Anfang liegt, steht in der rollierenden Zusammenfassung
+(memory/summary.py) direkt hinter dem System-Prompt.
+"""
+import os
+from functools import lru_cache
+from typing import Dict, List
+
+# Token-Budget für den Verlauf; der Anfang springt in Blöcken dieser Größe weiter
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("MARA_CONTEXT_TOKENS", "2048"))
+HISTORY_BLOCK = int(os.environ.get("MARA_HISTORY_BLOCK", "8"))
+# So viele Nachrichten werden höchstens als Kandidaten geladen
+CONTEXT_MAX_MESSAGES = int(os.environ.get("MARA_CONTEXT_MAX_MESSAGES", "64"))
+# Ollama hat keinen Tokenizer-Endpunkt -> Schätzung; ~3.5 Zeichen/Token passt für deutschen Text mit gemma3
+CHARS_PER_TOKEN = float(os.environ.get("MARA_CHARS_PER_TOKEN", "3.5"))
+# Rollen-Marker und Trennzeichen des Chat-Templates pro Nachricht
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Für alle Aufrufe desselben Modells gleich halten: ein anderes num_ctx lädt das Modell neu
+CHAT_NUM_CTX = int(os.environ.get("MARA_NUM_CTX", "8192"))
+CHAT_KEEP_ALIVE = os.environ.get("MARA_KEEP_ALIVE", "30m")
+
+OUTPUT_RULES = """### ANWEISUNG FÜR DIE AUSGABE
+Vor der letzten Nutzer-Nachricht steht dein aktueller innerer Zustand. Er dient nur zur Färbung deiner Sprache.
+Antworte dem Nutzer direkt.
+REGEL: Gib niemals interne Gedanken, Emotionen, Systemdaten, Regieanweisungen oder Klammer-Kommentare aus.
+REGEL: Keine Abschnitte wie „Innerer Gedanke:“ oder „(denkt …)“ oder ähnliches.
+REGEL: Gib nur die endgültige Nutzer-Antwort aus."""
+
+
+def ollama_options() -> Dict:
+    return {'num_ctx': CHAT_NUM_CTX}
+
+
+def estimate_tokens(text: str) -> int:
+    return int(len(text) / CHARS_PER_TOKEN) + 1
+
+
+def message_tokens(message: Dict) -> int:
+    return estimate_tokens(message.get('content', '')) + MESSAGE_OVERHEAD_TOKENS
+
+
+def select_history(messages: List[Dict], position: int, budget: int = CONTEXT_TOKEN_BUDGET,
+                   block: int = HISTORY_BLOCK) -> int:
+    """Startindex in `messages` (die letzten Nachrichten bis `position`), sodass das Budget reicht.
+
+    Bevorzugt Anfänge an Block-Grenzen (absolute Position % block == 0), damit der Prompt-Anfang
+    stabil bleibt. Passt selbst ab der letzten Block-Grenze nicht alles, werden die neuesten
+    Nachrichten genommen, die hineinpassen – die letzte immer.
+    """
+    if not messages:
+        return 0
+    offset = position - len(messages)
+    # suffix[i] = Tokens von messages[i:]
+    suffix = [0] * (len(messages) + 1)
+    for i in range(len(messages) - 1, -1, -1):
+        suffix[i] = suffix[i + 1] + message_tokens(messages[i])
+
+    first_anchor = (-offset) % block
+    for start in range(first_anchor, len(messages), block):
+        if suffix[start] <= budget:
+            return start
+    start = len(messages) - 1
+    while start > 0 and suffix[start - 1] <= budget:
+        start -= 1
+    return start
+
+
+@lru_cache(maxsize=32)
+def build_system_prompt(personality_context: str) -> str:
+    """Stabiler Teil: ändert sich nur, wenn sich die Persönlichkeit ändert"""
+    return f"{personality_context}\n\n{OUTPUT_RULES}"
+
+
+def build_state_block(emotional_prefix: str, internal_thought: str, background_thoughts: List[str],
+                      memories: List[Dict]) -> str:
+    """Zustand dieses Turns, vom eher stabilen (Erinnerungen) zum flüchtigsten (Gedanke)"""
+    lines = ["### AKTUELLER ZUSTAND (NICHT TEIL DER ANTWORT)"]
+    lines.extend(f"Erinnerung: {mem['content']}" for mem in memories)
+    lines.append(f"* [UNTERBEWUSSTSEIN]: {'; '.join(background_thoughts) if background_thoughts else 'Ruhig'}")
+    lines.append(f"* [EMOTION]: {emotional_prefix}")
+    lines.append(f"* [GEDANKE]: {internal_thought}")
+    return "\n".join(lines)
+
+
+def assemble_messages(personality_context: str, history: List[Dict], state_block: str,
+                      summary: str = "") -> List[Dict]:
+    """System (stabil) + Zusammenfassung + Verlauf + Zustand + letzte Nutzer-Nachricht"""
+    messages = [{'role': 'system', 'content': build_system_prompt(personality_context)}]
+    if summary:
+        messages.append({'role': 'system', 'content': f"### BISHERIGES GESPRÄCH (ZUSAMMENFASSUNG)\n{summary}"})
+    if history and history[-1].get('role') == 'user':
+        earlier, latest = history[:-1], [history[-1]]
+    else:
+        earlier, latest = history, []
+    messages.extend({'role': m['role'], 'content': m['content']} for m in earlier)
+    messages.append({'role': 'system', 'content': state_block})
+    messages.extend({'role': m['role'], 'content': m['content']} for m in latest)
+    return messages
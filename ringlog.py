@@ -0,0 +1,94 @@
+"""Begrenzte Protokolle der Bewusstseins-Subsysteme (Gedankenmuster, Einsichten, Reflexionen, Träume).
+
+Statt wachsender Listen von Dicts mit ISO-Zeitstempeln: Ringpuffer (deque mit maxlen) aus
+`__slots__`-Einträgen mit Zeitstempel als float. Im Snapshot (to_state) steht jeder Eintrag als
+kurze Liste `[ts, feld1, feld2, ...]`; alte Snapshots mit Dicts werden beim Laden übernommen.
+Nach außen (get_recent_*) bleiben es Dicts mit ISO-Zeitstempel.
+
+Aufbewahrung je Protokoll über MARA_RETAIN_<NAME> (z.B. MARA_RETAIN_DREAM_LOG=20), sonst
+MARA_LOG_RETENTION, sonst der Standard des Subsystems.
+"""
+import os
+import time
+from collections import deque
+from datetime import datetime
+from itertools import islice
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+def retention(name: str, default: int) -> int:
+    """Maximale Anzahl Einträge für das Protokoll `name`"""
+    value = os.environ.get(f"MARA_RETAIN_{name.upper()}") or os.environ.get("MARA_LOG_RETENTION")
+    return max(1, int(value)) if value else default
+
+
+def record_type(name: str, fields: Tuple[str, ...]) -> type:
+    """Eintragsklasse mit __slots__ (ts + fields), ohne __dict__ pro Eintrag"""
+
+    def __init__(self, ts, *values):
+        self.ts = ts
+        for field, value in zip(fields, values):
+            setattr(self, field, value)
+
+    def to_dict(self) -> Dict:
+        entry = {'timestamp': datetime.fromtimestamp(self.ts).isoformat()}
+        entry.update((field, getattr(self, field)) for field in fields)
+        return entry
+
+    def to_row(self) -> list:
+        return [self.ts] + [getattr(self, field) for field in fields]
+
+    return type(name, (), {'__slots__': ('ts',) + fields, 'fields': fields, '__init__': __init__,
+                           'to_dict': to_dict, 'to_row': to_row})
+
+
+def _timestamp(value) -> float:
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except (TypeError, ValueError):
+        return time.time()
+
+
+class RingLog:
+    """Die letzten `maxlen` Einträge eines Protokolls"""
+
+    def __init__(self, record: type, maxlen: int):
+        self.record = record
+        self._entries = deque(maxlen=maxlen)
+
+    @property
+    def maxlen(self) -> int:
+        return self._entries.maxlen
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def append(self, *values, ts: Optional[float] = None):
+        """Neuer Eintrag (Werte in der Reihenfolge der Felder); der älteste fällt bei vollem Puffer heraus"""
+        entry = self.record(time.time() if ts is None else ts, *values)
+        self._entries.append(entry)
+        return entry
+
+    def recent(self, limit: int) -> List[Dict]:
+        """Die letzten `limit` Einträge als Dicts, älteste zuerst"""
+        if limit <= 0:
+            return []
+        start = max(0, len(self._entries) - limit)
+        return [entry.to_dict() for entry in islice(self._entries, start, None)]
+
+    def to_state(self) -> List[list]:
+        return [entry.to_row() for entry in self._entries]
+
+    def load(self, rows: Iterable):
+        """Übernimmt Einträge aus to_state() oder aus alten Snapshots (Dicts mit 'timestamp')"""
+        self._entries.clear()
+        for row in rows:
+            if isinstance(row, dict):
+                self.append(*(row.get(field) for field in self.record.fields), ts=_timestamp(row.get('timestamp')))
+            else:
+                self.append(*row[1:], ts=_timestamp(row[0]))
@@ -0,0 +1,261 @@
+"""Prioritäts-Scheduler vor Ollama: jeder Aufruf holt sich vorher einen Slot.
+
+Klassen (höchste zuerst): interaktive Generierung (Chat-Stream), interaktive Embeddings
+(Recall im Turn), Hintergrund-Embeddings (Speichern nach dem Turn) und Hintergrund-
+Generierung (Träume, Zusammenfassungen, Konsolidierung). Jede Klasse hat ein eigenes
+Parallelitäts-Limit, dazu ein Gesamtlimit passend zu OLLAMA_NUM_PARALLEL.
+
+Hintergrundarbeit wird zurückgestellt, solange interaktive Aufrufe laufen oder warten und
+noch kurz danach (MARA_SCHED_QUIET_MS) – ein Nutzer tippt meist gleich weiter. Damit sie
+nicht verhungert, läuft sie nach MARA_SCHED_MAX_DEFER_SECONDS trotzdem. Eine laufende
+Ollama-Generierung lässt sich nicht unterbrechen, ohne die Arbeit wegzuwerfen; es wird
+also nur zurückgestellt, nicht verdrängt.
+
+Der Dream-Service (eigener Prozess) nutzt denselben Scheduler über die API
+(POST /scheduler/acquire und /scheduler/release, siehe RemoteScheduler).
+"""
+import asyncio
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, Optional
+
+INTERACTIVE_CHAT = "interactive_chat"
+INTERACTIVE_EMBED = "interactive_embed"
+BACKGROUND_EMBED = "background_embed"
+DREAM = "dream"
+# Reihenfolge = Priorität
+PRIORITIES = (INTERACTIVE_CHAT, INTERACTIVE_EMBED, BACKGROUND_EMBED, DREAM)
+INTERACTIVE = (INTERACTIVE_CHAT, INTERACTIVE_EMBED)
+
+SCHED_PARALLEL = int(os.environ.get("MARA_SCHED_PARALLEL", "4"))
+SCHED_LIMITS = {
+    INTERACTIVE_CHAT: int(os.environ.get("MARA_SCHED_LIMIT_CHAT", "4")),
+    INTERACTIVE_EMBED: int(os.environ.get("MARA_SCHED_LIMIT_RECALL", "2")),
+    BACKGROUND_EMBED: int(os.environ.get("MARA_SCHED_LIMIT_EMBED", "1")),
+    DREAM: int(os.environ.get("MARA_SCHED_LIMIT_DREAM", "1")),
+}
+SCHED_QUIET_MS = float(os.environ.get("MARA_SCHED_QUIET_MS", "1500"))
+SCHED_MAX_DEFER_SECONDS = float(os.environ.get("MARA_SCHED_MAX_DEFER_SECONDS", "60"))
+# Slots des Dream-Service verfallen danach (falls er abstürzt, ohne freizugeben)
+SCHED_LEASE_SECONDS = float(os.environ.get("MARA_SCHED_LEASE_SECONDS", "900"))
+# So lange wartet ein Aufruf von /scheduler/acquire höchstens, danach fragt der Client erneut
+SCHED_RPC_WAIT_SECONDS = float(os.environ.get("MARA_SCHED_RPC_WAIT_SECONDS", "30"))
+SCHEDULER_URL = os.environ.get("MARA_SCHEDULER_URL", "")
+
+
+class OllamaScheduler:
+    """Vergibt Slots nach Priorität; innerhalb einer Klasse in Ankunftsreihenfolge"""
+
+    def __init__(self, parallel: int = SCHED_PARALLEL, limits: Optional[Dict[str, int]] = None,
+                 quiet_ms: float = SCHED_QUIET_MS, max_defer: float = SCHED_MAX_DEFER_SECONDS):
+        self.parallel = parallel
+        self.limits = dict(SCHED_LIMITS, **(limits or {}))
+        self.quiet = quiet_ms / 1000
+        self.max_defer = max_defer
+        self._cond = threading.Condition()
+        self._queues = {p: deque() for p in PRIORITIES}
+        self._running = {p: 0 for p in PRIORITIES}
+        self._leases: Dict[int, tuple] = {}  # ticket -> (Klasse, Ablaufzeit oder None)
+        self._next_ticket = 1
+        self._last_interactive = 0.0
+        self._stats = {p: {'granted': 0, 'deferred': 0, 'timeouts': 0, 'expired': 0,
+                           'wait_total_ms': 0.0, 'wait_max_ms': 0.0} for p in PRIORITIES}
+        # Wartende async-Aufrufer blockieren einen dieser Threads statt den Event-Loop
+        self._waiters = ThreadPoolExecutor(max_workers=32, thread_name_prefix="sched-wait")
+
+    def _interactive_active(self, now: float) -> bool:
+        if any(self._running[p] or self._queues[p] for p in INTERACTIVE):
+            return True
+        return now - self._last_interactive < self.quiet
+
+    def _can_run(self, priority: str, ticket: int, since: float, now: float) -> bool:
+        if self._queues[priority][0] != ticket:
+            return False
+        if sum(self._running.values()) >= self.parallel or self._running[priority] >= self.limits[priority]:
+            return False
+        for higher in PRIORITIES[:PRIORITIES.index(priority)]:
+            # Nur Klassen, die selbst gerade starten könnten, haben Vorrang
+            if self._queues[higher] and self._running[higher] < self.limits[higher]:
+                return False
+        if priority not in INTERACTIVE and now - since < self.max_defer:
+            return not self._interactive_active(now)
+        return True
+
+    def _expire_leases(self, now: float):
+        for ticket, (priority, expires) in list(self._leases.items()):
+            if expires is not None and expires <= now:
+                print(f"⚠️ Scheduler-Slot {ticket} ({priority}) nicht freigegeben – verfallen")
+                self._stats[priority]['expired'] += 1
+                self._release_locked(ticket)
+
+    def acquire(self, priority: str, timeout: Optional[float] = None, lease: Optional[float] = None) -> Optional[int]:
+        """Blockiert bis ein Slot frei ist; liefert das Ticket oder None bei Timeout"""
+        if priority not in self._queues:
+            raise ValueError(f"Unbekannte Priorität: {priority}")
+        since = time.monotonic()
+        deadline = since + timeout if timeout is not None else None
+        with self._cond:
+            ticket = self._next_ticket
+            self._next_ticket += 1
+            self._queues[priority].append(ticket)
+            deferred = False
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._expire_leases(now)
+                    if self._can_run(priority, ticket, since, now):
+                        break
+                    if priority not in INTERACTIVE and self._interactive_active(now):
+                        deferred = True
+                    if deadline is not None and now >= deadline:
+                        self._stats[priority]['timeouts'] += 1
+                        return None
+                    # Ruhezeit, Zurückstellung und Leases laufen ohne Ereignis ab -> regelmäßig neu prüfen
+                    wait = 0.1 if priority not in INTERACTIVE else 1.0
+                    if deadline is not None:
+                        wait = min(wait, deadline - now)
+                    self._cond.wait(wait)
+            finally:
+                self._queues[priority].remove(ticket)
+                self._cond.notify_all()
+
+            waited_ms = (time.monotonic() - since) * 1000
+            stats = self._stats[priority]
+            stats['granted'] += 1
+            stats['deferred'] += int(deferred)
+            stats['wait_total_ms'] += waited_ms
+            stats['wait_max_ms'] = max(stats['wait_max_ms'], waited_ms)
+            self._running[priority] += 1
+            self._leases[ticket] = (priority, time.monotonic() + lease if lease else None)
+            return ticket
+
+    def _release_locked(self, ticket: int) -> bool:
+        entry = self._leases.pop(ticket, None)
+        if entry is None:
+            return False
+        priority = entry[0]
+        self._running[priority] -= 1
+        if priority in INTERACTIVE:
+            self._last_interactive = time.monotonic()
+        self._cond.notify_all()
+        return True
+
+    def release(self, ticket: int) -> bool:
+        with self._cond:
+            return self._release_locked(ticket)
+
+    @contextmanager
+    def slot(self, priority: str):
+        ticket = self.acquire(priority)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    @asynccontextmanager
+    async def aslot(self, priority: str):
+        """Wie slot(), ohne den Event-Loop zu blockieren; bei Abbruch wird ein später erteilter Slot freigegeben"""
+        future = self._waiters.submit(self.acquire, priority)
+        try:
+            ticket = await asyncio.shield(asyncio.wrap_future(future))
+        except asyncio.CancelledError:
+            future.add_done_callback(lambda f: f.cancelled() or f.exception() or self.release(f.result()))
+            raise
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    def stats(self) -> Dict:
+        with self._cond:
+            return {
+                p: {
+                    'running': self._running[p],
+                    'waiting': len(self._queues[p]),
+                    'limit': self.limits[p],
+                    'granted': s['granted'],
+                    'deferred': s['deferred'],
+                    'timeouts': s['timeouts'],
+                    'expired': s['expired'],
+                    'wait_avg_ms': round(s['wait_total_ms'] / s['granted'], 1) if s['granted'] else 0.0,
+                    'wait_max_ms': round(s['wait_max_ms'], 1)
+                }
+                for p, s in self._stats.items()
+            }
+
+
+class RemoteScheduler:
+    """Scheduler der API aus einem anderen Prozess (Dream-Service).
+
+    Alle Aufrufe laufen mit der Priorität `demote_to` (standardmäßig DREAM), egal was der
+    Aufrufer anfragt: aus diesem Prozess kommt nie interaktive Last. Ist die API nicht
+    erreichbar, wird ohne Slot weitergearbeitet.
+    """
+
+    def __init__(self, url: str = SCHEDULER_URL, demote_to: str = DREAM, lease: float = SCHED_LEASE_SECONDS):
+        self.url = url.rstrip('/')
+        self.priority = demote_to
+        self.lease = lease
+        self._warned = False
+
+    def _post(self, path: str, payload: Dict, timeout: float) -> Dict:
+        request = urllib.request.Request(self.url + path, data=json.dumps(payload).encode('utf-8'),
+                                         headers={'Content-Type': 'application/json'}, method='POST')
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return json.loads(response.read().decode('utf-8'))
+
+    def acquire(self, priority: str = DREAM, timeout: Optional[float] = None, lease: Optional[float] = None):
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while True:
+            wait = SCHED_RPC_WAIT_SECONDS if deadline is None else max(0.0, min(SCHED_RPC_WAIT_SECONDS,
+                                                                             deadline - time.monotonic()))
+            try:
+                ticket = self._post('/scheduler/acquire',
+                                    {'priority': self.priority, 'timeout': wait, 'lease': lease or self.lease},
+                                    timeout=wait + 10)['ticket']
+            except (urllib.error.URLError, OSError, ValueError, KeyError) as e:
+                if not self._warned:
+                    print(f"⚠️ Scheduler unter {self.url} nicht erreichbar ({e}) – arbeite ohne Slot", flush=True)
+                    self._warned = True
+                return None
+            self._warned = False
+            if ticket is not None or (deadline is not None and time.monotonic() >= deadline):
+                return ticket
+
+    def release(self, ticket: Optional[int]) -> bool:
+        if ticket is None:
+            return False
+        try:
+            return self._post('/scheduler/release', {'ticket': ticket}, timeout=10).get('released', False)
+        except (urllib.error.URLError, OSError, ValueError) as e:
+            # Slot verfällt nach Ablauf der Lease von selbst
+            print(f"⚠️ Scheduler-Slot {ticket} nicht freigegeben: {e}", flush=True)
+            return False
+
+    @contextmanager
+    def slot(self, priority: str = DREAM):
+        ticket = self.acquire(priority)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """Prozessweiter Scheduler; mit MARA_SCHEDULER_URL der der API (RemoteScheduler)"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = RemoteScheduler(SCHEDULER_URL) if SCHEDULER_URL else OllamaScheduler()
+        return _scheduler
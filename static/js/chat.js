@@ -20,6 +20,8 @@ class MaraChat {
             const lastSessionId = Array.from(this.sessions.keys()).pop();
             this.switchToSession(lastSessionId);
         }
+
+        this.syncServerSessions();
     }
 
     initializeElements() {
@@ -107,7 +109,9 @@ class MaraChat {
         const session = this.sessions.get(sessionId);
 
         this.elements.chatMessages.innerHTML = '';
-        if (session && session.messages) {
+        if (session && session.remote) {
+            this.loadServerMessages(sessionId);
+        } else if (session && session.messages) {
             session.messages.forEach(msg => this.addMessageToUI(msg));
         }
 
@@ -156,6 +160,46 @@ class MaraChat {
         }
     }
 
+    /**
+     * Sessions, die nur auf dem Server liegen (SQLite-Store), in die Liste aufnehmen.
+     * Ohne SQLite-Backend liefert /sessions kein "persisted" -> nichts zu tun.
+     */
+    async syncServerSessions() {
+        try {
+            const res = await fetch('/sessions?limit=100');
+            const data = await res.json();
+            (data.persisted || []).forEach(info => {
+                if (this.sessions.has(info.session_id)) return;
+                this.sessions.set(info.session_id, {
+                    id: info.session_id,
+                    title: info.title || 'Chat',
+                    messages: [],
+                    createdAt: new Date(info.created_at * 1000),
+                    remote: true
+                });
+            });
+            this.updateChatList();
+        } catch (e) {
+            console.warn("Server-Sessions nicht geladen:", e);
+        }
+    }
+
+    async loadServerMessages(sessionId) {
+        try {
+            const res = await fetch(`/sessions/${encodeURIComponent(sessionId)}/messages?tail=true&limit=50`);
+            const data = await res.json();
+            const session = this.sessions.get(sessionId);
+            if (!session || this.currentSessionId !== sessionId) return;
+            session.messages = data.messages || [];
+            session.remote = false;
+            session.messages.forEach(msg => this.addMessageToUI(msg));
+            this.saveSessions();
+            this.updateChatList();
+        } catch (e) {
+            console.warn("Verlauf nicht geladen:", e);
+        }
+    }
+
     connectWebSocket() {
         if (this.ws) this.ws.close();
 